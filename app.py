@@ -1,20 +1,32 @@
 import streamlit as st
 import json
+import io
 import os
 import datetime
 import pandas as pd
 import folium
+from folium.plugins import HeatMap
 from streamlit_folium import st_folium
 from PIL import Image
 import base64
 from helpers import (
-    load_entries, save_entry, get_categories, get_languages,
-    text_to_speech, speech_to_text, geocode_location,
-    export_to_jsonl, export_to_csv, search_entries,
-    register_user, authenticate_user, get_user_info, update_user_entry_count,
-    translate_text, detect_language
+    save_entry, get_all_entries, invalidate_entry_indexes, get_categories, get_languages,
+    export_to_jsonl, export_to_csv, search_entries, search_nearby, fuzzy_search, semantic_search,
+    browse_entries, count_entries, get_archive_stats,
+    get_change_seq, export_delta_jsonl, clear_entries,
+    register_user, authenticate_user, get_user_info, get_user_entries,
+    enqueue_enrichment, get_enrichment_statuses, start_enrichment_worker,
+    submit_task, get_task_result, cancel_task, save_media_file, cleanup_media_files, backup_now,
+    synthesize_speech, recognize_microphone, geocode_location_raw,
+    translate_text_raw, detect_language_raw, detect_language_local,
+    get_glossary, highlight_terms, audio_stream_url, audio_stream_mime, get_density_layer,
+    create_export_bundles
 )
 
+BROWSE_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE = 20
+THUMBNAIL_SIZE = (480, 480)
+
 # Set page config
 st.set_page_config(
     page_title="Farming Wisdom Archive",
@@ -23,9 +35,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Background enrichment (geocoding, translation, TTS) for queued submissions
+start_enrichment_worker()
+
 # Initialize session state
-if 'entries' not in st.session_state:
-    st.session_state.entries = load_entries()
 if 'audio_recording' not in st.session_state:
     st.session_state.audio_recording = False
 if 'selected_location' not in st.session_state:
@@ -36,6 +49,128 @@ if 'username' not in st.session_state:
     st.session_state.username = None
 if 'show_login' not in st.session_state:
     st.session_state.show_login = True
+if 'tasks' not in st.session_state:
+    st.session_state.tasks = {}
+if 'task_results' not in st.session_state:
+    st.session_state.task_results = {}
+if 'tts_slot' not in st.session_state:
+    st.session_state.tts_slot = None
+
+# Background task helpers: slow calls run off the script thread and a small
+# fragment polls for the result, so other widgets stay responsive meanwhile.
+def start_task(slot, name, fn, *args):
+    """Start (or join) a background call and remember it under a page slot."""
+    st.session_state.tasks[slot] = submit_task(name, fn, *args)
+    st.session_state.task_results.pop(slot, None)
+
+@st.fragment(run_every=1)
+def task_poller(slot, label):
+    """Show progress for a running task; trigger a full rerun once it finishes."""
+    key = st.session_state.tasks.get(slot)
+    if key is None:
+        return
+    status, value = get_task_result(key)
+    if status == "running":
+        col_status, col_cancel = st.columns([4, 1])
+        col_status.info(label)
+        if col_cancel.button("Cancel", key=f"cancel_{slot}"):
+            cancel_task(key)
+        return
+    st.session_state.task_results[slot] = (status, value)
+    del st.session_state.tasks[slot]
+    st.rerun()
+
+def task_result(slot, what, label=None, keep=False):
+    """Return a finished task's value, reporting failures. Pops the result unless keep=True."""
+    if slot in st.session_state.tasks:
+        status, value = get_task_result(st.session_state.tasks[slot])
+        if status == "running":
+            task_poller(slot, label or f"{what}...")
+            return None
+        # Already finished (fast or shared call): no poller, no extra rerun
+        st.session_state.task_results[slot] = (status, value)
+        del st.session_state.tasks[slot]
+    result = st.session_state.task_results.get(slot) if keep else st.session_state.task_results.pop(slot, None)
+    if result is None:
+        return None
+    status, value = result
+    if status == "done":
+        return value
+    if status == "timeout":
+        st.error(f"{what} timed out. Please check your connection and try again.")
+    elif status == "error":
+        st.error(f"{what} failed: {value}")
+    elif status == "cancelled":
+        st.info(f"{what} cancelled.")
+    return None
+
+# Per-entry renders are cached on (id, version): every save bumps the version,
+# so a cached render is never stale and unchanged entries are not re-rendered.
+# The underscore-prefixed arguments carry the data but are not hashed.
+@st.cache_data(max_entries=5000, show_spinner=False)
+def render_description(entry_id, version, _text):
+    """Glossary-highlighted markdown and English gloss caption for one entry version."""
+    marked, concepts = highlight_terms(_text)
+    if not concepts:
+        return marked, None
+    glossary = get_glossary()
+    return marked, "Glossary: " + " · ".join(
+        (glossary.terms(concept, "English") or [concept])[0] for concept in concepts)
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def entry_thumbnail(entry_id, version, _path):
+    """Downscaled JPEG of an entry's image, so pages do not ship full-size photos."""
+    image = Image.open(_path)
+    image.thumbnail(THUMBNAIL_SIZE)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def show_description(entry):
+    """Render a description with glossary terms highlighted and glossed in English."""
+    marked, caption = render_description(entry.get('id'), entry.get('version'),
+                                         entry.get('description', 'No description'))
+    st.markdown(marked)
+    if caption:
+        st.caption(caption)
+
+# Not a fragment of its own: Streamlit copies the container stack for every
+# fragment call, which costs more per page than a Listen click would save.
+def entry_tts(entry, prefix):
+    """Listen button for one entry; clicking it reruns the page fragment it sits in.
+
+    Only the most recently requested entry's speech is kept in session state.
+    """
+    slot = f"{prefix}_{entry.get('id')}"
+    if st.button(f"🔊 Listen", key=slot):
+        if entry.get('tts_path') and os.path.exists(entry['tts_path']):
+            st.audio(entry['tts_path'], format="audio/mp3")
+        else:
+            previous = st.session_state.tts_slot
+            if previous is not None and previous != slot:
+                st.session_state.tasks.pop(previous, None)
+                st.session_state.task_results.pop(previous, None)
+            st.session_state.tts_slot = slot
+            start_task(slot, "tts", synthesize_speech,
+                       entry.get('description', ''), entry.get('language', 'en'))
+    if slot != st.session_state.tts_slot:
+        return
+    # A finished synthesis still reruns the app once, from task_poller
+    audio_bytes = task_result(slot, "Text-to-speech", keep=True)
+    if audio_bytes:
+        st.audio(audio_bytes, format="audio/mp3")
+
+def play_entry_audio(entry):
+    """Play an entry's recording, streaming the compact copy when the worker has made one."""
+    stream_url = audio_stream_url(entry)
+    if stream_url and st.get_option("server.enableStaticServing"):
+        # Served by the static file handler, which honours Range requests
+        st.html(f'<audio controls preload="none" style="width: 100%">'
+                f'<source src="{stream_url}" type="{audio_stream_mime(stream_url)}"></audio>')
+    elif stream_url:
+        st.audio(entry['audio_stream_path'], format=audio_stream_mime(entry['audio_stream_path']))
+    elif entry.get('audio_path') and os.path.exists(entry['audio_path']):
+        st.audio(entry['audio_path'])
 
 # Authentication check
 if not st.session_state.authenticated:
@@ -141,7 +276,8 @@ page = st.sidebar.radio("Go to", [
     "🔍 Search Knowledge",
     "🌐 Translation Hub",
     "📊 Export Data",
-    "👤 Profile"
+    "👤 Profile",
+    "🔧 Settings"
 ])
 
 # Home Page
@@ -166,13 +302,11 @@ if page == "🏠 Home":
     
     with col2:
         st.markdown("### 📊 Archive Statistics")
-        total_entries = len(st.session_state.entries)
-        languages = len(set(entry.get('language', 'Unknown') for entry in st.session_state.entries))
-        categories = len(set(entry.get('category', 'Unknown') for entry in st.session_state.entries))
+        archive_stats = get_archive_stats()
         
-        st.metric("Total Farming Entries", total_entries)
-        st.metric("Languages", languages)
-        st.metric("Farming Categories", categories)
+        st.metric("Total Farming Entries", archive_stats["entries"])
+        st.metric("Languages", archive_stats["languages"])
+        st.metric("Farming Categories", archive_stats["categories"])
     
     st.markdown("---")
     st.markdown("### 🚀 Getting Started")
@@ -210,13 +344,14 @@ elif page == "✍️ Submit Farming Wisdom":
         geocode_location_input = st.text_input("Enter location to geocode", 
                                              placeholder="e.g., Mumbai, Maharashtra")
         if st.button("🌍 Geocode Location") and geocode_location_input:
-            coords = geocode_location(geocode_location_input)
-            if coords:
-                st.session_state.form_data['manual_lat'] = coords[0]
-                st.session_state.form_data['manual_lon'] = coords[1]
-                st.success(f"Found coordinates: {coords[0]:.6f}, {coords[1]:.6f}")
-            else:
-                st.error("Could not find coordinates for the location")
+            start_task("geocode", "geocode", geocode_location_raw, geocode_location_input)
+        coords = task_result("geocode", "Geocoding", keep=True)
+        if st.session_state.task_results.pop("geocode", None) == ("done", None):
+            st.error("Could not find coordinates for the location")
+        if coords:
+            st.session_state.form_data['manual_lat'] = coords[0]
+            st.session_state.form_data['manual_lon'] = coords[1]
+            st.success(f"Found coordinates: {coords[0]:.6f}, {coords[1]:.6f}")
     
     # Map for location selection (outside form)
     if st.session_state.form_data['manual_lat'] != 0.0 or st.session_state.form_data['manual_lon'] != 0.0:
@@ -236,13 +371,12 @@ elif page == "✍️ Submit Farming Wisdom":
     st.subheader("Speech Input Helper")
     speech_language = st.selectbox("Language for Speech Recognition", get_languages(), key="speech_lang")
     if st.button("🎤 Record Description"):
-        with st.spinner("Listening... Speak now!"):
-            recorded_text = speech_to_text(speech_language)
-            if recorded_text:
-                st.session_state.form_data['description'] = recorded_text
-                st.success(f"Recorded: {recorded_text}")
-            else:
-                st.error("Could not record speech. Please try again.")
+        st.warning("Microphone input for Speech-to-Text may not work in deployed environments like Hugging Face Spaces.")
+        start_task("stt", "stt", recognize_microphone, speech_language)
+    recorded_text = task_result("stt", "Speech recognition", label="Listening... Speak now!")
+    if recorded_text:
+        st.session_state.form_data['description'] = recorded_text
+        st.success(f"Recorded: {recorded_text}")
     
     # Main form
     st.subheader("Entry Details")
@@ -271,6 +405,8 @@ elif page == "✍️ Submit Farming Wisdom":
             st.subheader("Media (Optional)")
             uploaded_image = st.file_uploader("Upload Image", type=['jpg', 'jpeg', 'png'])
             uploaded_audio = st.file_uploader("Upload Audio", type=['mp3', 'wav', 'ogg'])
+            transcribe_audio = st.checkbox("Add a transcript of the audio to the description", value=True,
+                                           help="Long recordings are transcribed in the background after submission")
         
         # Location coordinates (read-only display)
         st.subheader("Location Coordinates")
@@ -299,20 +435,16 @@ elif page == "✍️ Submit Farming Wisdom":
                 audio_path = None
                 
                 if uploaded_image:
-                    image_path = f"data_entries/media/{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uploaded_image.name}"
-                    os.makedirs("data_entries/media", exist_ok=True)
-                    with open(image_path, "wb") as f:
-                        f.write(uploaded_image.getbuffer())
+                    image_path = save_media_file(f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uploaded_image.name}",
+                                                 uploaded_image.getbuffer())
                 
                 if uploaded_audio:
-                    audio_path = f"data_entries/media/{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uploaded_audio.name}"
-                    os.makedirs("data_entries/media", exist_ok=True)
-                    with open(audio_path, "wb") as f:
-                        f.write(uploaded_audio.getbuffer())
+                    audio_path = save_media_file(f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uploaded_audio.name}",
+                                                 uploaded_audio.getbuffer())
                 
                 # Create entry
                 entry = {
-                    'id': len(st.session_state.entries) + 1,
+                    'id': None,  # assigned by storage
                     'title': title,
                     'description': description,
                     'language': language,
@@ -328,8 +460,8 @@ elif page == "✍️ Submit Farming Wisdom":
                 }
                 
                 if save_entry(entry):
-                    st.session_state.entries.append(entry)
-                    update_user_entry_count(st.session_state.username)
+                    # Network-dependent extras run in the background, never in the form
+                    enqueue_enrichment(entry, transcribe=transcribe_audio)
                     st.success("Farming wisdom submitted successfully!")
                     # Reset form data
                     st.session_state.form_data = {
@@ -349,141 +481,255 @@ elif page == "✍️ Submit Farming Wisdom":
 
 # Browse Farming Knowledge Page
 elif page == "📖 Browse Farming Knowledge":
-    st.header("Browse Farming Knowledge")
-    
-    # Filters
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        filter_language = st.selectbox("Filter by Language", ["All"] + get_languages())
-    with col2:
-        filter_category = st.selectbox("Filter by Category", ["All"] + get_categories())
-    with col3:
-        sort_by = st.selectbox("Sort by", ["Newest First", "Oldest First", "Title A-Z"])
-    
-    # Filter entries
-    filtered_entries = st.session_state.entries.copy()
-    
-    if filter_language != "All":
-        filtered_entries = [e for e in filtered_entries if e.get('language') == filter_language]
-    
-    if filter_category != "All":
-        filtered_entries = [e for e in filtered_entries if e.get('category') == filter_category]
-    
-    # Sort entries
-    if sort_by == "Newest First":
-        filtered_entries.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    elif sort_by == "Oldest First":
-        filtered_entries.sort(key=lambda x: x.get('timestamp', ''))
-    elif sort_by == "Title A-Z":
-        filtered_entries.sort(key=lambda x: x.get('title', '').lower())
-    
-    st.write(f"Showing {len(filtered_entries)} entries")
-    
-    # Display entries
-    for entry in filtered_entries:
-        with st.expander(f"📖 {entry.get('title', 'Untitled')} ({entry.get('language', 'Unknown')})"):
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                st.markdown(f"**Category:** {entry.get('category', 'Unknown')}")
-                st.markdown(f"**Location:** {entry.get('location_name', 'Not specified')}")
-                st.markdown(f"**Description:**")
-                st.write(entry.get('description', 'No description'))
-                
-                # TTS button
-                if st.button(f"🔊 Listen", key=f"tts_{entry.get('id')}"):
-                    text_to_speech(entry.get('description', ''), entry.get('language', 'en'))
-            
-            with col2:
-                # Display image if available
-                if entry.get('image_path') and os.path.exists(entry['image_path']):
-                    try:
-                        image = Image.open(entry['image_path'])
-                        st.image(image, caption="Attached Image", use_column_width=True)
-                    except Exception as e:
-                        st.error(f"Error loading image: {str(e)}")
+    @st.fragment
+    def browse_page():
+        """Filters, listing and paging rerun on their own, without the rest of the app."""
+        st.header("Browse Farming Knowledge")
+        
+        # Filters
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            filter_language = st.selectbox("Filter by Language", ["All"] + get_languages())
+        with col2:
+            filter_category = st.selectbox("Filter by Category", ["All"] + get_categories())
+        with col3:
+            sort_by = st.selectbox("Sort by", ["Newest First", "Oldest First", "Title A-Z"])
+        
+        # Page through the pre-sorted index; restart from the first page when the filters change
+        browse_language = filter_language if filter_language != "All" else None
+        browse_category = filter_category if filter_category != "All" else None
+        browse_filters = (filter_language, filter_category, sort_by)
+        if st.session_state.get('browse_filters') != browse_filters:
+            st.session_state.browse_filters = browse_filters
+            st.session_state.browse_cursors = [None]
+        
+        filtered_entries, next_cursor = browse_entries(browse_language, browse_category, sort_by,
+                                                       cursor=st.session_state.browse_cursors[-1],
+                                                       limit=BROWSE_PAGE_SIZE)
+        total_matching = count_entries(browse_language, browse_category)
+        first_shown = (len(st.session_state.browse_cursors) - 1) * BROWSE_PAGE_SIZE
+        
+        if filtered_entries:
+            st.write(f"Showing {first_shown + 1}-{first_shown + len(filtered_entries)} of {total_matching} entries")
+        else:
+            st.write("Showing 0 entries")
+        enrichment_statuses = get_enrichment_statuses()
+        
+        # Display entries
+        for entry in filtered_entries:
+            with st.expander(f"📖 {entry.get('title', 'Untitled')} ({entry.get('language', 'Unknown')})"):
+                col1, col2 = st.columns([2, 1])
                 
-                # Display audio if available
-                if entry.get('audio_path') and os.path.exists(entry['audio_path']):
-                    try:
-                        st.audio(entry['audio_path'])
-                    except Exception as e:
-                        st.error(f"Error loading audio: {str(e)}")
+                with col1:
+                    # One element per block of lines: every element is a message to the browser
+                    st.markdown(f"**Category:** {entry.get('category', 'Unknown')}  \n"
+                                f"**Location:** {entry.get('location_name', 'Not specified')}  \n"
+                                f"**Description:**")
+                    show_description(entry)
+                    
+                    # TTS button (uses the pre-rendered audio when the background worker has made it)
+                    entry_tts(entry, "tts")
                 
-                # Metadata
-                st.markdown(f"**Submitted:** {entry.get('timestamp', 'Unknown')[:10]}")
-                if entry.get('latitude') and entry.get('longitude'):
-                    st.markdown(f"**Coordinates:** {entry['latitude']:.4f}, {entry['longitude']:.4f}")
+                with col2:
+                    # Display image if available
+                    if entry.get('image_path') and os.path.exists(entry['image_path']):
+                        try:
+                            st.image(entry_thumbnail(entry.get('id'), entry.get('version'), entry['image_path']),
+                                     caption="Attached Image", width="stretch")
+                        except Exception as e:
+                            st.error(f"Error loading image: {str(e)}")
+                    
+                    # Display audio if available
+                    if entry.get('audio_path'):
+                        try:
+                            play_entry_audio(entry)
+                        except Exception as e:
+                            st.error(f"Error loading audio: {str(e)}")
+                    
+                    # Metadata
+                    metadata = f"**Submitted:** {entry.get('timestamp', 'Unknown')[:10]}"
+                    if entry.get('latitude') and entry.get('longitude'):
+                        metadata += f"  \n**Coordinates:** {entry['latitude']:.4f}, {entry['longitude']:.4f}"
+                    st.markdown(metadata)
+                    if entry.get('id') in enrichment_statuses:
+                        st.caption("Enrichment: " + ", ".join(
+                            f"{task} {status}" for task, status in enrichment_statuses[entry['id']].items()))
+        
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            st.button("⬅️ Previous", disabled=len(st.session_state.browse_cursors) == 1,
+                      on_click=lambda: st.session_state.browse_cursors.pop())
+        with col_next:
+            st.button("Next ➡️", disabled=next_cursor is None,
+                      on_click=lambda: st.session_state.browse_cursors.append(next_cursor))
+
+    browse_page()
 
 # Farming Wisdom Map Page
 elif page == "🗺️ Farming Wisdom Map":
-    st.header("Farming Wisdom Map")
-    st.markdown("Explore traditional farming knowledge geographically")
-    
-    # Get entries with coordinates
-    geo_entries = [e for e in st.session_state.entries if e.get('latitude') and e.get('longitude')]
-    
-    if geo_entries:
-        # Create map centered on India
-        m = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
+    @st.fragment
+    def map_page():
+        """Map filters and detail changes rerun only the map."""
+        st.header("Farming Wisdom Map")
+        st.markdown("Explore traditional farming knowledge geographically")
         
-        # Add markers for each entry
-        for entry in geo_entries:
-            folium.Marker(
-                [entry['latitude'], entry['longitude']],
-                popup=f"<b>{entry.get('title', 'Untitled')}</b><br>"
-                      f"Category: {entry.get('category', 'Unknown')}<br>"
-                      f"Language: {entry.get('language', 'Unknown')}<br>"
-                      f"Location: {entry.get('location_name', 'Unknown')}",
-                tooltip=entry.get('title', 'Untitled')
-            ).add_to(m)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            map_view = st.radio("Show", ["Density", "Markers"], horizontal=True)
+        with col2:
+            map_language = st.selectbox("Language", ["All"] + get_languages(), key="map_lang")
+        with col3:
+            map_category = st.selectbox("Category", ["All"] + get_categories(), key="map_cat")
+        with col4:
+            map_detail = st.select_slider("Detail", ["Country", "State", "District", "Village"], value="State",
+                                          disabled=map_view != "Density")
+        map_language = map_language if map_language != "All" else None
+        map_category = map_category if map_category != "All" else None
         
-        # Display map
-        st_folium(m, width=1200, height=600)
+        # Precomputed grid counts; nothing is recomputed until an entry changes
+        density = get_density_layer(["Country", "State", "District", "Village"].index(map_detail),
+                                    language=map_language, category=map_category)
         
-        st.write(f"Showing {len(geo_entries)} entries with location data")
-    else:
-        st.info("No entries with location data found. Submit entries with coordinates to see them on the map!")
+        if density["total"] and map_view == "Density":
+            m = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
+            HeatMap(density["points"], min_opacity=0.3, radius=18, blur=15, max_zoom=12).add_to(m)
+            st_folium(m, width=1200, height=600, returned_objects=[])
+            
+            st.write(f"{density['total']} entries with location data in {density['cells']} grid cells "
+                     f"(busiest cell: {density['max_count']})")
+        elif density["total"]:
+            geo_entries = [e for e in get_all_entries() if e.get('latitude') and e.get('longitude')
+                           and map_language in (None, e.get('language')) and map_category in (None, e.get('category'))]
+            
+            # Create map centered on India
+            m = folium.Map(location=[20.5937, 78.9629], zoom_start=5)
+            
+            # Add markers for each entry
+            for entry in geo_entries:
+                folium.Marker(
+                    [entry['latitude'], entry['longitude']],
+                    popup=f"<b>{entry.get('title', 'Untitled')}</b><br>"
+                          f"Category: {entry.get('category', 'Unknown')}<br>"
+                          f"Language: {entry.get('language', 'Unknown')}<br>"
+                          f"Location: {entry.get('location_name', 'Unknown')}",
+                    tooltip=entry.get('title', 'Untitled')
+                ).add_to(m)
+            
+            # Display map; pans and zooms stay in the browser instead of rerunning
+            st_folium(m, width=1200, height=600, returned_objects=[])
+            
+            st.write(f"Showing {len(geo_entries)} entries with location data")
+        else:
+            st.info("No entries with location data found. Submit entries with coordinates to see them on the map!")
+
+    map_page()
 
 # Search Knowledge Page
 elif page == "🔍 Search Knowledge":
-    st.header("Search Farming Knowledge")
-    
-    # Search input
-    search_query = st.text_input("Search for farming practices, techniques, or knowledge...")
-    
-    # Advanced filters
-    with st.expander("Advanced Filters"):
-        col1, col2 = st.columns(2)
-        with col1:
-            search_language = st.selectbox("Language", ["All"] + get_languages(), key="search_lang")
-            search_category = st.selectbox("Category", ["All"] + get_categories(), key="search_cat")
-        with col2:
-            has_media = st.checkbox("Has Media")
-            has_location = st.checkbox("Has Location Data")
-    
-    if search_query:
-        results = search_entries(
-            st.session_state.entries,
-            search_query,
-            language=search_language if search_language != "All" else None,
-            category=search_category if search_category != "All" else None,
-            has_media=has_media,
-            has_location=has_location
-        )
+    @st.fragment
+    def search_page():
+        """Search input, filters and results rerun on their own."""
+        st.header("Search Farming Knowledge")
         
-        st.write(f"Found {len(results)} results")
+        search_mode = st.radio("Search type", ["Keyword", "Fuzzy / romanized", "Semantic", "Near a place"],
+                               horizontal=True,
+                               help="Fuzzy search tolerates typos and matches romanized text such as "
+                                    "'jaivik khad' against native script. Semantic search finds related "
+                                    "practices in any language ('termite control' also finds 'दीमक से बचाव').")
         
-        for entry in results:
-            with st.expander(f"📖 {entry.get('title', 'Untitled')}"):
-                st.markdown(f"**Category:** {entry.get('category', 'Unknown')}")
-                st.markdown(f"**Language:** {entry.get('language', 'Unknown')}")
-                st.markdown(f"**Location:** {entry.get('location_name', 'Not specified')}")
-                st.write(entry.get('description', 'No description'))
-                
-                if st.button(f"🔊 Listen", key=f"search_tts_{entry.get('id')}"):
-                    text_to_speech(entry.get('description', ''), entry.get('language', 'en'))
+        # Search input
+        search_query = st.text_input("Search for farming practices, techniques, or knowledge...")
+        
+        # Place to search around (geo-proximity mode)
+        if search_mode == "Near a place":
+            if 'near_center' not in st.session_state:
+                st.session_state.near_center = (20.5937, 78.9629)
+            col_place, col_radius = st.columns(2)
+            with col_place:
+                near_place = st.text_input("Village, town or district", placeholder="e.g., Warangal, Telangana")
+                if st.button("🌍 Find Place") and near_place:
+                    start_task("near_geocode", "geocode", geocode_location_raw, near_place)
+                coords = task_result("near_geocode", "Geocoding", keep=True)
+                if st.session_state.task_results.pop("near_geocode", None) == ("done", None):
+                    st.error("Could not find coordinates for the location")
+                if coords:
+                    st.session_state.near_center = coords
+                near_lat = st.number_input("Latitude", value=float(st.session_state.near_center[0]), format="%.6f")
+                near_lon = st.number_input("Longitude", value=float(st.session_state.near_center[1]), format="%.6f")
+            with col_radius:
+                near_radius = st.slider("Within (km)", 1, 500, 50)
+                near_k = st.number_input("Nearest practices to show", min_value=1, max_value=200, value=20)
+        
+        # Advanced filters
+        with st.expander("Advanced Filters"):
+            col1, col2 = st.columns(2)
+            with col1:
+                search_language = st.selectbox("Language", ["All"] + get_languages(), key="search_lang")
+                search_category = st.selectbox("Category", ["All"] + get_categories(), key="search_cat")
+            with col2:
+                has_media = st.checkbox("Has Media")
+                has_location = st.checkbox("Has Location Data")
+        
+        results = None
+        if search_mode == "Near a place":
+            results = [(entry, f" — {distance_km:.1f} km away") for entry, distance_km in search_nearby(
+                near_lat, near_lon,
+                radius_km=near_radius,
+                k=int(near_k),
+                query=search_query,
+                language=search_language if search_language != "All" else None,
+                category=search_category if search_category != "All" else None,
+                has_media=has_media
+            )]
+        elif search_mode == "Fuzzy / romanized" and search_query:
+            results = [(entry, f" — {score:.0%} match") for entry, score in fuzzy_search(
+                search_query,
+                language=search_language if search_language != "All" else None,
+                category=search_category if search_category != "All" else None,
+                has_media=has_media,
+                has_location=has_location
+            )]
+        elif search_mode == "Semantic" and search_query:
+            results = [(entry, f" — similarity {score:.2f}") for entry, score in semantic_search(
+                search_query,
+                language=search_language if search_language != "All" else None,
+                category=search_category if search_category != "All" else None,
+                has_media=has_media,
+                has_location=has_location
+            )]
+        elif search_query:
+            results = [(entry, "") for entry in search_entries(
+                get_all_entries(),
+                search_query,
+                language=search_language if search_language != "All" else None,
+                category=search_category if search_category != "All" else None,
+                has_media=has_media,
+                has_location=has_location
+            )]
+        
+        if results is not None:
+            st.write(f"Found {len(results)} results")
+            
+            # Render a page of results at a time; a new search starts from the first page
+            search_key = (search_mode, search_query, search_language, search_category, has_media, has_location)
+            if st.session_state.get('search_key') != search_key:
+                st.session_state.search_key = search_key
+                st.session_state.search_shown = SEARCH_PAGE_SIZE
+            for entry, result_label in results[:st.session_state.search_shown]:
+                with st.expander(f"📖 {entry.get('title', 'Untitled')}{result_label}"):
+                    st.markdown(f"**Category:** {entry.get('category', 'Unknown')}")
+                    st.markdown(f"**Language:** {entry.get('language', 'Unknown')}")
+                    st.markdown(f"**Location:** {entry.get('location_name', 'Not specified')}")
+                    show_description(entry)
+                    entry_tts(entry, "search_tts")
+            
+            if len(results) > st.session_state.search_shown:
+                st.button(f"Show more ({len(results) - st.session_state.search_shown} remaining)",
+                          on_click=lambda: st.session_state.update(
+                              search_shown=st.session_state.search_shown + SEARCH_PAGE_SIZE))
+
+    search_page()
 
 # Translation Hub Page
 elif page == "🌐 Translation Hub":
@@ -500,7 +746,14 @@ elif page == "🌐 Translation Hub":
                                  placeholder="Enter farming knowledge in any Indian language...")
         
         if st.button("🔍 Detect Language") and source_text:
-            detected_lang = detect_language(source_text)
+            # Script-based detection is instant; only ambiguous text goes to the network
+            local_lang = detect_language_local(source_text)
+            if local_lang:
+                st.session_state.task_results["detect"] = ("done", local_lang)
+            else:
+                start_task("detect", "detect_language", detect_language_raw, source_text)
+        detected_lang = task_result("detect", "Language detection", keep=True)
+        if detected_lang:
             st.success(f"Detected language: {detected_lang}")
     
     with col2:
@@ -509,42 +762,37 @@ elif page == "🌐 Translation Hub":
         
         if st.button("🌐 Translate", type="primary") and source_text and target_language:
             source_lang = source_language if source_language != "Auto-detect" else "auto"
-            with st.spinner("Translating..."):
-                translated_text = translate_text(source_text, target_language, source_lang)
-                st.text_area("Translated Text", value=translated_text, height=200)
-                
-                # Option to save as entry
-                if st.button("💾 Save as Entry"):
-                    st.session_state.form_data = {
-                        'title': f"Translated: {source_text[:50]}...",
-                        'description': translated_text,
-                        'language': target_language,
-                        'category': get_categories()[0],
-                        'location_name': '',
-                        'manual_lat': 0.0,
-                        'manual_lon': 0.0
-                    }
-                    st.success("Content saved to form data! Go to Submit page to complete the entry.")
+            start_task("translate", "translate", translate_text_raw, source_text, target_language, source_lang)
+        translated_text = task_result("translate", "Translating", keep=True)
+        if translated_text:
+            st.text_area("Translated Text", value=translated_text, height=200)
+            
+            # Option to save as entry
+            if st.button("💾 Save as Entry"):
+                st.session_state.form_data = {
+                    'title': f"Translated: {source_text[:50]}...",
+                    'description': translated_text,
+                    'language': target_language,
+                    'category': get_categories()[0],
+                    'location_name': '',
+                    'manual_lat': 0.0,
+                    'manual_lon': 0.0
+                }
+                st.success("Content saved to form data! Go to Submit page to complete the entry.")
     
     # Show popular translations
     st.markdown("---")
     st.subheader("Popular Farming Terms Translation")
     
-    farming_terms = {
-        "Organic Fertilizer": "जैविक उर्वरक",
-        "Crop Rotation": "फसल चक्र",
-        "Irrigation": "सिंचाई",
-        "Pest Control": "कीट नियंत्रण",
-        "Soil Health": "मिट्टी की स्वास्थ्य",
-        "Harvest": "फसल कटाई",
-        "Seeds": "बीज",
-        "Monsoon": "मानसून"
-    }
+    glossary = get_glossary()
+    glossary_languages = [lang for lang in get_languages() if lang not in ("English", "Other")]
+    glossary_language = st.selectbox("Glossary language", glossary_languages, key="glossary_lang")
     
     cols = st.columns(4)
-    for i, (eng, hindi) in enumerate(farming_terms.items()):
+    for i, concept in enumerate(glossary.concepts):
+        english = glossary.terms(concept, "English") or [concept]
         with cols[i % 4]:
-            st.info(f"**{eng}**\n{hindi}")
+            st.info(f"**{english[0].title()}**\n{', '.join(glossary.terms(concept, glossary_language))}")
 
 # Export Data Page
 elif page == "📊 Export Data":
@@ -555,19 +803,28 @@ elif page == "📊 Export Data":
     
     with col1:
         st.subheader("Export Options")
-        export_format = st.selectbox("Format", ["JSONL", "CSV"])
-        include_media_paths = st.checkbox("Include Media File Paths", value=True)
+        export_format = st.selectbox("Format", ["JSONL", "CSV", "JSONL changes (delta sync)"])
+        bundle_media = export_format != "JSONL changes (delta sync)" and st.checkbox(
+            "Bundle Media Files (ZIP)",
+            help="One ZIP with the entries file and the images and audio it references")
+        include_media_paths = st.checkbox("Include Media File Paths", value=True, disabled=bundle_media)
         include_coordinates = st.checkbox("Include Geo-coordinates", value=True)
         
-        # Filter options
-        export_language = st.selectbox("Language Filter", ["All"] + get_languages(), key="export_lang")
-        export_category = st.selectbox("Category Filter", ["All"] + get_categories(), key="export_cat")
+        if export_format == "JSONL changes (delta sync)":
+            # Mirrors pass the sequence number they last synced to
+            since_seq = st.number_input("Changes since sequence number", min_value=0, value=0, step=1,
+                                        help=f"Current sequence number: {get_change_seq()}")
+        else:
+            # Filter options
+            export_language = st.selectbox("Language Filter", ["All"] + get_languages(), key="export_lang")
+            export_category = st.selectbox("Category Filter", ["All"] + get_categories(), key="export_cat")
     
     with col2:
         st.subheader("Export Statistics")
-        total_entries = len(st.session_state.entries)
-        entries_with_media = len([e for e in st.session_state.entries if e.get('image_path') or e.get('audio_path')])
-        entries_with_coords = len([e for e in st.session_state.entries if e.get('latitude') and e.get('longitude')])
+        all_entries = get_all_entries()
+        total_entries = len(all_entries)
+        entries_with_media = len([e for e in all_entries if e.get('image_path') or e.get('audio_path')])
+        entries_with_coords = len([e for e in all_entries if e.get('latitude') and e.get('longitude')])
         
         st.metric("Total Entries", total_entries)
         st.metric("Entries with Media", entries_with_media)
@@ -575,9 +832,18 @@ elif page == "📊 Export Data":
     
     # Export button
     if st.button("Generate Export", type="primary"):
-        if st.session_state.entries:
+        if export_format == "JSONL changes (delta sync)":
+            export_data, latest_seq = export_delta_jsonl(int(since_seq), include_media_paths, include_coordinates)
+            st.download_button(
+                label="Download Changes",
+                data=export_data,
+                file_name=f"ancestral_archive_changes_{int(since_seq)}_{latest_seq}.jsonl",
+                mime="application/json"
+            )
+            st.success(f"Changes up to sequence {latest_seq} ready. Use {latest_seq} as the starting point next time.")
+        elif total_entries:
             # Filter entries based on selection
-            filtered_entries = st.session_state.entries.copy()
+            filtered_entries = all_entries
             
             if export_language != "All":
                 filtered_entries = [e for e in filtered_entries if e.get('language') == export_language]
@@ -585,7 +851,30 @@ elif page == "📊 Export Data":
             if export_category != "All":
                 filtered_entries = [e for e in filtered_entries if e.get('category') == export_category]
             
-            if export_format == "JSONL":
+            if bundle_media:
+                # Written to disk in chunks and served by the static file handler,
+                # so the archive is never held in memory
+                progress_bar = st.progress(0.0, text="Packing media files...")
+                shown = {"percent": 0}
+                
+                def show_progress(fraction):
+                    if int(fraction * 100) != shown["percent"]:
+                        shown["percent"] = int(fraction * 100)
+                        progress_bar.progress(fraction, text=f"Packing media files... {shown['percent']}%")
+                
+                bundles = create_export_bundles(filtered_entries, export_format.lower(), include_coordinates,
+                                                progress=show_progress)
+                progress_bar.empty()
+                if len(bundles) > 1:
+                    st.info(f"The bundle is split into {len(bundles)} self-contained parts.")
+                for bundle in bundles:
+                    if st.get_option("server.enableStaticServing"):
+                        st.link_button(f"📦 Download {bundle['file_name']} ({bundle['bytes'] / 2**20:.1f} MB)",
+                                       bundle['url'])
+                    else:
+                        st.info(f"Bundle written to {bundle['path']} (enable server.enableStaticServing "
+                                f"to download it here)")
+            elif export_format == "JSONL":
                 export_data = export_to_jsonl(filtered_entries, include_media_paths, include_coordinates)
                 st.download_button(
                     label="Download JSONL",
@@ -622,15 +911,15 @@ elif page == "👤 Profile":
     
     with col2:
         st.subheader("My Contributions")
-        my_entries = [e for e in st.session_state.entries if e.get('contributor') == st.session_state.username]
+        my_entry_count = user_info.get('entries_submitted', 0)
         
-        if my_entries:
-            st.write(f"You have contributed {len(my_entries)} farming knowledge entries:")
-            for entry in my_entries[-5:]:  # Show last 5 entries
+        if my_entry_count:
+            st.write(f"You have contributed {my_entry_count} farming knowledge entries:")
+            for entry in get_user_entries(st.session_state.username, last=5):  # Show last 5 entries
                 st.write(f"• {entry.get('title', 'Untitled')} ({entry.get('category', 'Unknown')})")
             
-            if len(my_entries) > 5:
-                st.write(f"... and {len(my_entries) - 5} more entries")
+            if my_entry_count > 5:
+                st.write(f"... and {my_entry_count - 5} more entries")
         else:
             st.info("You haven't submitted any entries yet. Share your farming wisdom!")
     
@@ -658,19 +947,33 @@ elif page == "🔧 Settings":
     
     with col1:
         if st.button("Refresh Data", type="secondary"):
-            st.session_state.entries = load_entries()
+            invalidate_entry_indexes()
             st.success("Data refreshed!")
             st.rerun()
     
+        gc_dry_run = st.checkbox("Dry run (only report unused media)", value=True)
+        if st.button("Clean Up Unused Media", type="secondary"):
+            st.session_state.tasks["media_gc"] = cleanup_media_files(dry_run=gc_dry_run)
+        gc_report = task_result("media_gc", "Media cleanup")
+        if gc_report:
+            action = "Would delete" if gc_report["dry_run"] else "Deleted"
+            st.success(f"{action} {len(gc_report['deleted'])} of {gc_report['examined']} candidate files "
+                       f"({gc_report['too_young']} too recent to remove).")
+        
+        if st.button("Back Up Now", type="secondary"):
+            st.session_state.tasks["backup"] = backup_now()
+        backup_report = task_result("backup", "Backup")
+        if backup_report:
+            st.success(f"Snapshot {backup_report['id']} saved: {backup_report['files']} files, "
+                       f"{backup_report['new_bytes'] / 2**20:.1f} MB new.")
+    
     with col2:
         if st.button("Clear All Data", type="secondary"):
             if st.checkbox("I understand this will delete all entries"):
                 if st.button("Confirm Delete", type="primary"):
                     try:
-                        # Clear the entries file
-                        with open("data_entries/entries.json", "w") as f:
-                            json.dump([], f)
-                        st.session_state.entries = []
+                        # Clear the entries file (recorded as deletes in the change feed)
+                        clear_entries()
                         st.success("All data cleared!")
                         st.rerun()
                     except Exception as e:
@@ -1,42 +1,994 @@
+import io
+import copy
+import gzip
+import heapq
 import json
 import os
 import datetime
+import queue
+import threading
+import time
+import hashlib
+import zlib
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import wave
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+import numpy as np
 import pandas as pd
 import streamlit as st
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import re
+import math
+import bisect
+import sys
+from array import array
+import unicodedata
+from collections import Counter, deque
+from collections.abc import Mapping
+from functools import lru_cache
 import bcrypt
 import yaml
 # Changed from googletrans to deep_translator
 from deep_translator import GoogleTranslator, MyMemoryTranslator # GoogleTranslator is more commonly used for general translation, MyMemoryTranslator can be a fallback
 
+# Cross-process locks
+# Several Streamlit processes (replicas behind a load balancer) may share one
+# data_entries/ directory. Every read-modify-write of a shared file happens
+# under a ProcessLock: threads of one process queue on an RLock and the
+# outermost holder takes an exclusive flock on data_entries/locks/<name>.lock.
+# Without fcntl (Windows) the locks only cover the current process.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCKS_DIR = "data_entries/locks"
+
+class ProcessLock:
+    """Re-entrant lock shared by the threads of this process and by other processes."""
+
+    def __init__(self, name: str, thread_lock=None):
+        self.name = name
+        self.thread_lock = thread_lock or threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self.thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0 and fcntl is not None:
+            try:
+                os.makedirs(LOCKS_DIR, exist_ok=True)
+                fd = os.open(os.path.join(LOCKS_DIR, f"{self.name}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                self.thread_lock.release()
+                raise
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                self.thread_lock.release()
+                if blocking:
+                    raise
+                return False
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
 # Data storage functions
+# _entries_lock guards this process's entry indexes and feed state;
+# _storage_lock additionally serializes entry writes with other processes.
+_entries_lock = threading.RLock()
+_storage_lock = ProcessLock("entries", _entries_lock)
+
+ENTRIES_FILE = "data_entries/entries.json"
+ENTRY_SEGMENTS_DIR = "data_entries/entries_store"
+ENTRY_SEGMENT_SIZE = 1000         # entries per compressed segment
+
+def _write_json_atomic(path: str, data) -> None:
+    """Write JSON to a temp file and swap it in, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _write_bytes_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class JsonEntryStore:
+    """The original format: every entry in one indented entries.json list."""
+
+    def __init__(self, path: str = ENTRIES_FILE):
+        self.path = path
+
+    def load_all(self) -> List[Dict]:
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return []
+
+    def write_all(self, entries: List[Dict]) -> None:
+        _write_json_atomic(self.path, entries)
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        for entry in self.load_all():
+            if entry.get('id') == entry_id:
+                return entry
+        return None
+
+    def insert(self, entry: Dict) -> None:
+        entries = self.load_all()
+        # Sessions number entries from their own (possibly stale) list; keep ids unique
+        if entry.get('id') is None or any(e.get('id') == entry.get('id') for e in entries):
+            entry['id'] = max((e.get('id') or 0 for e in entries), default=0) + 1
+        entries.append(entry)
+        self.write_all(entries)
+
+    def replace(self, entry: Dict) -> bool:
+        entries = self.load_all()
+        for pos, stored in enumerate(entries):
+            if stored.get('id') == entry.get('id'):
+                entries[pos] = entry
+                self.write_all(entries)
+                return True
+        return False
+
+    def remove(self, entry_id: int) -> Optional[Dict]:
+        entries = self.load_all()
+        for pos, stored in enumerate(entries):
+            if stored.get('id') == entry_id:
+                del entries[pos]
+                self.write_all(entries)
+                return stored
+        return None
+
+# Compressed segment storage
+# Entries are stored in fixed-size segments, each a compressed serialized
+# list, plus a small index.json with every segment's id range. Appends and
+# updates rewrite one segment instead of the whole archive. zstd and orjson /
+# msgpack are used when installed; gzip and json are the stdlib fallbacks.
+def _default_codec() -> str:
+    try:
+        import zstandard  # noqa: F401
+        return "zstd"
+    except ImportError:
+        return "gzip"
+
+def _default_serializer() -> str:
+    try:
+        import orjson  # noqa: F401
+        return "orjson"
+    except ImportError:
+        return "json"
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    return data
+
+def _serialize(serializer: str, obj) -> bytes:
+    if serializer == "orjson":
+        import orjson
+        return orjson.dumps(obj)
+    if serializer == "msgpack":
+        import msgpack
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _deserialize(serializer: str, data: bytes):
+    if serializer == "orjson":
+        import orjson
+        return orjson.loads(data)
+    if serializer == "msgpack":
+        import msgpack
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+_segment_cache = {}               # segment path -> (mtime_ns, size, entries)
+SEGMENT_CACHE_SIZE = 8
+_segment_index_cache = {}         # index.json path -> (mtime_ns, size, index)
+
+class SegmentEntryStore:
+    """Entries split into compressed segments with a per-segment index."""
+
+    def __init__(self, directory: str = ENTRY_SEGMENTS_DIR, codec: Optional[str] = None,
+                 serializer: Optional[str] = None, segment_size: int = ENTRY_SEGMENT_SIZE):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.codec = codec
+        self.serializer = serializer
+        self.segment_size = segment_size
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path)
+
+    def _load_index(self) -> Dict:
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {
+            "format": 1,
+            "codec": self.codec or _default_codec(),
+            "serializer": self.serializer or _default_serializer(),
+            "segment_size": self.segment_size,
+            "next_segment": 1,
+            "segments": []
+        }
+
+    def _shared_index(self) -> Dict:
+        """index.json as last written, parsed once per change to the file. Do not modify it."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return self._load_index()
+        cached = _segment_index_cache.get(self.index_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        index = self._load_index()
+        _segment_index_cache[self.index_path] = (stat.st_mtime_ns, stat.st_size, index)
+        return index
+
+    def _save_index(self, index: Dict) -> None:
+        _write_json_atomic(self.index_path, index)
+        # Two writes within the file system's timestamp granularity can leave
+        # mtime and size unchanged, so this process refreshes its copy directly
+        stat = os.stat(self.index_path)
+        _segment_index_cache[self.index_path] = (stat.st_mtime_ns, stat.st_size, copy.deepcopy(index))
+
+    def _read_segment(self, meta: Dict) -> List[Dict]:
+        path = os.path.join(self.directory, meta["file"])
+        stat = os.stat(path)
+        cached = _segment_cache.pop(path, None)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            _segment_cache[path] = cached      # most recently used last
+            return cached[2]
+        with open(path, "rb") as f:
+            entries = _deserialize(meta["serializer"], _decompress(meta["codec"], f.read()))
+        if len(_segment_cache) >= SEGMENT_CACHE_SIZE:
+            _segment_cache.pop(next(iter(_segment_cache)))
+        _segment_cache[path] = (stat.st_mtime_ns, stat.st_size, entries)
+        return entries
+
+    def _write_segment(self, index: Dict, meta: Optional[Dict], entries: List[Dict]) -> None:
+        """Write entries into a segment (a new one when meta is None) and update its index record."""
+        if meta is None:
+            meta = {"file": None}
+            index["segments"].append(meta)
+        if meta["file"] is None:
+            extension = {"zstd": "zst", "gzip": "gz"}.get(index["codec"], "bin")
+            meta["file"] = f"seg-{index['next_segment']:06d}.{index['serializer']}.{extension}"
+            index["next_segment"] += 1
+        meta.update(codec=index["codec"], serializer=index["serializer"])
+
+        path = os.path.join(self.directory, meta["file"])
+        data = _compress(meta["codec"], _serialize(meta["serializer"], entries))
+        _write_bytes_atomic(path, data)
+        stat = os.stat(path)
+        _segment_cache[path] = (stat.st_mtime_ns, stat.st_size, entries)
+
+        ids = [e.get('id') for e in entries if e.get('id') is not None]
+        meta.update(count=len(entries), min_id=min(ids, default=None), max_id=max(ids, default=None),
+                    bytes=len(data))
+
+    def _segments_for(self, index: Dict, entry_id: int) -> List[Dict]:
+        return [meta for meta in index["segments"]
+                if meta["min_id"] is not None and meta["min_id"] <= entry_id <= meta["max_id"]]
+
+    def load_all(self) -> List[Dict]:
+        index = self._shared_index()
+        entries = []
+        for meta in index["segments"]:
+            entries.extend(self._read_segment(meta))
+        return entries
+
+    def write_all(self, entries: List[Dict]) -> None:
+        index = self._load_index()
+        old_files = {meta["file"] for meta in index["segments"]}
+        index["segments"] = []
+        for start in range(0, len(entries), index["segment_size"]):
+            self._write_segment(index, None, entries[start:start + index["segment_size"]])
+        self._save_index(index)
+        for name in old_files - {meta["file"] for meta in index["segments"]}:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        for meta in self._segments_for(self._shared_index(), entry_id):
+            for entry in self._read_segment(meta):
+                if entry.get('id') == entry_id:
+                    return entry
+        return None
+
+    def segment_of(self, entry_id: int) -> Optional[str]:
+        """File name of the segment holding entry_id, or None."""
+        candidates = self._segments_for(self._shared_index(), entry_id)
+        if len(candidates) == 1:
+            return candidates[0]["file"]
+        for meta in candidates:
+            if any(entry.get('id') == entry_id for entry in self._read_segment(meta)):
+                return meta["file"]
+        return None
+
+    def insert(self, entry: Dict) -> None:
+        index = self._load_index()
+        entry_id = entry.get('id')
+        if entry_id is None or self.get(entry_id) is not None:
+            entry['id'] = max((m["max_id"] for m in index["segments"] if m["max_id"] is not None), default=0) + 1
+
+        last = index["segments"][-1] if index["segments"] else None
+        if last is None or last["count"] >= index["segment_size"]:
+            self._write_segment(index, None, [entry])
+        else:
+            self._write_segment(index, last, self._read_segment(last) + [entry])
+        self._save_index(index)
+
+    def replace(self, entry: Dict) -> bool:
+        index = self._load_index()
+        for meta in self._segments_for(index, entry.get('id')):
+            entries = self._read_segment(meta)
+            for pos, stored in enumerate(entries):
+                if stored.get('id') == entry.get('id'):
+                    self._write_segment(index, meta, entries[:pos] + [entry] + entries[pos + 1:])
+                    self._save_index(index)
+                    return True
+        return False
+
+    def remove(self, entry_id: int) -> Optional[Dict]:
+        index = self._load_index()
+        for meta in self._segments_for(index, entry_id):
+            entries = self._read_segment(meta)
+            for pos, stored in enumerate(entries):
+                if stored.get('id') == entry_id:
+                    self._write_segment(index, meta, entries[:pos] + entries[pos + 1:])
+                    self._save_index(index)
+                    return stored
+        return None
+
+def get_entry_store():
+    """The active entry storage backend: compressed segments once migrated, else entries.json."""
+    segments = SegmentEntryStore()
+    return segments if segments.exists() else JsonEntryStore()
+
+def migrate_entries_to_segments(codec: Optional[str] = None, serializer: Optional[str] = None,
+                                segment_size: int = ENTRY_SEGMENT_SIZE) -> Dict:
+    """Convert entries.json into the compressed segment store.
+
+    The JSON file is kept as entries.json.migrated. Returns sizes in bytes.
+    """
+    with _storage_lock:
+        source = JsonEntryStore()
+        entries = source.load_all()
+        target = SegmentEntryStore(codec=codec, serializer=serializer, segment_size=segment_size)
+        target.write_all(entries)
+        json_bytes = os.path.getsize(source.path) if os.path.exists(source.path) else 0
+        if os.path.exists(source.path):
+            os.replace(source.path, f"{source.path}.migrated")
+        invalidate_entry_indexes()
+    segment_bytes = sum(meta["bytes"] for meta in target._load_index()["segments"])
+    return {"entries": len(entries), "json_bytes": json_bytes, "segment_bytes": segment_bytes}
+
 def load_entries() -> List[Dict]:
-    """Load entries from JSON file."""
+    """Load entries from storage (entries.json or the compressed segment store)."""
     try:
         os.makedirs("data_entries", exist_ok=True)
-        if os.path.exists("data_entries/entries.json"):
-            with open("data_entries/entries.json", "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
+        return get_entry_store().load_all()
     except Exception as e:
         st.error(f"Error loading entries: {str(e)}")
         return []
 
 def save_entry(entry: Dict) -> bool:
-    """Save a single entry to JSON file."""
+    """Save a single entry to storage."""
     try:
-        entries = load_entries()
-        entries.append(entry)
-
-        os.makedirs("data_entries", exist_ok=True)
-        with open("data_entries/entries.json", "w", encoding="utf-8") as f:
-            json.dump(entries, f, indent=2, ensure_ascii=False)
+        with _storage_lock:
+            store = get_entry_store()
+            _ensure_change_feed(store)
+            entry['version'] = _next_change_seq()
+            store.insert(entry)
+            _append_change("create", entry)
+            track_media_references(None, entry)
+            _update_entry_indexes(None, entry)
         return True
     except Exception as e:
         st.error(f"Error saving entry: {str(e)}")
         return False
 
+def update_entry(entry_id: int, fields: Dict) -> Optional[Dict]:
+    """Merge fields into a stored entry. Returns the updated entry, or None if not found."""
+    with _storage_lock:
+        store = get_entry_store()
+        _ensure_change_feed(store)
+        stored = store.get(entry_id)
+        if stored is None:
+            return None
+        previous = stored
+        entry = dict(stored, **fields)
+        entry['version'] = _next_change_seq()
+        store.replace(entry)
+        _append_change("update", entry)
+        track_media_references(previous, entry)
+        _update_entry_indexes(previous, entry)
+        return entry
+
+def delete_entry(entry_id: int) -> bool:
+    """Remove a stored entry. Returns False if it does not exist."""
+    with _storage_lock:
+        store = get_entry_store()
+        _ensure_change_feed(store)
+        entry = store.remove(entry_id)
+        if entry is None:
+            return False
+        _next_change_seq()
+        _append_change("delete", entry)
+        track_media_references(entry, None)
+        _update_entry_indexes(entry, None)
+        return True
+
+def clear_entries() -> None:
+    """Remove every stored entry, recording a delete for each in the change feed."""
+    with _storage_lock:
+        store = get_entry_store()
+        _ensure_change_feed(store)
+        entries = store.load_all()
+        store.write_all([])
+        for entry in entries:
+            _next_change_seq()
+            _append_change("delete", entry)
+            track_media_references(entry, None)
+            _update_entry_indexes(entry, None)
+
+# Change feed
+# Every create/update/delete gets a monotonically increasing sequence number
+# and is appended to changes.jsonl, so mirrors can ask for "changes since N".
+# A checkpoint of the byte offset is kept every FEED_CHECKPOINT_EVERY records,
+# which lets a reader seek close to N instead of scanning the whole log.
+CHANGES_FILE = "data_entries/changes.jsonl"
+CHANGES_CHECKPOINT_FILE = "data_entries/changes.idx"
+FEED_CHECKPOINT_EVERY = 256
+
+_feed_state = {"seq": None, "size": None, "pending": None}
+
+def _feed_size() -> int:
+    try:
+        return os.path.getsize(CHANGES_FILE)
+    except OSError:
+        return 0
+
+def _read_last_change_seq() -> int:
+    if not os.path.exists(CHANGES_FILE):
+        return 0
+    with open(CHANGES_FILE, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = pos = f.tell()
+        while pos > 0:
+            pos = max(0, pos - 4096)
+            f.seek(pos)
+            chunk = f.read(end - pos)
+            # Ignore a record another process is still appending
+            complete = chunk[:chunk.rfind(b"\n")] if b"\n" in chunk else b""
+            if b"\n" in complete or (pos == 0 and complete):
+                return json.loads(complete.rsplit(b"\n", 1)[-1])["seq"]
+            if pos == 0:
+                return 0
+    return 0
+
+def get_change_seq() -> int:
+    """Sequence number of the latest recorded change (0 if none)."""
+    with _entries_lock:
+        size = _feed_size()
+        if _feed_state["seq"] is None or _feed_state["size"] != size:
+            _feed_state["seq"], _feed_state["size"] = _read_last_change_seq(), size
+        return _feed_state["seq"]
+
+def _next_change_seq() -> int:
+    # Called with _storage_lock held; catch up with other processes' writes first
+    _sync_entry_indexes()
+    _feed_state["pending"] = get_change_seq() + 1
+    return _feed_state["pending"]
+
+def _append_change(op: str, entry: Dict) -> None:
+    seq = _feed_state["pending"]
+    record = {
+        "seq": seq,
+        "op": op,
+        "id": entry.get('id'),
+        "timestamp": datetime.datetime.now().isoformat(),
+        "entry": entry if op != "delete" else None
+    }
+    line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+    os.makedirs(os.path.dirname(CHANGES_FILE), exist_ok=True)
+    with open(CHANGES_FILE, "ab") as f:
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        f.write(line)
+    if seq % FEED_CHECKPOINT_EVERY == 1:
+        with open(CHANGES_CHECKPOINT_FILE, "a", encoding="utf-8") as f:
+            f.write(f"{seq} {offset}\n")
+    _feed_state["seq"], _feed_state["size"] = seq, offset + len(line)
+    # The write path updates this process's indexes itself; don't replay it
+    if _index_sync["offset"] == offset:
+        _index_sync["offset"] = offset + len(line)
+
+def _ensure_change_feed(store) -> None:
+    """Seed the feed with a create record per existing entry the first time it is used."""
+    if os.path.exists(CHANGES_FILE):
+        return
+    entries = store.load_all()
+    if not entries:
+        return
+    for entry in entries:
+        entry['version'] = _next_change_seq()
+        _append_change("create", entry)
+    store.write_all(entries)
+
+def get_changes_since(seq: int, limit: Optional[int] = None) -> tuple:
+    """Changes with a sequence number above seq, oldest first.
+
+    Returns (changes, latest_seq); pass latest_seq back next time to resume.
+    """
+    with _storage_lock:
+        if not os.path.exists(CHANGES_FILE):
+            _ensure_change_feed(get_entry_store())
+        latest = get_change_seq()
+    if seq >= latest:
+        return [], latest
+
+    offset = 0
+    if os.path.exists(CHANGES_CHECKPOINT_FILE):
+        with open(CHANGES_CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                checkpoint_seq, checkpoint_offset = map(int, line.split())
+                if checkpoint_seq > seq + 1:
+                    break
+                offset = checkpoint_offset
+
+    changes = []
+    with open(CHANGES_FILE, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            record = json.loads(line)
+            if record["seq"] > latest:
+                break
+            if record["seq"] > seq:
+                changes.append(record)
+                if limit is not None and len(changes) >= limit:
+                    return changes, record["seq"]
+    return changes, latest
+
+# Compact entry records
+# Indexed entries are held as slotted records instead of dicts. Fixed fields
+# live in slots, repeated values (language, category, contributor, place) are
+# interned so all records share one string object, and once the archive is in
+# the segment store long descriptions stay on disk until someone reads them.
+ENTRY_FIELDS = ('id', 'title', 'description', 'language', 'category', 'location_name',
+                'latitude', 'longitude', 'image_path', 'audio_path', 'timestamp',
+                'contributor', 'contributor_full_name', 'version')
+INTERNED_FIELDS = ('language', 'category', 'location_name', 'contributor', 'contributor_full_name')
+DESCRIPTION_INLINE_CHARS = 280    # longer descriptions are paged in from their segment
+_ENTRY_FIELD_SET = frozenset(ENTRY_FIELDS)
+_MISSING = object()               # field absent from the stored entry
+_PAGED = object()                 # description left in the segment store
+
+def _description_at_version(entry_id: int, version) -> Optional[str]:
+    """Description as of one entry version, from the change record that wrote it."""
+    if version is _MISSING or version is None:
+        return None
+    changes, _ = get_changes_since(version - 1, limit=1)
+    if changes and changes[0]["seq"] == version and changes[0]["id"] == entry_id and changes[0]["entry"]:
+        return changes[0]["entry"].get('description')
+    return None
+
+def _paged_descriptions(records: List["EntryRecord"]) -> Dict[int, Optional[str]]:
+    """Entry id -> description for paged records, reading each segment once.
+
+    A record returns the text of the version it was built from: if the stored
+    entry has moved on (a write this process has not applied yet), the text
+    comes from that version's change record instead.
+    """
+    store = SegmentEntryStore()
+    segments = {meta["file"]: meta for meta in store._shared_index()["segments"]}
+    by_segment = {}
+    for record in records:
+        if record._segment not in segments:
+            record._segment = store.segment_of(record.id)
+        by_segment.setdefault(record._segment, []).append(record)
+
+    descriptions = {}
+    for name, group in by_segment.items():
+        stored = {}
+        if name is not None:
+            wanted = {record.id for record in group}
+            stored = {entry.get('id'): entry for entry in store._read_segment(segments[name])
+                      if entry.get('id') in wanted}
+        for record in group:
+            entry = stored.get(record.id)
+            if entry is not None and (record.version is _MISSING or entry.get('version') == record.version):
+                descriptions[record.id] = entry.get('description')
+            else:
+                descriptions[record.id] = _description_at_version(record.id, record.version)
+    return descriptions
+
+def load_descriptions(entries: List[Dict]) -> List[Optional[str]]:
+    """Descriptions of many entries at once; paged-out ones cost one read per segment."""
+    paged = [entry for entry in entries if isinstance(entry, EntryRecord) and entry.description is _PAGED]
+    found = _paged_descriptions(paged) if paged else {}
+    return [found[entry.id] if isinstance(entry, EntryRecord) and entry.description is _PAGED
+            else entry.get('description') for entry in entries]
+
+def iter_descriptions(entries: List[Dict], batch_size: int = ENTRY_SEGMENT_SIZE):
+    """Yield each entry's description in order, loading paged ones a batch at a time."""
+    for start in range(0, len(entries), batch_size):
+        yield from load_descriptions(entries[start:start + batch_size])
+
+def iter_loaded_entries(entries: List[Dict], batch_size: int = ENTRY_SEGMENT_SIZE):
+    """Yield entries with their descriptions in memory; paged records come out as plain dicts."""
+    entries = list(entries)
+    for entry, description in zip(entries, iter_descriptions(entries, batch_size)):
+        if isinstance(entry, EntryRecord) and entry.description is _PAGED:
+            yield entry.to_dict(description)
+        else:
+            yield entry
+
+class EntryRecord(Mapping):
+    """Read-only, dict-compatible view of one stored entry.
+
+    Supports entry['field'], entry.get(), `in`, keys()/items() and dict(entry),
+    so code written against plain entry dicts keeps working. Use to_dict()
+    for a mutable copy or before serializing.
+    """
+
+    __slots__ = ENTRY_FIELDS + ('_extra', '_segment')
+
+    def __init__(self, entry: Dict, page_description: bool = False):
+        for field in ENTRY_FIELDS:
+            value = entry.get(field, _MISSING)
+            if field in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, field, value)
+        if page_description and isinstance(self.description, str) \
+                and len(self.description) > DESCRIPTION_INLINE_CHARS:
+            self.description = _PAGED
+        self._segment = None      # resolved on first read of a paged description
+        self._extra = {key: value for key, value in entry.items() if key not in _ENTRY_FIELD_SET} or None
+
+    def __getitem__(self, key):
+        if key in _ENTRY_FIELD_SET:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            if value is _PAGED:
+                return _paged_descriptions([self])[self.id]
+            return value
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        if key in _ENTRY_FIELD_SET:
+            return getattr(self, key) is not _MISSING
+        return bool(self._extra) and key in self._extra
+
+    def __iter__(self):
+        for field in ENTRY_FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"EntryRecord(id={self.id!r}, title={self.title!r})"
+
+    def to_dict(self, description=_MISSING) -> Dict:
+        """Mutable copy; pass an already loaded description to skip paging it in."""
+        if description is _MISSING:
+            return dict(self.items())
+        return {key: description if key == 'description' else self[key] for key in self}
+
+# Entry indexes
+# Secondary indexes over the stored entries. They are shared by every session
+# in the process, built lazily from disk on first use and then kept current
+# by the write path. Indexed entries are shared objects: treat them as read-only.
+# Writes made by other processes are picked up from the change feed: every
+# read first applies any feed records appended since the indexes were current.
+_entry_indexes = []
+_indexes_ready = False
+_index_sync = {"offset": 0}       # bytes of changes.jsonl already reflected in the indexes
+
+def register_entry_index(index):
+    """Register an object with rebuild(entries), add(entry) and remove(entry) methods."""
+    with _entries_lock:
+        _entry_indexes.append(index)
+        if _indexes_ready:
+            index.rebuild(load_entries())
+    return index
+
+def ensure_entry_indexes() -> None:
+    """Build all registered indexes from disk, or bring them up to date with the change feed."""
+    global _indexes_ready
+    with _entries_lock:
+        if _indexes_ready:
+            _sync_entry_indexes()
+            return
+        with _storage_lock:
+            entries = load_entries()
+            _index_sync["offset"] = _feed_size()
+        for index in _entry_indexes:
+            index.rebuild(entries)
+        _indexes_ready = True
+
+def _sync_entry_indexes() -> None:
+    """Apply feed records appended by other processes since the indexes were last current."""
+    global _indexes_ready
+    if not _indexes_ready:
+        return
+    offset, size = _index_sync["offset"], _feed_size()
+    if size == offset:
+        return
+    if size < offset:
+        # The feed was replaced underneath us; start over from storage
+        _indexes_ready = False
+        ensure_entry_indexes()
+        return
+    with open(CHANGES_FILE, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            record = json.loads(line)
+            _update_entry_indexes(_entry_lookup.by_id.get(record["id"]), record["entry"])
+    _index_sync["offset"] = offset
+
+def invalidate_entry_indexes() -> None:
+    """Force a rebuild on next use (after storage was replaced outside save/update)."""
+    global _indexes_ready
+    with _entries_lock:
+        _indexes_ready = False
+
+def _update_entry_indexes(old_entry: Optional[Dict], new_entry: Optional[Dict]) -> None:
+    if not _indexes_ready:
+        return
+    for index in _entry_indexes:
+        if old_entry is not None:
+            index.remove(old_entry)
+        if new_entry is not None:
+            index.add(new_entry)
+
+class EntryLookup:
+    """Entry id -> EntryRecord, plus a cached id-ordered list of all records."""
+
+    def __init__(self):
+        self.by_id = {}
+        self.page_descriptions = False
+        self._ordered = None
+
+    def rebuild(self, entries: List[Dict]) -> None:
+        self.page_descriptions = isinstance(get_entry_store(), SegmentEntryStore)
+        self.by_id = {entry.get('id'): EntryRecord(entry, self.page_descriptions) for entry in entries}
+        self._ordered = None
+
+    def add(self, entry: Dict) -> None:
+        self.by_id[entry.get('id')] = EntryRecord(entry, self.page_descriptions)
+        self._ordered = None
+
+    def remove(self, entry: Dict) -> None:
+        self.by_id.pop(entry.get('id'), None)
+        self._ordered = None
+
+    def ordered(self) -> List[EntryRecord]:
+        if self._ordered is None:
+            self._ordered = sorted(self.by_id.values(), key=lambda record: record.id)
+        return self._ordered
+
+_entry_lookup = register_entry_index(EntryLookup())
+
+def get_entry(entry_id: int) -> Optional[EntryRecord]:
+    """Look up a stored entry by id."""
+    ensure_entry_indexes()
+    return _entry_lookup.by_id.get(entry_id)
+
+def get_all_entries() -> List[EntryRecord]:
+    """Every stored entry in id order. Records are shared by all sessions: read-only."""
+    ensure_entry_indexes()
+    with _entries_lock:
+        return list(_entry_lookup.ordered())
+
+class ContributorIndex:
+    """Contributor username -> sorted list of their entry ids."""
+
+    def __init__(self):
+        self.by_contributor = {}
+
+    def rebuild(self, entries: List[Dict]) -> None:
+        self.by_contributor = {}
+        for entry in entries:
+            if entry.get('contributor'):
+                self.by_contributor.setdefault(entry['contributor'], []).append(entry.get('id'))
+        for ids in self.by_contributor.values():
+            ids.sort()
+
+    def add(self, entry: Dict) -> None:
+        if entry.get('contributor'):
+            bisect.insort(self.by_contributor.setdefault(entry['contributor'], []), entry.get('id'))
+
+    def remove(self, entry: Dict) -> None:
+        ids = self.by_contributor.get(entry.get('contributor'))
+        if ids:
+            pos = bisect.bisect_left(ids, entry.get('id'))
+            if pos < len(ids) and ids[pos] == entry.get('id'):
+                del ids[pos]
+
+_contributor_index = register_entry_index(ContributorIndex())
+
+def get_user_entry_count(username: str) -> int:
+    """Number of stored entries contributed by a user."""
+    ensure_entry_indexes()
+    return len(_contributor_index.by_contributor.get(username, []))
+
+def get_user_entries(username: str, last: Optional[int] = None) -> List[Dict]:
+    """A user's entries in submission order; last=n returns only the n most recent."""
+    ensure_entry_indexes()
+    with _entries_lock:
+        ids = _contributor_index.by_contributor.get(username, [])
+        if last is not None:
+            ids = ids[-last:] if last > 0 else []
+        return [_entry_lookup.by_id[entry_id] for entry_id in ids]
+
+# Browse sort orders
+# Every (language, category) bucket, including the "any language" and "any
+# category" wildcards, keeps its entry ids pre-sorted by timestamp and by
+# casefolded title. Browse pages walk one bucket from a cursor, so a page of
+# "Newest First, Tamil, Pest Control" never touches non-matching entries.
+BROWSE_SORTS = {
+    "Newest First": ("timestamp", True),
+    "Oldest First": ("timestamp", False),
+    "Title A-Z": ("title", False)
+}
+
+def _browse_sort_keys(entry: Dict) -> Dict[str, tuple]:
+    return {
+        "timestamp": (entry.get('timestamp') or '', entry.get('id')),
+        "title": ((entry.get('title') or '').casefold(), entry.get('id'))
+    }
+
+def _browse_buckets(entry: Dict) -> List[tuple]:
+    language, category = entry.get('language'), entry.get('category')
+    return [(None, None), (language, None), (None, category), (language, category)]
+
+class BrowseIndex:
+    """(language, category) bucket -> sort name -> sorted (sort key, entry id) list."""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def rebuild(self, entries: List[Dict]) -> None:
+        self.buckets = {}
+        for entry in entries:
+            keys = _browse_sort_keys(entry)
+            for bucket in _browse_buckets(entry):
+                orders = self.buckets.setdefault(bucket, {"timestamp": [], "title": []})
+                for name, key in keys.items():
+                    orders[name].append(key)
+        for orders in self.buckets.values():
+            for keys in orders.values():
+                keys.sort()
+
+    def add(self, entry: Dict) -> None:
+        keys = _browse_sort_keys(entry)
+        for bucket in _browse_buckets(entry):
+            orders = self.buckets.setdefault(bucket, {"timestamp": [], "title": []})
+            for name, key in keys.items():
+                bisect.insort(orders[name], key)
+
+    def remove(self, entry: Dict) -> None:
+        keys = _browse_sort_keys(entry)
+        for bucket in _browse_buckets(entry):
+            orders = self.buckets.get(bucket)
+            if not orders:
+                continue
+            for name, key in keys.items():
+                pos = bisect.bisect_left(orders[name], key)
+                if pos < len(orders[name]) and orders[name][pos] == key:
+                    del orders[name][pos]
+            if not orders["timestamp"]:
+                del self.buckets[bucket]
+
+_browse_index = register_entry_index(BrowseIndex())
+
+def count_entries(language: str = None, category: str = None) -> int:
+    """Number of stored entries matching the language/category filters."""
+    ensure_entry_indexes()
+    orders = _browse_index.buckets.get((language, category))
+    return len(orders["timestamp"]) if orders else 0
+
+def get_archive_stats() -> Dict[str, int]:
+    """Entry, language and category totals read straight from the bucket index."""
+    ensure_entry_indexes()
+    with _entries_lock:
+        buckets = list(_browse_index.buckets)
+    return {
+        "entries": count_entries(),
+        "languages": sum(1 for lang, cat in buckets if lang is not None and cat is None),
+        "categories": sum(1 for lang, cat in buckets if lang is None and cat is not None)
+    }
+
+def browse_entries(language: str = None, category: str = None, sort_by: str = "Newest First",
+                   cursor: Optional[list] = None, limit: int = 20) -> tuple:
+    """One page of entries in the requested order.
+
+    Returns (entries, next_cursor). Pass next_cursor back to get the following
+    page; it is None once the listing is exhausted. Cursors are the sort key
+    of the last entry shown, so pages stay stable while new entries arrive.
+    """
+    ensure_entry_indexes()
+    order, descending = BROWSE_SORTS[sort_by]
+    with _entries_lock:
+        orders = _browse_index.buckets.get((language, category))
+        keys = orders[order] if orders else []
+        if descending:
+            end = bisect.bisect_left(keys, tuple(cursor)) if cursor is not None else len(keys)
+            page_keys = keys[max(0, end - limit):end][::-1]
+            has_more = end - limit > 0
+        else:
+            start = bisect.bisect_right(keys, tuple(cursor)) if cursor is not None else 0
+            page_keys = keys[start:start + limit]
+            has_more = start + limit < len(keys)
+        page = [_entry_lookup.by_id[entry_id] for _, entry_id in page_keys]
+
+    next_cursor = list(page_keys[-1]) if page_keys and has_more else None
+    return page, next_cursor
+
+def iter_entries(language: str = None, category: str = None, sort_by: str = "Newest First",
+                 page_size: int = 500):
+    """Yield every matching entry in order, a page at a time."""
+    cursor = None
+    while True:
+        page, cursor = browse_entries(language, category, sort_by, cursor, page_size)
+        yield from page
+        if cursor is None:
+            return
+
 # Category and language definitions
 def get_categories() -> List[str]:
     """Get list of available categories."""
@@ -72,224 +1024,1748 @@ def get_languages() -> List[str]:
         "Other" # 'Assamese', 'Nepali', 'Sanskrit' removed due to limited deep_translator support or common use cases, can be added back if needed
     ]
 
-# Text-to-Speech functionality
-def text_to_speech(text: str, language: str = "en") -> None:
-    """Convert text to speech using gTTS."""
+# Text-to-Speech functionality
+# Map language names to gTTS language codes
+TTS_LANG_CODES = {
+    "English": "en",
+    "Hindi": "hi",
+    "Bengali": "bn",
+    "Telugu": "te",
+    "Marathi": "mr",
+    "Tamil": "ta",
+    "Gujarati": "gu",
+    "Urdu": "ur",
+    "Kannada": "kn",
+    "Malayalam": "ml",
+    "Punjabi": "pa",
+    "Oriya": "or", # Added for completeness if gTTS supports
+    # "Assamese": "as", # gTTS might not support
+    # "Nepali": "ne", # gTTS might not support
+    "Sanskrit": "sa" # gTTS might have limited support
+}
+
+def synthesize_speech(text: str, language: str = "en") -> bytes:
+    """Render text to MP3 bytes with gTTS. Raises on failure (no Streamlit output)."""
+    from gtts import gTTS
+
+    lang_code = TTS_LANG_CODES.get(language, "en")
+    tts = gTTS(text=text, lang=lang_code, slow=False)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
+        tmp_name = tmp_file.name
+    try:
+        tts.save(tmp_name)
+        with open(tmp_name, "rb") as audio_file:
+            return audio_file.read()
+    finally:
+        os.unlink(tmp_name)
+
+def text_to_speech(text: str, language: str = "en") -> None:
+    """Convert text to speech using gTTS."""
+    try:
+        # pygame is for local playback, not typically needed in Streamlit Cloud/Spaces
+        st.audio(synthesize_speech(text, language), format="audio/mp3")
+    except ImportError:
+        st.error("Text-to-speech library not available. Please ensure 'gtts' is installed.")
+    except Exception as e:
+        st.error(f"Error in text-to-speech: {str(e)}")
+
+# Speech-to-Text functionality
+# Map language names to speech recognition language codes (Google Web Speech API)
+STT_LANG_CODES = {
+    "English": "en-IN",
+    "Hindi": "hi-IN",
+    "Bengali": "bn-IN",
+    "Telugu": "te-IN",
+    "Marathi": "mr-IN",
+    "Tamil": "ta-IN",
+    "Gujarati": "gu-IN",
+    "Urdu": "ur-IN",
+    "Kannada": "kn-IN",
+    "Malayalam": "ml-IN",
+    "Punjabi": "pa-IN",
+    "Oriya": "or-IN" # Assuming Indian dialect code exists
+}
+
+def recognize_microphone(language: str = "en") -> str:
+    """Record one phrase from the microphone and transcribe it. Raises on failure."""
+    import speech_recognition as sr
+
+    lang_code = STT_LANG_CODES.get(language, "en-IN")
+
+    # Initialize recognizer
+    r = sr.Recognizer()
+
+    # Use microphone as source (This will only work in a local environment with mic access)
+    with sr.Microphone() as source:
+        # Adjust for ambient noise
+        r.adjust_for_ambient_noise(source)
+
+        # Listen for audio
+        audio = r.listen(source, timeout=5, phrase_time_limit=10)
+
+        # Recognize speech
+        return r.recognize_google(audio, language=lang_code)
+
+def speech_to_text(language: str = "en") -> Optional[str]:
+    """Convert speech to text using speech recognition."""
+    try:
+        import speech_recognition as sr
+    except ImportError:
+        st.error("Speech recognition library not available. Please ensure 'SpeechRecognition' is installed.")
+        return None
+
+    try:
+        # For deployment on Hugging Face Spaces, direct microphone access is typically not available
+        # You might need to consider a different STT approach for cloud deployment (e.g., pre-recorded audio upload, or a paid STT API)
+        st.warning("Microphone input for Speech-to-Text may not work in deployed environments like Hugging Face Spaces.")
+        st.info("Listening... Speak now!")
+        return recognize_microphone(language)
+    except sr.UnknownValueError:
+        st.error("Could not understand audio. Please try again or speak more clearly.")
+        return None
+    except sr.RequestError as e:
+        st.error(f"Speech recognition service error (check internet/API): {str(e)}")
+        return None
+    except Exception as e:
+        st.error(f"An unexpected error occurred in speech recognition: {str(e)}")
+        return None
+
+# Uploaded-audio transcription
+# Long recordings are split on silence and the chunks are transcribed in
+# parallel by a pluggable recognizer; transcripts are cached by audio hash.
+TRANSCRIPTS_DIR = "data_entries/transcripts"
+TRANSCRIBE_RECOGNIZER = "google"
+TRANSCRIBE_WORKERS = 4
+SILENCE_FRAME_MS = 30
+SILENCE_DB_BELOW_PEAK = 30        # frames this far below the loudest frame count as silence
+MIN_SILENCE_MS = 500
+MAX_CHUNK_SECONDS = 30            # keeps each request within recognizer limits
+
+_transcribers = {}
+
+def register_transcriber(name: str, fn) -> None:
+    """Register fn(pcm16_bytes, sample_rate, language) -> str as a recognizer."""
+    _transcribers[name] = fn
+
+def _google_transcriber(pcm: bytes, sample_rate: int, language: str) -> str:
+    import speech_recognition as sr
+
+    try:
+        return sr.Recognizer().recognize_google(sr.AudioData(pcm, sample_rate, 2),
+                                                language=STT_LANG_CODES.get(language, "en-IN"))
+    except sr.UnknownValueError:
+        return ""
+
+def _stub_transcriber(pcm: bytes, sample_rate: int, language: str) -> str:
+    """Offline stand-in for tests: describes the chunk instead of recognizing it."""
+    return f"[{language} speech {len(pcm) / 2 / sample_rate:.1f}s]"
+
+register_transcriber("google", _google_transcriber)
+register_transcriber("stub", _stub_transcriber)
+
+def load_audio_pcm(path: str) -> tuple:
+    """Decode an audio file to (mono int16 numpy array, sample_rate).
+
+    WAV is read with the standard library; other formats need pydub + ffmpeg.
+    Raises ValueError for formats that cannot be decoded here.
+    """
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            rate, width, channels = wav.getframerate(), wav.getsampwidth(), wav.getnchannels()
+            raw = wav.readframes(wav.getnframes())
+        if width == 1:
+            samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8
+        elif width == 2:
+            samples = np.frombuffer(raw, dtype="<i2")
+        elif width == 3:
+            padded = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+            samples = (padded[:, 2].astype(np.int8).astype(np.int16) << 8) | padded[:, 1]
+        elif width == 4:
+            samples = (np.frombuffer(raw, dtype="<i4") >> 16).astype(np.int16)
+        else:
+            raise ValueError(f"Unsupported WAV sample width: {width}")
+    else:
+        try:
+            from pydub import AudioSegment
+        except ImportError:
+            raise ValueError("Only WAV audio can be transcribed without 'pydub' installed.")
+        segment = AudioSegment.from_file(path).set_sample_width(2)
+        rate, channels = segment.frame_rate, segment.channels
+        samples = np.frombuffer(segment.raw_data, dtype="<i2")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples.astype(np.int16), rate
+
+def split_on_silence(samples, sample_rate: int) -> List[tuple]:
+    """Return (start, end) sample ranges of speech, cut in the middle of pauses."""
+    frame = max(1, int(sample_rate * SILENCE_FRAME_MS / 1000))
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    frames = samples[:n_frames * frame].astype(np.float64).reshape(n_frames, frame)
+    rms = np.sqrt((frames ** 2).mean(axis=1))
+    peak = rms.max()
+    if peak == 0:
+        return []
+    voiced = rms > peak * 10 ** (-SILENCE_DB_BELOW_PEAK / 20)
+
+    # Group voiced frames; pauses shorter than MIN_SILENCE_MS stay inside a chunk
+    min_gap = max(1, MIN_SILENCE_MS // SILENCE_FRAME_MS)
+    max_frames = max(1, int(MAX_CHUNK_SECONDS * 1000 / SILENCE_FRAME_MS))
+    chunks = []
+    start = end = None
+    for i in np.flatnonzero(voiced):
+        if start is None:
+            start = end = i
+        elif i - end > min_gap or i - start >= max_frames:
+            chunks.append((start, end + 1))
+            start = end = i
+        else:
+            end = i
+    if start is not None:
+        chunks.append((start, end + 1))
+
+    # Cut halfway into the surrounding silence so words are not clipped
+    ranges = []
+    for idx, (a, b) in enumerate(chunks):
+        lo = (chunks[idx - 1][1] + a) // 2 if idx else 0
+        hi = (b + chunks[idx + 1][0]) // 2 * frame if idx + 1 < len(chunks) else len(samples)
+        ranges.append((int(lo * frame), int(hi)))
+    return ranges
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def transcribe_audio_file(path: str, language: str = "English",
+                          recognizer: Optional[str] = None) -> str:
+    """Transcribe a stored audio file. Raises ValueError for undecodable formats.
+
+    The recognizer defaults to TRANSCRIBE_RECOGNIZER as set at call time.
+    """
+    recognizer = recognizer or TRANSCRIBE_RECOGNIZER
+    audio_hash = _file_sha256(path)
+    cache_path = os.path.join(TRANSCRIPTS_DIR, f"{audio_hash}.json")
+    cache_key = f"{recognizer}:{language}"
+    cached = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cache_key in cached:
+            return cached[cache_key]
+
+    transcribe = _transcribers[recognizer]
+    samples, rate = load_audio_pcm(path)
+    ranges = split_on_silence(samples, rate)
+    with ThreadPoolExecutor(max_workers=TRANSCRIBE_WORKERS, thread_name_prefix="fwa-stt") as pool:
+        pieces = list(pool.map(lambda r: transcribe(samples[r[0]:r[1]].tobytes(), rate, language), ranges))
+
+    text = " ".join(piece.strip() for piece in pieces if piece and piece.strip())
+    cached[cache_key] = text
+    _write_json_atomic(cache_path, cached)
+    return text
+
+def stitch_transcript(entry: Dict, transcript: str) -> Dict:
+    """Fields that append a transcript to an entry's description (only once)."""
+    description = entry.get('description', '')
+    if transcript and entry.get('transcript') is None:
+        description = f"{description}\n\n[Audio transcript]\n{transcript}".strip()
+    return {'description': description, 'transcript': transcript}
+
+# Geocoding functionality
+GEOCODE_TIMEOUT = 10
+def geocode_location_raw(location_name: str) -> Optional[tuple]:
+    """Look up coordinates with Nominatim. Raises on network/library errors."""
+    from geopy.geocoders import Nominatim
+
+    # Initialize geolocator with a user_agent
+    geolocator = Nominatim(user_agent="farming-wisdom-archive-app") # Changed user_agent
+    location = geolocator.geocode(location_name, timeout=GEOCODE_TIMEOUT)
+
+    if location:
+        return (location.latitude, location.longitude)
+    return None
+
+def geocode_location(location_name: str) -> Optional[tuple]:
+    """Get coordinates for a location name using Nominatim."""
+    try:
+        return geocode_location_raw(location_name)
+    except ImportError:
+        st.error("Geocoding library not available. Please ensure 'geopy' is installed.")
+        return None
+    except Exception as e:
+        st.error(f"Error in geocoding: {str(e)}")
+        return None
+
+# Farming glossary
+# glossary.yaml lists each farming concept with its terms in every supported
+# language. All terms are compiled into one Aho-Corasick automaton, so finding
+# every known term in a text is a single pass however large the glossary is.
+GLOSSARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "glossary.yaml")
+GLOSSARY_WHOLE_WORD_CHARS = 3     # terms this short must match a whole word
+GLOSSARY_MAX_EXPANSIONS = 64      # cap on the phrasings expand_query() returns
+
+def _fold_case(text: str) -> str:
+    """Lowercase text without changing its length, so offsets stay valid."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+def _is_word_char(char: str) -> bool:
+    # Indic vowel signs and viramas are marks, not letters, but belong to the word
+    return char.isalnum() or unicodedata.category(char).startswith("M")
+
+class TermAutomaton:
+    """Aho-Corasick automaton over (term, payload) pairs, matched case-insensitively."""
+
+    def __init__(self, terms):
+        self.goto = [{}]          # state -> {char: next state}
+        self.fail = [0]
+        self.out = [[]]           # state -> [(term length, payload)] ending here
+        for term, payload in terms:
+            term = _fold_case(term)
+            state = 0
+            for char in term:
+                if char not in self.goto[state]:
+                    self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = self.goto[state][char]
+            self.out[state].append((len(term), payload))
+
+        frontier = deque(self.goto[0].values())
+        while frontier:
+            state = frontier.popleft()
+            for char, child in self.goto[state].items():
+                frontier.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text: str, accept=None) -> List[tuple]:
+        """Non-overlapping (start, end, payload) matches, preferring leftmost then longest.
+
+        accept(text, start, end) can veto a candidate (e.g. for word boundaries).
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        candidates = []
+        state = 0
+        for end, char in enumerate(_fold_case(text), 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in out[state]:
+                candidates.append((end - length, end, payload))
+
+        candidates.sort(key=lambda match: (match[0], match[0] - match[1]))
+        matches, covered = [], 0
+        for start, end, payload in candidates:
+            if start >= covered and (accept is None or accept(text, start, end)):
+                matches.append((start, end, payload))
+                covered = end
+        return matches
+
+def _glossary_boundary(text: str, start: int, end: int) -> bool:
+    if start > 0 and _is_word_char(text[start - 1]):
+        return False
+    if end < len(text):
+        following = text[end]
+        # Never split a letter from its vowel sign; short terms must end the word
+        if unicodedata.category(following).startswith("M"):
+            return False
+        if end - start <= GLOSSARY_WHOLE_WORD_CHARS and _is_word_char(following):
+            return False
+    return True
+
+class Glossary:
+    """Farming concepts, their terms per language, and an automaton over all terms."""
+
+    def __init__(self, concepts: Dict[str, Dict[str, List[str]]]):
+        self.concepts = concepts
+        self.automaton = TermAutomaton(
+            (term, concept)
+            for concept, languages in concepts.items()
+            for terms in languages.values()
+            for term in terms
+        )
+
+    def terms(self, concept: str, language: Optional[str] = None) -> List[str]:
+        """Terms for a concept, in one language or in all of them."""
+        languages = self.concepts.get(concept, {})
+        if language is not None:
+            return list(languages.get(language, []))
+        return [term for terms in languages.values() for term in terms]
+
+    def find(self, text: str) -> List[tuple]:
+        """(start, end, concept) for every glossary term in the text."""
+        return self.automaton.find(text, _glossary_boundary) if text else []
+
+def load_glossary(path: str = GLOSSARY_FILE) -> Glossary:
+    """Read and compile a glossary file."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    concepts = {
+        concept: {language: [terms] if isinstance(terms, str) else list(terms)
+                  for language, terms in (languages or {}).items()}
+        for concept, languages in (data.get("concepts") or {}).items()
+    }
+    return Glossary(concepts)
+
+@lru_cache(maxsize=1)
+def get_glossary() -> Glossary:
+    """The shipped glossary, compiled once per process."""
+    try:
+        return load_glossary()
+    except (OSError, yaml.YAMLError):
+        return Glossary({})
+
+def highlight_terms(text: str, template: str = ":green-background[{}]") -> tuple:
+    """Mark glossary terms in text for st.markdown.
+
+    Returns (marked_text, concepts), concepts being the distinct concept ids
+    found, in order of first appearance.
+    """
+    if not text:
+        return text, []
+    parts, concepts, last = [], [], 0
+    for start, end, concept in get_glossary().find(text):
+        parts.append(text[last:start])
+        parts.append(template.format(text[start:end]))
+        last = end
+        if concept not in concepts:
+            concepts.append(concept)
+    parts.append(text[last:])
+    return "".join(parts), concepts
+
+def expand_query(query: str) -> List[str]:
+    """The query plus variants with each glossary term swapped for its translations.
+
+    "irrigation" also yields "सिंचाई", "সেচ", ... so search matches entries
+    written in any language without a network translation.
+    """
+    glossary = get_glossary()
+    phrasings = [query]
+    for start, end, concept in glossary.find(query):
+        for term in glossary.terms(concept):
+            variant = query[:start] + term + query[end:]
+            if variant not in phrasings:
+                phrasings.append(variant)
+                if len(phrasings) >= GLOSSARY_MAX_EXPANSIONS:
+                    return phrasings
+    return phrasings
+
+# Search functionality
+def _entry_passes_filters(entry: Dict, language: str = None, category: str = None,
+                          has_media: bool = False, has_location: bool = False) -> bool:
+    if language and entry.get('language') != language:
+        return False
+    
+    if category and entry.get('category') != category:
+        return False
+    
+    if has_media and not (entry.get('image_path') or entry.get('audio_path')):
+        return False
+    
+    if has_location and not (entry.get('latitude') and entry.get('longitude')):
+        return False
+    return True
+
+def entry_matches(entry: Dict, query: Union[str, List[str]] = "", language: str = None,
+                  category: str = None, has_media: bool = False,
+                  has_location: bool = False) -> bool:
+    """Check one entry against the search query and filters.
+
+    query may also be a list of alternative phrasings (see expand_query);
+    the entry matches if any of them does.
+    """
+    # Apply filters first: they are cheap, a paged-out description is not
+    if not _entry_passes_filters(entry, language, category, has_media, has_location):
+        return False
+    
+    # Text search in title and description
+    phrasings = [q.lower() for q in ([query] if isinstance(query, str) else query)]
+    if not all(phrasings):
+        return True
+    title = entry.get('title', '').lower()
+    if any(phrasing in title for phrasing in phrasings):
+        return True
+    description = entry.get('description', '').lower()
+    return any(phrasing in description for phrasing in phrasings)
+
+def search_entries(entries: List[Dict], query: str, language: str = None, 
+                   category: str = None, has_media: bool = False, 
+                   has_location: bool = False, expand_terms: bool = True) -> List[Dict]:
+    """Search entries based on query and filters.
+
+    With expand_terms, glossary terms in the query also match their
+    translations in every language. Descriptions are only loaded for entries
+    whose filters and title did not already decide, in one batched read.
+    """
+    query = expand_query(query) if expand_terms and query else query
+    phrasings = [q.lower() for q in ([query] if isinstance(query, str) else query)]
+    filtered = [entry for entry in entries
+                if _entry_passes_filters(entry, language, category, has_media, has_location)]
+    if not all(phrasings):
+        return filtered
+
+    matched = set()
+    undecided = []
+    for pos, entry in enumerate(filtered):
+        title = (entry.get('title') or '').lower()
+        if any(phrasing in title for phrasing in phrasings):
+            matched.add(pos)
+        else:
+            undecided.append(pos)
+    descriptions = load_descriptions([filtered[pos] for pos in undecided])
+    for pos, description in zip(undecided, descriptions):
+        description = (description or '').lower()
+        if any(phrasing in description for phrasing in phrasings):
+            matched.add(pos)
+    return [entry for pos, entry in enumerate(filtered) if pos in matched]
+
+# Fuzzy and transliteration-aware search
+# Native-script text and romanized input are both reduced to a Latin
+# "sound key" per word, so "jaivik khad" and "जैविक खाद" share keys. The Indic
+# Unicode blocks (Devanagari to Malayalam) follow one ISCII-derived layout, so
+# one offset table transliterates all of them. Typo tolerance comes from a
+# trigram index over the distinct word keys: only words sharing trigrams with
+# the query are compared by edit distance, never every entry.
+INDIC_BLOCKS = range(0x0900, 0x0D80, 0x80)
+INDIC_INDEPENDENT_VOWELS = {0x05: "a", 0x06: "aa", 0x07: "i", 0x08: "ii", 0x09: "u", 0x0A: "uu", 0x0B: "ri",
+                            0x0C: "li", 0x0D: "e", 0x0E: "e", 0x0F: "e", 0x10: "ai", 0x11: "o", 0x12: "o",
+                            0x13: "o", 0x14: "au", 0x60: "ri", 0x61: "li"}
+INDIC_CONSONANTS = dict(zip(range(0x15, 0x3A), [
+    "k", "kh", "g", "gh", "n", "ch", "chh", "j", "jh", "n", "t", "th", "d", "dh", "n", "t", "th", "d", "dh",
+    "n", "n", "p", "ph", "b", "bh", "m", "y", "r", "r", "l", "l", "l", "v", "sh", "sh", "s", "h"]))
+INDIC_CONSONANTS.update({0x58: "k", 0x59: "kh", 0x5A: "g", 0x5B: "z", 0x5C: "r", 0x5D: "rh", 0x5E: "f", 0x5F: "y"})
+INDIC_VOWEL_SIGNS = {0x3E: "aa", 0x3F: "i", 0x40: "ii", 0x41: "u", 0x42: "uu", 0x43: "ri", 0x44: "ri", 0x45: "e",
+                     0x46: "e", 0x47: "e", 0x48: "ai", 0x49: "o", 0x4A: "o", 0x4B: "o", 0x4C: "au", 0x57: "au",
+                     0x62: "li", 0x63: "li"}
+INDIC_SIGNS = {0x01: "n", 0x02: "n", 0x03: "h", 0x3C: "", 0x3D: ""}   # candrabindu, anusvara, visarga, nukta, avagraha
+INDIC_VIRAMA = 0x4D
+URDU_LETTERS = {
+    "ا": "a", "آ": "a", "ب": "b", "پ": "p", "ت": "t", "ٹ": "t", "ث": "s", "ج": "j", "چ": "ch", "ح": "h",
+    "خ": "kh", "د": "d", "ڈ": "d", "ذ": "z", "ر": "r", "ڑ": "r", "ز": "z", "ژ": "zh", "س": "s", "ش": "sh",
+    "ص": "s", "ض": "z", "ط": "t", "ظ": "z", "ع": "", "غ": "gh", "ف": "f", "ق": "q", "ک": "k", "ك": "k",
+    "گ": "g", "ل": "l", "م": "m", "ن": "n", "ں": "n", "و": "o", "ہ": "h", "ھ": "h", "ء": "", "ی": "i",
+    "ي": "i", "ے": "e", "ئ": "i"
+}
+# Ordered rewrites that make spelling variants collide: aspiration, long
+# vowels, diphthongs and doubled letters are folded, and a word-final
+# inherent "a" is dropped (खाद -> "khaada" -> "kad", as is "khad").
+TRANSLIT_KEY_RULES = [(re.compile(pattern), repl) for pattern, repl in [
+    (r"[^a-z0-9]+", " "), (r"chh|ch", "c"), (r"sh", "s"), (r"ph", "f"), (r"([bcdgjkptr])h", r"\1"),
+    (r"aa", "a"), (r"ee|ii", "i"), (r"oo|uu", "u"), (r"ai|ay|ei", "e"), (r"au|ou|ow", "o"),
+    (r"w", "v"), (r"z", "j"), (r"q", "k"), (r"ck", "k"), (r"x", "ks"), (r"(.)\1+", r"\1"),
+    (r"\b([a-z]{2,})a\b", r"\1")
+]]
+FUZZY_MIN_SIMILARITY = 0.25       # trigram Jaccard similarity a word needs to be considered
+FUZZY_MIN_WORD_CHARS = 3          # shorter query keys only match exactly
+
+def _build_translit_table() -> Dict[int, str]:
+    # Consonants carry a \0 marker for their inherent "a"; vowel signs and the
+    # virama start with \1, and "\0\1" is removed so the sign replaces the "a".
+    table = {}
+    for base in INDIC_BLOCKS:
+        table.update({base + off: latin for off, latin in INDIC_INDEPENDENT_VOWELS.items()})
+        table.update({base + off: latin + "\0" for off, latin in INDIC_CONSONANTS.items()})
+        table.update({base + off: "\1" + latin for off, latin in INDIC_VOWEL_SIGNS.items()})
+        table.update({base + off: latin for off, latin in INDIC_SIGNS.items()})
+        table.update({base + 0x66 + digit: str(digit) for digit in range(10)})
+        table[base + INDIC_VIRAMA] = "\1"
+    # Malayalam chillus, Bengali khanda ta, Gurmukhi tippi/addak
+    table.update({0x0D7A: "n", 0x0D7B: "n", 0x0D7C: "r", 0x0D7D: "l", 0x0D7E: "l", 0x0D7F: "k",
+                  0x09CE: "t", 0x0A70: "n", 0x0A71: ""})
+    table.update({0x0C55: "", 0x0C56: "i", 0x0CD5: "", 0x0CD6: "i"})   # Telugu/Kannada length marks
+    table.update({ord(char): latin for char, latin in URDU_LETTERS.items()})
+    # Accented Latin letters (IAST "khād") lose their diacritics
+    for cp in range(0x00C0, 0x0250):
+        base = unicodedata.normalize("NFKD", chr(cp))[0]
+        if base.isascii() and base.isalpha():
+            table[cp] = base.lower()
+    table.update({cp: "" for cp in range(0x0300, 0x0370)})
+    table.update({0x200C: "", 0x200D: ""})
+    return table
+
+_TRANSLIT_TABLE = _build_translit_table()
+
+def transliterate_to_latin(text: str) -> str:
+    """Rough phonetic romanization of Indic and Urdu text (Latin text is lowercased)."""
+    latin = unicodedata.normalize("NFC", text).lower().translate(_TRANSLIT_TABLE)
+    return latin.replace("\0\1", "").replace("\0", "a").replace("\1", "")
+
+@lru_cache(maxsize=65536)
+def _word_keys(word: str) -> tuple:
+    key = transliterate_to_latin(word)
+    for pattern, repl in TRANSLIT_KEY_RULES:
+        key = pattern.sub(repl, key)
+    return tuple(key.split())
+
+def transliteration_keys(text: str) -> List[str]:
+    """Sound keys for each word of the text, in any supported script or romanized."""
+    # Word-level caching: archive text repeats the same words over and over
+    return [key for word in text.split() for key in _word_keys(word)]
+
+def _word_trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class FuzzyIndex:
+    """Word key -> entry ids, and trigram -> word keys for typo-tolerant lookup.
+
+    Transliterating every description is the slowest index to build, so it is
+    built on the first fuzzy query instead of with the other indexes.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self.vocab = {}           # word key -> word id
+        self.words = []           # word id -> word key
+        self.postings = []        # word id -> set of entry ids
+        self.trigram_words = {}   # trigram -> [word id]
+        self.entry_words = {}     # entry id -> array of word ids (the entry may change on disk)
+
+    def rebuild(self, entries: List[Dict]) -> None:
+        self.ready = False
+        self._reset()
+
+    def ensure_built(self) -> None:
+        if not self.ready:
+            self._reset()
+            records = list(_entry_lookup.by_id.values())
+            for entry, description in zip(records, iter_descriptions(records)):
+                self._add(entry, description)
+            self.ready = True
+
+    def _word_id(self, word: str) -> int:
+        word_id = self.vocab.get(word)
+        if word_id is None:
+            word_id = self.vocab[word] = len(self.words)
+            self.words.append(word)
+            self.postings.append(set())
+            for gram in _word_trigrams(word):
+                self.trigram_words.setdefault(gram, []).append(word_id)
+        return word_id
+
+    def _add(self, entry: Dict, description: Optional[str] = None) -> None:
+        entry_id = entry.get('id')
+        if description is None:
+            description = entry.get('description')
+        keys = set(transliteration_keys(f"{entry.get('title') or ''} {description or ''}"))
+        word_ids = array('l', sorted(self._word_id(key) for key in keys))
+        self.entry_words[entry_id] = word_ids
+        for word_id in word_ids:
+            self.postings[word_id].add(entry_id)
+
+    def add(self, entry: Dict) -> None:
+        if self.ready:
+            self._add(entry)
+
+    def remove(self, entry: Dict) -> None:
+        if self.ready:
+            for word_id in self.entry_words.pop(entry.get('id'), ()):
+                self.postings[word_id].discard(entry.get('id'))
+
+    def similar_words(self, key: str) -> Dict[int, float]:
+        """Word ids close to key -> similarity in (0, 1]; exact matches score 1."""
+        exact = self.vocab.get(key)
+        if len(key) < FUZZY_MIN_WORD_CHARS:
+            return {exact: 1.0} if exact is not None else {}
+        grams = _word_trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigram_words.get(gram, ()))
+        max_edits = max(1, len(key) // 4)
+        matches = {}
+        for word_id, count in shared.items():
+            word = self.words[word_id]
+            if count / (len(grams) + len(word) + 1 - count) < FUZZY_MIN_SIMILARITY:
+                continue
+            if word.startswith(key):
+                matches[word_id] = len(key) / len(word)
+            else:
+                distance = _edit_distance(key, word, max_edits)
+                if distance <= max_edits:
+                    matches[word_id] = 1 - distance / max(len(key), len(word))
+        return matches
+
+    def search(self, query: str) -> Dict[int, float]:
+        """Entry id -> mean word similarity, for entries matching every query word."""
+        scores = None
+        for key in dict.fromkeys(transliteration_keys(query)):
+            best = {}
+            for word_id, similarity in self.similar_words(key).items():
+                for entry_id in self.postings[word_id]:
+                    if similarity > best.get(entry_id, 0):
+                        best[entry_id] = similarity
+            if scores is None:
+                scores = best
+            else:
+                scores = {entry_id: score + best[entry_id] for entry_id, score in scores.items() if entry_id in best}
+            if not scores:
+                return {}
+        words = len(dict.fromkeys(transliteration_keys(query))) or 1
+        return {entry_id: score / words for entry_id, score in (scores or {}).items()}
+
+_fuzzy_index = register_entry_index(FuzzyIndex())
+
+def fuzzy_search(query: str, language: str = None, category: str = None, has_media: bool = False,
+                 has_location: bool = False, limit: Optional[int] = 100) -> List[tuple]:
+    """Typo- and transliteration-tolerant search. Returns (entry, score) pairs, best first.
+
+    Romanized queries ("jaivik khad") match native-script entries and vice
+    versa; every query word must match some word of the entry.
+    """
+    ensure_entry_indexes()
+    with _entries_lock:
+        _fuzzy_index.ensure_built()
+        scores = _fuzzy_index.search(query)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        results = []
+        for entry_id, score in ranked:
+            entry = _entry_lookup.by_id.get(entry_id)
+            if entry is not None and entry_matches(entry, "", language, category, has_media, has_location):
+                results.append((entry, score))
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+# Semantic search
+# Titles and descriptions are embedded into one float32 matrix that is
+# memory-mapped from data_entries/embeddings/, with row i holding entry id i.
+# A version column records which entry version each row was computed from,
+# so rows survive restarts and only new or changed entries are re-encoded.
+# Replicas may write the same row for the same version; writes take a file
+# lock so the matrix can grow (by copy and swap) underneath readers.
+#
+# The default encoder needs nothing beyond NumPy: signed feature hashing of
+# character n-grams and transliteration sound keys, plus a separate block for
+# glossary concepts, which is what lets "termite control" reach "दीमक से बचाव".
+# With sentence-transformers installed, EMBEDDING_ENCODER = "sentence-transformers"
+# uses a multilingual model on the CPU instead.
+EMBEDDINGS_DIR = "data_entries/embeddings"
+EMBEDDING_ENCODER = os.environ.get("FWA_EMBEDDING_ENCODER", "hashing")
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_HASH_DIM = 256          # character n-gram and sound-key features
+EMBEDDING_CONCEPT_DIM = 64        # glossary concept features
+EMBEDDING_CONCEPT_SHARE = 0.5     # share of the similarity carried by shared concepts
+EMBEDDING_BATCH = 64              # texts per encoder call
+EMBEDDING_QUERY_ROWS = 16384      # rows scored per matrix product
+EMBEDDING_MIN_SCORE = 0.05
+
+_encoders = {}
+_embeddings_lock = ProcessLock("embeddings")
+
+def register_encoder(name: str, encode, dim: int) -> None:
+    """Make an encoder available. encode(texts) returns an (n, dim) array of unit vectors."""
+    _encoders[name] = {"encode": encode, "dim": dim}
+
+def _hash_feature(feature: str, dim: int) -> int:
+    """Bucket in [0, 2*dim): the upper half holds features hashed with a negative sign."""
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % dim + (dim if digest & 0x80000000 else 0)
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str) -> tuple:
+    # N-grams are taken over sound keys, so they overlap across scripts and romanization
+    features = [f"w:{word}"]
+    for key in _word_keys(word):
+        padded = f"<{key}>"
+        features += [padded[i:i + n] for n in (3, 4) for i in range(len(padded) - n + 1)]
+    return tuple(_hash_feature(feature, EMBEDDING_HASH_DIM) for feature in features)
+
+def _hashed_block(indices: List[int], dim: int):
+    counts = np.log1p(np.bincount(np.asarray(indices, dtype=np.int64), minlength=2 * dim).astype(np.float32))
+    block = counts[:dim] - counts[dim:]
+    norm = np.linalg.norm(block)
+    return block / norm if norm else block
+
+def _hashing_encode(texts: List[str]):
+    glossary = get_glossary()
+    rows = np.zeros((len(texts), EMBEDDING_HASH_DIM + EMBEDDING_CONCEPT_DIM), dtype=np.float32)
+    for row, text in zip(rows, texts):
+        words = []
+        for word in text.split():
+            start, end = 0, len(word)
+            while start < end and not _is_word_char(word[start]):
+                start += 1
+            while end > start and not _is_word_char(word[end - 1]):
+                end -= 1
+            if start < end:
+                words.append(_fold_case(word[start:end]))
+        text_block = _hashed_block([index for word in words for index in _word_features(word)], EMBEDDING_HASH_DIM)
+        concepts = [_hash_feature(concept, EMBEDDING_CONCEPT_DIM) for _, _, concept in glossary.find(text)]
+        if concepts:
+            row[:EMBEDDING_HASH_DIM] = text_block * math.sqrt(1 - EMBEDDING_CONCEPT_SHARE)
+            row[EMBEDDING_HASH_DIM:] = (_hashed_block(concepts, EMBEDDING_CONCEPT_DIM)
+                                        * math.sqrt(EMBEDDING_CONCEPT_SHARE))
+        else:
+            row[:EMBEDDING_HASH_DIM] = text_block
+    return rows
+
+def _sentence_transformer_encode(texts: List[str]):
+    global _sentence_model
+    if _sentence_model is None:
+        from sentence_transformers import SentenceTransformer
+        _sentence_model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _sentence_model.encode(texts, batch_size=EMBEDDING_BATCH, normalize_embeddings=True,
+                                  convert_to_numpy=True).astype(np.float32)
+
+_sentence_model = None
+register_encoder("hashing", _hashing_encode, EMBEDDING_HASH_DIM + EMBEDDING_CONCEPT_DIM)
+try:
+    import sentence_transformers  # noqa: F401
+    register_encoder("sentence-transformers", _sentence_transformer_encode, 384)
+except ImportError:
+    pass
+
+def _embedding_text(entry: Dict, description: Optional[str] = None) -> str:
+    if description is None:
+        description = entry.get('description')
+    return f"{entry.get('title') or ''}\n{description or ''}"
+
+class SemanticIndex:
+    """Memory-mapped embedding matrix, one row per entry id, with top-k cosine queries.
+
+    Encoding the whole archive is slow, so like FuzzyIndex it is brought up to
+    date on the first semantic query; after that, saves encode just their entry.
+    """
+
+    def __init__(self, encoder: Optional[str] = None):
+        self.encoder = encoder
+        self.ready = False
+        self.matrix = None
+        self.versions = None
+        self.stat = None
+
+    def _paths(self) -> tuple:
+        name = self.encoder_name()
+        base = os.path.join(EMBEDDINGS_DIR, f"{name}-{_encoders[name]['dim']}")
+        return f"{base}.npy", f"{base}.versions.npy"
+
+    def encoder_name(self) -> str:
+        name = self.encoder or EMBEDDING_ENCODER
+        return name if name in _encoders else "hashing"
+
+    def _open(self) -> None:
+        """Map the matrix files, remapping if another process grew (replaced) them."""
+        matrix_path, versions_path = self._paths()
+        try:
+            stat = os.stat(versions_path)
+        except FileNotFoundError:
+            # Removed (e.g. by a restore): the old mapping must not be copied into the new files
+            self.matrix = self.versions = self.stat = None
+            self._grow(0)
+            return
+        if self.stat and (stat.st_ino, stat.st_size) == self.stat:
+            return
+        matrix = np.load(matrix_path, mmap_mode="r+")
+        versions = np.load(versions_path, mmap_mode="r+")
+        if matrix.shape[0] != versions.shape[0] or matrix.shape[1] != _encoders[self.encoder_name()]["dim"]:
+            # Interrupted growth or a different encoder configuration: start over
+            os.remove(versions_path)
+            self.matrix = self.versions = self.stat = None
+            self._grow(0)
+            return
+        self.matrix, self.versions, self.stat = matrix, versions, (stat.st_ino, stat.st_size)
+
+    def _grow(self, rows: int) -> None:
+        """Make room for row index `rows - 1`, copying into larger files and swapping them in."""
+        matrix_path, versions_path = self._paths()
+        with _embeddings_lock:
+            self.stat = None
+            if os.path.exists(versions_path):
+                self._open()
+                if self.versions.shape[0] >= rows:
+                    return
+            old = self.versions.shape[0] if self.versions is not None else 0
+            capacity = max(1024, rows, old * 2)
+            os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+            suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+            matrix = np.lib.format.open_memmap(matrix_path + suffix, mode="w+", dtype=np.float32,
+                                               shape=(capacity, _encoders[self.encoder_name()]["dim"]))
+            versions = np.lib.format.open_memmap(versions_path + suffix, mode="w+", dtype=np.int64,
+                                                 shape=(capacity,))
+            if old:
+                matrix[:old] = self.matrix
+                versions[:old] = self.versions
+            matrix.flush()
+            versions.flush()
+            del matrix, versions
+            # The versions file goes last: a reader that sees it sees the matching matrix
+            os.replace(matrix_path + suffix, matrix_path)
+            os.replace(versions_path + suffix, versions_path)
+            self._open()
+
+    def rebuild(self, entries: List[Dict]) -> None:
+        self.ready = False
+
+    def ensure_built(self) -> None:
+        if self.ready:
+            self._open()
+            return
+        self._open()
+        live = {}
+        for entry in _entry_lookup.by_id.values():
+            if isinstance(entry.get('id'), int) and entry['id'] >= 0:
+                live[entry['id']] = entry
+        stale = [entry for entry_id, entry in live.items()
+                 if entry_id >= len(self.versions) or self.versions[entry_id] != (entry.get('version') or 0) + 1]
+        for start in range(0, len(stale), EMBEDDING_BATCH):
+            self._write(stale[start:start + EMBEDDING_BATCH])
+        with _embeddings_lock:
+            self._open()
+            for entry_id in np.flatnonzero(self.versions).tolist():
+                if entry_id not in live:
+                    self.versions[entry_id] = 0
+        self.ready = True
+
+    def _write(self, entries: List[Dict]) -> None:
+        texts = [_embedding_text(entry, description)
+                 for entry, description in zip(entries, load_descriptions(entries))]
+        vectors = _encoders[self.encoder_name()]["encode"](texts)
+        needed = max(entry['id'] for entry in entries) + 1
+        if needed > len(self.versions):
+            self._grow(needed)
+        with _embeddings_lock:
+            self._open()
+            for entry, vector in zip(entries, vectors):
+                self.matrix[entry['id']] = vector
+                self.versions[entry['id']] = (entry.get('version') or 0) + 1
+
+    def add(self, entry: Dict) -> None:
+        if self.ready and isinstance(entry.get('id'), int) and entry['id'] >= 0:
+            self._open()
+            self._write([entry])
+
+    def remove(self, entry: Dict) -> None:
+        if self.ready and isinstance(entry.get('id'), int) and 0 <= entry['id'] < len(self.versions):
+            with _embeddings_lock:
+                self._open()
+                self.versions[entry['id']] = 0
+
+    def scores(self, query: str):
+        """Cosine similarity of the query to every row (rows without an entry score -inf)."""
+        vector = _encoders[self.encoder_name()]["encode"]([query])[0]
+        result = np.full(len(self.versions), -np.inf, dtype=np.float32)
+        for start in range(0, len(self.versions), EMBEDDING_QUERY_ROWS):
+            end = min(start + EMBEDDING_QUERY_ROWS, len(self.versions))
+            live = self.versions[start:end] > 0
+            result[start:end][live] = self.matrix[start:end][live] @ vector
+        return result
+
+_semantic_index = register_entry_index(SemanticIndex())
+
+def semantic_search(query: str, language: str = None, category: str = None, has_media: bool = False,
+                    has_location: bool = False, limit: int = 20,
+                    min_score: float = EMBEDDING_MIN_SCORE) -> List[tuple]:
+    """Entries closest in meaning to the query, as (entry, cosine similarity) pairs, best first."""
+    ensure_entry_indexes()
+    with _entries_lock:
+        _semantic_index.ensure_built()
+        scores = _semantic_index.scores(query)
+        # Take a generous top slice first; sort everything only when filters reject most of it
+        for candidates in (min(len(scores), limit * 8), len(scores)):
+            top = np.argpartition(-scores, candidates - 1)[:candidates] if candidates else []
+            results, exhausted = [], False
+            for entry_id in top[np.argsort(-scores[top], kind="stable")].tolist() if candidates else []:
+                score = float(scores[entry_id])
+                if score < min_score:
+                    exhausted = True
+                    break
+                entry = _entry_lookup.by_id.get(entry_id)
+                if entry is not None and entry_matches(entry, "", language, category, has_media, has_location):
+                    results.append((entry, score))
+                    if len(results) >= limit:
+                        return results
+            if exhausted or candidates == len(scores):
+                break
+        return results
+
+# Geo-proximity search
+# Coordinates are indexed as 3-D unit vectors in a KD-tree, so straight-line
+# (chord) distance is monotonic with great-circle distance on the sphere.
+EARTH_RADIUS_KM = 6371.0088
+
+def _to_unit_vector(lat: float, lon: float) -> tuple:
+    lat_r, lon_r = math.radians(lat), math.radians(lon)
+    return (math.cos(lat_r) * math.cos(lon_r), math.cos(lat_r) * math.sin(lon_r), math.sin(lat_r))
+
+def _km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+def _entry_coordinates(entry: Dict) -> Optional[tuple]:
+    lat, lon = entry.get('latitude'), entry.get('longitude')
+    if not (lat and lon) or not validate_coordinates(lat, lon):
+        return None
+    return float(lat), float(lon)
+
+def _entry_point(entry: Dict) -> Optional[tuple]:
+    coords = _entry_coordinates(entry)
+    return _to_unit_vector(*coords) if coords else None
+
+class _KDNode:
+    __slots__ = ("point", "entry_id", "axis", "left", "right")
+
+    def __init__(self, point, entry_id, axis):
+        self.point, self.entry_id, self.axis = point, entry_id, axis
+        self.left = self.right = None
+
+class GeoIndex:
+    """KD-tree of entry coordinates with radius and k-nearest-neighbour queries.
+
+    Inserts go straight into the tree; removed or moved points are skipped at
+    query time and the tree is rebuilt balanced once enough of them pile up.
+    """
+
+    def __init__(self):
+        self.points = {}          # entry id -> live unit vector
+        self.root = None
+        self.built_size = 0
+        self.changes = 0
+
+    def rebuild(self, entries: List[Dict]) -> None:
+        self.points = {}
+        for entry in entries:
+            point = _entry_point(entry)
+            if point:
+                self.points[entry.get('id')] = point
+        self._build()
+
+    def _build(self) -> None:
+        def build(items, depth):
+            if not items:
+                return None
+            axis = depth % 3
+            items.sort(key=lambda item: item[1][axis])
+            mid = len(items) // 2
+            node = _KDNode(items[mid][1], items[mid][0], axis)
+            node.left = build(items[:mid], depth + 1)
+            node.right = build(items[mid + 1:], depth + 1)
+            return node
+
+        self.root = build(list(self.points.items()), 0)
+        self.built_size = len(self.points)
+        self.changes = 0
+
+    def _changed(self) -> None:
+        self.changes += 1
+        if self.changes > max(64, self.built_size // 2):
+            self._build()
+
+    def add(self, entry: Dict) -> None:
+        point = _entry_point(entry)
+        if point is None:
+            return
+        entry_id = entry.get('id')
+        self.points[entry_id] = point
+        depth, parent, node = 0, None, self.root
+        while node is not None:
+            parent = node
+            node = node.left if point[node.axis] < node.point[node.axis] else node.right
+            depth += 1
+        new_node = _KDNode(point, entry_id, depth % 3)
+        if parent is None:
+            self.root = new_node
+        elif point[parent.axis] < parent.point[parent.axis]:
+            parent.left = new_node
+        else:
+            parent.right = new_node
+        self._changed()
+
+    def remove(self, entry: Dict) -> None:
+        if self.points.pop(entry.get('id'), None) is not None:
+            self._changed()
+
+    def _live(self, node: _KDNode) -> bool:
+        return self.points.get(node.entry_id) is node.point
+
+    def within(self, lat: float, lon: float, radius_km: float, predicate=None) -> List[tuple]:
+        """(distance_km, entry_id) pairs within radius_km, nearest first."""
+        query = _to_unit_vector(lat, lon)
+        radius = _km_to_chord(radius_km)
+        hits = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if self._live(node):
+                dist = math.dist(query, node.point)
+                if dist <= radius and (predicate is None or predicate(node.entry_id)):
+                    hits.append((dist, node.entry_id))
+            diff = query[node.axis] - node.point[node.axis]
+            stack.append(node.left if diff < 0 else node.right)
+            if abs(diff) <= radius:
+                stack.append(node.right if diff < 0 else node.left)
+        return [(_chord_to_km(dist), entry_id) for dist, entry_id in sorted(hits)]
+
+    def nearest(self, lat: float, lon: float, k: int, max_km: Optional[float] = None,
+                predicate=None) -> List[tuple]:
+        """Up to k (distance_km, entry_id) pairs, nearest first, optionally capped at max_km."""
+        query = _to_unit_vector(lat, lon)
+        bound = _km_to_chord(max_km) if max_km is not None else float("inf")
+        best = []                 # max-heap of (-dist, entry_id)
+        stack = [(0.0, self.root)]
+        while stack:
+            plane_dist, node = stack.pop()
+            worst = -best[0][0] if len(best) == k else bound
+            if node is None or plane_dist > worst:
+                continue
+            if self._live(node):
+                dist = math.dist(query, node.point)
+                if dist <= worst and (predicate is None or predicate(node.entry_id)):
+                    heapq.heappush(best, (-dist, node.entry_id))
+                    if len(best) > k:
+                        heapq.heappop(best)
+            diff = query[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            stack.append((abs(diff), far))
+            stack.append((plane_dist, near))
+        return [(_chord_to_km(-neg), entry_id) for neg, entry_id in sorted(best, reverse=True)]
+
+_geo_index = register_entry_index(GeoIndex())
+
+def search_nearby(lat: float, lon: float, radius_km: Optional[float] = None, k: Optional[int] = None,
+                  query: str = "", language: str = None, category: str = None,
+                  has_media: bool = False) -> List[tuple]:
+    """Find (entry, distance_km) pairs near a point, nearest first.
+
+    Give radius_km, k, or both ("nearest k within radius_km"); the other
+    search_entries filters are applied while walking the tree.
+    """
+    ensure_entry_indexes()
+    phrasings = expand_query(query) if query else query
+    with _entries_lock:
+        def predicate(entry_id):
+            return entry_matches(_entry_lookup.by_id[entry_id], phrasings, language, category, has_media)
+
+        if k:
+            hits = _geo_index.nearest(lat, lon, k, radius_km, predicate)
+        else:
+            hits = _geo_index.within(lat, lon, radius_km or 50, predicate)
+        return [(_entry_lookup.by_id[entry_id], km) for km, entry_id in hits]
+
+# Density layers
+# Entry coordinates are binned into grid cells at several resolutions, per
+# (language, category) bucket. Rebuilds bin every entry at once with NumPy;
+# saves adjust single cell counts. Map layers are cached until the next change.
+DENSITY_CELL_DEGREES = (2.0, 0.5, 0.125, 0.03125)    # roughly 220, 55, 14 and 3.5 km cells
+
+def _density_cell(size: float, lat, lon):
+    """Cell number of (lat, lon) on the grid of the given size (scalars or arrays).
+
+    The closed edges lat = 90 and lon = 180 fall into the last row and column.
+    """
+    rows, cols = math.ceil(180 / size), math.ceil(360 / size)
+    row = np.clip(np.floor((np.asarray(lat) + 90) / size).astype(np.int64), 0, rows - 1)
+    col = np.clip(np.floor((np.asarray(lon) + 180) / size).astype(np.int64), 0, cols - 1)
+    return row * cols + col
+
+def _density_cell_center(size: float, cells) -> tuple:
+    cols = math.ceil(360 / size)
+    rows, col = np.divmod(np.asarray(cells, dtype=np.int64), cols)
+    return (rows + 0.5) * size - 90, (col + 0.5) * size - 180
+
+class DensityIndex:
+    """Per-bucket entry counts on multi-resolution lat/lon grids, with cached map layers."""
+
+    def __init__(self):
+        # level -> {(language, category): Counter(cell -> entries)}
+        self.counts = [{} for _ in DENSITY_CELL_DEGREES]
+        self.generation = 0
+        self.layers = {}          # (level, language, category) -> (generation, layer)
+
+    def rebuild(self, entries: List[Dict]) -> None:
+        self.counts = [{} for _ in DENSITY_CELL_DEGREES]
+        self.generation += 1
+        buckets, codes, lats, lons = {}, [], [], []
+        for entry in entries:
+            coords = _entry_coordinates(entry)
+            if coords:
+                bucket = (entry.get('language'), entry.get('category'))
+                codes.append(buckets.setdefault(bucket, len(buckets)))
+                lats.append(coords[0])
+                lons.append(coords[1])
+        if not codes:
+            return
+        codes = np.array(codes, dtype=np.int64)
+        names = list(buckets)
+        for level, size in enumerate(DENSITY_CELL_DEGREES):
+            cells_per_bucket = math.ceil(180 / size) * math.ceil(360 / size)
+            keys, counts = np.unique(codes * cells_per_bucket + _density_cell(size, lats, lons),
+                                     return_counts=True)
+            bucket_codes, cells = np.divmod(keys, cells_per_bucket)
+            for code, cell, count in zip(bucket_codes.tolist(), cells.tolist(), counts.tolist()):
+                self.counts[level].setdefault(names[code], Counter())[cell] = count
+
+    def _adjust(self, entry: Dict, delta: int) -> None:
+        coords = _entry_coordinates(entry)
+        if coords is None:
+            return
+        bucket = (entry.get('language'), entry.get('category'))
+        for level, size in enumerate(DENSITY_CELL_DEGREES):
+            counter = self.counts[level].setdefault(bucket, Counter())
+            cell = int(_density_cell(size, coords[0], coords[1]))
+            counter[cell] += delta
+            if counter[cell] <= 0:
+                del counter[cell]
+        self.generation += 1
+
+    def add(self, entry: Dict) -> None:
+        self._adjust(entry, 1)
+
+    def remove(self, entry: Dict) -> None:
+        self._adjust(entry, -1)
+
+    def layer(self, level: int, language: Optional[str] = None, category: Optional[str] = None) -> Dict:
+        key = (level, language, category)
+        cached = self.layers.get(key)
+        if cached and cached[0] == self.generation:
+            return cached[1]
+        totals = Counter()
+        for (bucket_language, bucket_category), counter in self.counts[level].items():
+            if language in (None, bucket_language) and category in (None, bucket_category):
+                totals.update(counter)
+        cells = np.fromiter(totals.keys(), dtype=np.int64, count=len(totals))
+        counts = np.fromiter(totals.values(), dtype=np.int64, count=len(totals))
+        lats, lons = _density_cell_center(DENSITY_CELL_DEGREES[level], cells)
+        peak = int(counts.max()) if len(counts) else 0
+        weights = counts / peak if peak else counts.astype(float)
+        layer = {
+            "points": np.column_stack([lats, lons, weights]).round(5).tolist(),
+            "total": int(counts.sum()),
+            "cells": len(counts),
+            "max_count": peak
+        }
+        self.layers[key] = (self.generation, layer)
+        return layer
+
+_density_index = register_entry_index(DensityIndex())
+
+def get_density_layer(level: int = 1, language: str = None, category: str = None) -> Dict:
+    """Heatmap layer for entries matching the filters, at a DENSITY_CELL_DEGREES level.
+
+    Returns {"points": [[lat, lon, weight], ...], "total", "cells", "max_count"}
+    with weights scaled to 0..1 by the busiest cell; points are cell centres.
+    """
+    ensure_entry_indexes()
+    with _entries_lock:
+        return _density_index.layer(level, language, category)
+
+# Export functionality
+def _export_row(entry: Dict, include_media: bool = True, include_coordinates: bool = True) -> Dict:
+    export_entry = {
+        'id': entry.get('id'),
+        'title': entry.get('title'),
+        'description': entry.get('description'),
+        'language': entry.get('language'),
+        'category': entry.get('category'),
+        'location_name': entry.get('location_name'),
+        'timestamp': entry.get('timestamp'),
+        'contributor': entry.get('contributor')
+    }
+    
+    if include_coordinates:
+        export_entry['latitude'] = entry.get('latitude')
+        export_entry['longitude'] = entry.get('longitude')
+    
+    if include_media:
+        export_entry['image_path'] = entry.get('image_path')
+        export_entry['audio_path'] = entry.get('audio_path')
+    
+    return export_entry
+
+def export_to_jsonl(entries: List[Dict], include_media: bool = True, 
+                    include_coordinates: bool = True) -> str:
+    """Export entries to JSONL format."""
+    lines = [json.dumps(_export_row(entry, include_media, include_coordinates), ensure_ascii=False)
+             for entry in iter_loaded_entries(entries)]
+    return '\n'.join(lines)
+
+def export_to_csv(entries: List[Dict], include_media: bool = True, 
+                  include_coordinates: bool = True) -> str:
+    """Export entries to CSV format."""
+    data = [_export_row(entry, include_media, include_coordinates) for entry in iter_loaded_entries(entries)]
+    df = pd.DataFrame(data)
+    return df.to_csv(index=False)
+
+def export_delta_jsonl(since_seq: int, include_media: bool = True,
+                       include_coordinates: bool = True) -> tuple:
+    """Export the changes after since_seq as JSONL for incremental mirrors.
+
+    Each line is {"seq", "op", "id", "entry"} with only the latest change per
+    entry id; "entry" is null for deletes. Returns (jsonl, latest_seq).
+    """
+    changes, latest = get_changes_since(since_seq)
+    latest_by_id = {}
+    for change in changes:
+        latest_by_id.pop(change["id"], None)
+        latest_by_id[change["id"]] = change
+
+    lines = []
+    for change in latest_by_id.values():
+        lines.append(json.dumps({
+            'seq': change["seq"],
+            'op': change["op"],
+            'id': change["id"],
+            'entry': _export_row(change["entry"], include_media, include_coordinates) if change["entry"] else None
+        }, ensure_ascii=False))
+    return '\n'.join(lines), latest
+
+# Export bundles
+# A bundle is a ZIP of the rows file (entries.jsonl or entries.csv) with
+# media paths rewritten to point inside the archive, the referenced media
+# and a manifest with SHA-256 checksums. It is written as a stream, so the
+# output can be a file, stdout or a response body: media is copied in chunks
+# that worker threads read and hash ahead of the writer, and the archive is
+# never held in memory. Media that is already compressed is stored as is.
+EXPORT_BUNDLE_DIR = "exports"                # under STATIC_DIR, served as app/static/exports
+EXPORT_BUNDLE_URL = "app/static/exports"
+# Streamlit's static file handler refuses files over 200 MB, so bundles
+# served from the Export page are split into self-contained parts below that.
+EXPORT_BUNDLE_PART_BYTES = 190 * 2**20
+EXPORT_BUNDLE_MAX_AGE = 24 * 3600            # served bundles are deleted after this
+EXPORT_BUNDLE_WORKERS = 4
+EXPORT_CHUNK_BYTES = 2**20
+EXPORT_PREFETCH_CHUNKS = 4                   # per file being read ahead
+EXPORT_STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp3', '.ogg', '.oga', '.opus',
+                            '.m4a', '.aac', '.flac', '.webm', '.mp4', '.zip', '.gz'}
+EXPORT_MEMBER_OVERHEAD = 256                 # zip headers per member, for part sizing
+
+def _bundle_media(entry: Dict) -> List[tuple]:
+    """(field, name in the bundle, source path, size) for each media file the entry still has."""
+    media = []
+    for field, kind in (('image_path', "image"), ('audio_path', "audio")):
+        path = entry.get(field)
+        if path and os.path.isfile(path):
+            extension = os.path.splitext(path)[1].lower() or '.bin'
+            media.append((field, f"media/{_dataset_key(entry['id'])}-{kind}{extension}",
+                          path, os.path.getsize(path)))
+    return media
+
+def _bundle_rows(entries: List[Dict], media: Dict, fmt: str, include_coordinates: bool) -> bytes:
+    rows = []
+    for entry in iter_loaded_entries(entries):
+        row = _export_row(entry, True, include_coordinates)
+        bundled = {field: name for field, name, _, _ in media[entry['id']]}
+        row['image_path'] = bundled.get('image_path')
+        row['audio_path'] = bundled.get('audio_path')
+        rows.append(row)
+    if fmt == "csv":
+        return pd.DataFrame(rows).to_csv(index=False).encode("utf-8")
+    return "\n".join(json.dumps(row, ensure_ascii=False) for row in rows).encode("utf-8")
+
+def _put_chunk(chunks: queue.Queue, item, cancelled: threading.Event) -> bool:
+    while not cancelled.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _prefetch_media(path: str, chunks: queue.Queue, cancelled: threading.Event) -> None:
+    """Read a file in chunks a bounded distance ahead of the writer; the last item is its SHA-256."""
+    digest = hashlib.sha256()
     try:
-        from gtts import gTTS
-        import tempfile
-        # pygame is for local playback, not typically needed in Streamlit Cloud/Spaces
-        # import pygame
-
-        # Map language names to gTTS language codes
-        lang_map = {
-            "English": "en",
-            "Hindi": "hi",
-            "Bengali": "bn",
-            "Telugu": "te",
-            "Marathi": "mr",
-            "Tamil": "ta",
-            "Gujarati": "gu",
-            "Urdu": "ur",
-            "Kannada": "kn",
-            "Malayalam": "ml",
-            "Punjabi": "pa",
-            "Oriya": "or", # Added for completeness if gTTS supports
-            # "Assamese": "as", # gTTS might not support
-            # "Nepali": "ne", # gTTS might not support
-            "Sanskrit": "sa" # gTTS might have limited support
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(EXPORT_CHUNK_BYTES), b""):
+                digest.update(chunk)
+                if not _put_chunk(chunks, chunk, cancelled):
+                    return
+    except Exception as e:
+        # Forward any failure: the writer blocks on this queue until it sees a digest or an error
+        _put_chunk(chunks, e, cancelled)
+        return
+    _put_chunk(chunks, digest.hexdigest(), cancelled)
+
+def write_export_bundle(out, entries: List[Dict], fmt: str = "jsonl", include_coordinates: bool = True,
+                        workers: int = EXPORT_BUNDLE_WORKERS, progress=None) -> Dict:
+    """Stream a ZIP bundle of entries and their media to a writable binary file object.
+
+    out need not be seekable. progress(done_bytes, total_bytes) is called as
+    media is copied. Returns a summary with the entry, media and byte counts.
+    """
+    entries = [entry for entry in entries if entry.get('id') is not None]
+    media = {entry['id']: _bundle_media(entry) for entry in entries}
+    files = [item for entry in entries for item in media[entry['id']]]
+    rows = _bundle_rows(entries, media, fmt, include_coordinates)
+    total = len(rows) + sum(size for _, _, _, size in files)
+    done = len(rows)
+    now = time.localtime()[:6]
+
+    checksums = []
+    cancelled = threading.Event()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as bundle:
+        bundle.writestr(zipfile.ZipInfo(f"entries.{fmt}", now), rows, zipfile.ZIP_DEFLATED)
+        if progress:
+            progress(done, total)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            try:
+                pending = deque()
+                upcoming = iter(files)
+
+                def read_ahead():
+                    item = next(upcoming, None)
+                    if item is not None:
+                        chunks = queue.Queue(EXPORT_PREFETCH_CHUNKS)
+                        pool.submit(_prefetch_media, item[2], chunks, cancelled)
+                        pending.append((item, chunks))
+
+                for _ in range(max(1, workers)):
+                    read_ahead()
+                while pending:
+                    (_, name, path, size), chunks = pending.popleft()
+                    read_ahead()
+                    info = zipfile.ZipInfo(name, time.localtime(os.path.getmtime(path))[:6])
+                    info.compress_type = zipfile.ZIP_STORED \
+                        if os.path.splitext(name)[1] in EXPORT_STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                    with bundle.open(info, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as member:
+                        while True:
+                            chunk = chunks.get()
+                            if isinstance(chunk, Exception):
+                                raise chunk
+                            if isinstance(chunk, str):
+                                checksums.append({"name": name, "size": size, "sha256": chunk})
+                                break
+                            member.write(chunk)
+                            done += len(chunk)
+                            if progress:
+                                progress(done, total)
+            finally:
+                # Lets readers blocked on a full queue exit if the writer failed
+                cancelled.set()
+        manifest = {
+            "name": "farming-wisdom-archive",
+            "format": fmt,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "change_seq": get_change_seq(),
+            "entries": len(entries),
+            "missing_media": [entry['id'] for entry in entries
+                              if any(entry.get(field) and not os.path.isfile(entry[field])
+                                     for field in ('image_path', 'audio_path'))],
+            "media": checksums
         }
+        bundle.writestr(zipfile.ZipInfo("manifest.json", now),
+                        json.dumps(manifest, indent=2, ensure_ascii=False), zipfile.ZIP_DEFLATED)
+    return {"entries": len(entries), "media": len(checksums), "bytes": total}
 
-        lang_code = lang_map.get(language, "en")
+def _split_bundle(entries: List[Dict], part_bytes: int) -> List[List[Dict]]:
+    """Group entries into parts whose media and rows stay under part_bytes (one oversized entry per part)."""
+    parts, current, size = [], [], 0
+    for entry, description in zip(entries, iter_descriptions(entries)):
+        entry_size = len(description or "") + 1024 + sum(
+            item[3] + EXPORT_MEMBER_OVERHEAD for item in _bundle_media(entry))
+        if current and size + entry_size > part_bytes:
+            parts.append(current)
+            current, size = [], 0
+        current.append(entry)
+        size += entry_size
+    if current:
+        parts.append(current)
+    return parts
 
-        # Generate TTS
-        tts = gTTS(text=text, lang=lang_code, slow=False)
+def prune_export_bundles(max_age: float = EXPORT_BUNDLE_MAX_AGE) -> int:
+    """Delete served bundles older than max_age seconds. Returns the number of bundles removed."""
+    root = os.path.join(STATIC_DIR, EXPORT_BUNDLE_DIR)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
 
-        # Save to temporary file and play using Streamlit
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-            tts.save(tmp_file.name)
+def create_export_bundles(entries: List[Dict], fmt: str = "jsonl", include_coordinates: bool = True,
+                          part_bytes: int = EXPORT_BUNDLE_PART_BYTES, workers: int = EXPORT_BUNDLE_WORKERS,
+                          progress=None) -> List[Dict]:
+    """Write bundle parts for download from the static file server.
 
-            with open(tmp_file.name, "rb") as audio_file:
-                audio_bytes = audio_file.read()
-                st.audio(audio_bytes, format="audio/mp3")
+    Parts go to an unguessable directory under static/exports/ and are
+    deleted after EXPORT_BUNDLE_MAX_AGE. progress(fraction) is called as
+    they are written. Returns one {"path", "url", "file_name", "entries",
+    "bytes"} per part.
+    """
+    prune_export_bundles()
+    token = os.urandom(16).hex()
+    out_dir = os.path.join(STATIC_DIR, EXPORT_BUNDLE_DIR, token)
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    parts = _split_bundle([entry for entry in entries if entry.get('id') is not None], part_bytes)
+    total = sum(len(part) for part in parts)
+    finished = 0
+    bundles = []
+    for number, part in enumerate(parts, 1):
+        file_name = f"ancestral_archive_{stamp}.zip" if len(parts) == 1 else \
+            f"ancestral_archive_{stamp}_part{number}of{len(parts)}.zip"
+        path = os.path.join(out_dir, file_name)
 
-            # Clean up
-            os.unlink(tmp_file.name)
+        def part_progress(done, part_total, finished=finished, size=len(part)):
+            # Parts are weighted by entry count; bytes within a part
+            progress((finished + size * done / max(part_total, 1)) / max(total, 1))
 
-    except ImportError:
-        st.error("Text-to-speech library not available. Please ensure 'gtts' is installed.")
-    except Exception as e:
-        st.error(f"Error in text-to-speech: {str(e)}")
+        try:
+            with open(path + ".tmp", "wb") as f:
+                summary = write_export_bundle(f, part, fmt, include_coordinates, workers,
+                                              part_progress if progress else None)
+            os.replace(path + ".tmp", path)
+        except BaseException:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            raise
+        finished += len(part)
+        bundles.append({"path": path, "url": f"{EXPORT_BUNDLE_URL}/{token}/{file_name}",
+                        "file_name": file_name, "entries": summary["entries"],
+                        "bytes": os.path.getsize(path)})
+    return bundles
 
-# Speech-to-Text functionality
-def speech_to_text(language: str = "en") -> Optional[str]:
-    """Convert speech to text using speech recognition."""
-    try:
-        import speech_recognition as sr
-        
-        # Map language names to speech recognition language codes (Google Web Speech API)
-        lang_map = {
-            "English": "en-IN",
-            "Hindi": "hi-IN",
-            "Bengali": "bn-IN",
-            "Telugu": "te-IN",
-            "Marathi": "mr-IN",
-            "Tamil": "ta-IN",
-            "Gujarati": "gu-IN",
-            "Urdu": "ur-IN",
-            "Kannada": "kn-IN",
-            "Malayalam": "ml-IN",
-            "Punjabi": "pa-IN",
-            "Oriya": "or-IN" # Assuming Indian dialect code exists
-        }
+# Dataset packaging
+# The corpus is published as WebDataset-style tar shards: each sample is a
+# group of members sharing a key ("00000042.json", ".txt", ".jpg", ".wav").
+# Splits are stratified by (language, category) with a seeded hash order, and
+# tar headers carry no times or owners, so the same archive and seed always
+# produce byte-identical shards. Shards are written in parallel processes.
+DATASET_SPLITS = {"train": 0.8, "validation": 0.1, "test": 0.1}
+DATASET_SHARD_BYTES = 256 * 2**20
+DATASET_TAR_OVERHEAD = 1024       # header + padding allowance per tar member
 
-        lang_code = lang_map.get(language, "en-IN")
+def _dataset_key(entry_id: int) -> str:
+    return f"{entry_id:08d}"
 
-        # Initialize recognizer
-        r = sr.Recognizer()
+def _seeded_rank(seed: int, *parts) -> str:
+    return hashlib.sha256(":".join(map(str, (seed,) + parts)).encode("utf-8")).hexdigest()
 
-        # Use microphone as source (This will only work in a local environment with mic access)
-        # For deployment on Hugging Face Spaces, direct microphone access is typically not available
-        # You might need to consider a different STT approach for cloud deployment (e.g., pre-recorded audio upload, or a paid STT API)
-        st.warning("Microphone input for Speech-to-Text may not work in deployed environments like Hugging Face Spaces.")
-        with sr.Microphone() as source:
-            # Adjust for ambient noise
-            r.adjust_for_ambient_noise(source)
+def _split_counts(total: int, ratios: Dict[str, float], seed: int = 0) -> Dict[str, int]:
+    """Split total items by ratio, giving the remainder to the largest fractions (seeded ties)."""
+    weight = sum(ratios.values())
+    exact = {name: total * ratio / weight for name, ratio in ratios.items()}
+    counts = {name: int(value) for name, value in exact.items()}
+    ranked = sorted(exact, key=lambda n: (counts[n] - exact[n], _seeded_rank(seed, n)))
+    for name in ranked[:total - sum(counts.values())]:
+        counts[name] += 1
+    return counts
 
-            # Listen for audio
-            st.info("Listening... Speak now!")
-            audio = r.listen(source, timeout=5, phrase_time_limit=10)
+def _stratified_counts(sizes: Dict[tuple, int], ratios: Dict[str, float], seed: int = 0) -> Dict[tuple, Dict[str, int]]:
+    """Per-stratum split counts whose totals match the ratios over all strata.
 
-            # Recognize speech
-            text = r.recognize_google(audio, language=lang_code)
-            return text
+    Every stratum gets the floor of its exact share per split; the leftover
+    items are handed out largest fraction first across all strata at once,
+    so small strata do not all round the same way. Ties use the seeded hash.
+    """
+    weight = sum(ratios.values())
+    targets = _split_counts(sum(sizes.values()), ratios, seed)
+    counts, candidates = {}, []
+    for key, size in sizes.items():
+        exact = {name: size * ratio / weight for name, ratio in ratios.items()}
+        counts[key] = {name: int(value) for name, value in exact.items()}
+        candidates.extend((counts[key][name] - value, _seeded_rank(seed, *key, name), key, name)
+                          for name, value in exact.items() if value > counts[key][name])
+    open_cells = {(key, name) for _, _, key, name in candidates}
+    needed = {name: targets[name] - sum(c[name] for c in counts.values()) for name in ratios}
+    leftover = {key: size - sum(counts[key].values()) for key, size in sizes.items()}
+    extra = set()
+    for _, _, key, name in sorted(candidates):
+        if leftover[key] and needed[name]:
+            extra.add((key, name))
+            leftover[key] -= 1
+            needed[name] -= 1
+    # The greedy pass can strand an item in a stratum whose open splits are
+    # already full; shift other strata's extras along an alternating path.
+    for key in sorted(k for k in leftover if leftover[k]):
+        while leftover[key]:
+            via_split, via_stratum, frontier, found = {}, {key: None}, [key], None
+            while frontier and found is None:
+                stratum = frontier.pop(0)
+                for name in sorted(ratios, key=lambda n: _seeded_rank(seed, *stratum, n)):
+                    if (stratum, name) not in open_cells or (stratum, name) in extra or name in via_split:
+                        continue
+                    via_split[name] = stratum
+                    if needed[name]:
+                        found = name
+                        break
+                    for other in sorted(sizes):
+                        if (other, name) in extra and other not in via_stratum:
+                            via_stratum[other] = name
+                            frontier.append(other)
+            name = found
+            while True:
+                stratum = via_split[name]
+                extra.add((stratum, name))
+                name = via_stratum[stratum]
+                if name is None:
+                    break
+                extra.discard((stratum, name))
+            leftover[key] -= 1
+            needed[found] -= 1
+    for key, name in extra:
+        counts[key][name] += 1
+    return counts
 
-    except ImportError:
-        st.error("Speech recognition library not available. Please ensure 'SpeechRecognition' is installed.")
-        return None
-    except sr.UnknownValueError:
-        st.error("Could not understand audio. Please try again or speak more clearly.")
-        return None
-    except sr.RequestError as e:
-        st.error(f"Speech recognition service error (check internet/API): {str(e)}")
-        return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred in speech recognition: {str(e)}")
-        return None
+def assign_dataset_splits(entries: List[Dict], ratios: Dict[str, float] = DATASET_SPLITS,
+                          seed: int = 0) -> Dict[str, List[Dict]]:
+    """Stratified split by (language, category); each split comes back in seeded shuffle order.
 
-# Geocoding functionality
-def geocode_location(location_name: str) -> Optional[tuple]:
-    """Get coordinates for a location name using Nominatim."""
-    try:
-        from geopy.geocoders import Nominatim
-        
-        # Initialize geolocator with a user_agent
-        geolocator = Nominatim(user_agent="farming-wisdom-archive-app") # Changed user_agent
-        location = geolocator.geocode(location_name)
-        
-        if location:
-            return (location.latitude, location.longitude)
-        return None
-        
-    except ImportError:
-        st.error("Geocoding library not available. Please ensure 'geopy' is installed.")
-        return None
-    except Exception as e:
-        st.error(f"Error in geocoding: {str(e)}")
-        return None
+    Overall split sizes follow the ratios (largest remainder over the whole
+    archive), and each stratum is within one item of its proportional share.
+    """
+    def order(entry):
+        return _seeded_rank(seed, entry.get('id'))
 
-# Search functionality
-def search_entries(entries: List[Dict], query: str, language: str = None, 
-                   category: str = None, has_media: bool = False, 
-                   has_location: bool = False) -> List[Dict]:
-    """Search entries based on query and filters."""
-    results = []
-    query_lower = query.lower()
-    
+    strata = {}
     for entry in entries:
-        # Text search in title and description
-        title_match = query_lower in entry.get('title', '').lower()
-        desc_match = query_lower in entry.get('description', '').lower()
-        
-        if not (title_match or desc_match):
-            continue
-        
-        # Apply filters
-        if language and entry.get('language') != language:
-            continue
-        
-        if category and entry.get('category') != category:
-            continue
-        
-        if has_media and not (entry.get('image_path') or entry.get('audio_path')):
-            continue
-        
-        if has_location and not (entry.get('latitude') and entry.get('longitude')):
-            continue
-        
-        results.append(entry)
-    
-    return results
+        strata.setdefault((entry.get('language') or "", entry.get('category') or ""), []).append(entry)
+    counts = _stratified_counts({key: len(members) for key, members in strata.items()}, ratios, seed)
+    splits = {name: [] for name in ratios}
+    for key in sorted(strata):
+        members = sorted(strata[key], key=order)
+        start = 0
+        for name, count in counts[key].items():
+            splits[name].extend(members[start:start + count])
+            start += count
+    return {name: sorted(members, key=order) for name, members in splits.items()}
 
-# Export functionality
-def export_to_jsonl(entries: List[Dict], include_media: bool = True, 
-                    include_coordinates: bool = True) -> str:
-    """Export entries to JSONL format."""
-    lines = []
-    
-    for entry in entries:
-        export_entry = {
-            'id': entry.get('id'),
-            'title': entry.get('title'),
-            'description': entry.get('description'),
-            'language': entry.get('language'),
-            'category': entry.get('category'),
-            'location_name': entry.get('location_name'),
-            'timestamp': entry.get('timestamp'),
-            'contributor': entry.get('contributor')
-        }
-        
-        if include_coordinates:
-            export_entry['latitude'] = entry.get('latitude')
-            export_entry['longitude'] = entry.get('longitude')
-        
-        if include_media:
-            export_entry['image_path'] = entry.get('image_path')
-            export_entry['audio_path'] = entry.get('audio_path')
-        
-        lines.append(json.dumps(export_entry, ensure_ascii=False))
-    
-    return '\n'.join(lines)
+def _dataset_sample(entry: Dict, split: str, include_media: bool) -> Dict:
+    """Members of one sample: name -> bytes, or name -> source path for media."""
+    key = _dataset_key(entry['id'])
+    metadata = _export_row(entry, include_media=False)
+    metadata.update(split=split, version=entry.get('version'), media={}, missing_media=[])
+    members = {f"{key}.txt": (entry.get('description') or "").encode("utf-8")}
+    if include_media:
+        for field, kind in (('image_path', "image"), ('audio_path', "audio")):
+            path = entry.get(field)
+            if not path:
+                continue
+            if not os.path.isfile(path):
+                metadata["missing_media"].append(kind)
+                continue
+            name = f"{key}{os.path.splitext(path)[1].lower() or '.bin'}"
+            metadata["media"][kind] = name
+            members[name] = path
+    members[f"{key}.json"] = json.dumps(metadata, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return members
 
-def export_to_csv(entries: List[Dict], include_media: bool = True, 
-                  include_coordinates: bool = True) -> str:
-    """Export entries to CSV format."""
-    data = []
-    
-    for entry in entries:
-        row = {
-            'id': entry.get('id'),
-            'title': entry.get('title'),
-            'description': entry.get('description'),
-            'language': entry.get('language'),
-            'category': entry.get('category'),
-            'location_name': entry.get('location_name'),
-            'timestamp': entry.get('timestamp'),
-            'contributor': entry.get('contributor')
-        }
-        
-        if include_coordinates:
-            row['latitude'] = entry.get('latitude')
-            row['longitude'] = entry.get('longitude')
-        
-        if include_media:
-            row['image_path'] = entry.get('image_path')
-            row['audio_path'] = entry.get('audio_path')
-        
-        data.append(row)
-    
-    df = pd.DataFrame(data)
-    return df.to_csv(index=False)
+def _sample_bytes(members: Dict) -> int:
+    return sum(len(value) if isinstance(value, bytes) else os.path.getsize(value) for value in members.values()) \
+        + DATASET_TAR_OVERHEAD * len(members)
+
+def _write_dataset_shard(path: str, samples: List[Dict]) -> Dict:
+    """Write one tar shard with deterministic headers and its checksum manifest."""
+    members = []
+    with open(path, "wb") as raw:
+        with tarfile.open(fileobj=raw, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+            for sample in samples:
+                for name in sorted(sample):
+                    value = sample[name]
+                    if not isinstance(value, bytes):
+                        with open(value, "rb") as f:
+                            value = f.read()
+                    info = tarfile.TarInfo(name)
+                    info.size, info.mtime, info.mode = len(value), 0, 0o644
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = ""
+                    tar.addfile(info, io.BytesIO(value))
+                    members.append({"name": name, "size": len(value),
+                                    "sha256": hashlib.sha256(value).hexdigest()})
+    manifest = {"file": os.path.basename(path), "samples": len(samples), "bytes": os.path.getsize(path),
+                "sha256": _file_sha256(path), "members": members}
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+def package_dataset(out_dir: str, ratios: Dict[str, float] = DATASET_SPLITS, seed: int = 0,
+                    shard_bytes: int = DATASET_SHARD_BYTES, include_media: bool = True,
+                    workers: Optional[int] = None) -> Dict:
+    """Package the archive as deterministic, size-bounded tar shards per split.
+
+    Writes <split>-NNNNNN.tar shards with a .tar.json checksum manifest each,
+    plus dataset.json (splits, strata counts, shards) and SHA256SUMS. A
+    sample larger than shard_bytes gets a shard of its own.
+    """
+    if os.path.exists(out_dir) and os.listdir(out_dir):
+        raise ValueError(f"Output directory {out_dir} already exists and is not empty")
+    os.makedirs(out_dir, exist_ok=True)
+    entries = [entry for entry in load_entries() if entry.get('id') is not None]
+    splits = assign_dataset_splits(entries, ratios, seed)
+
+    # Plan every shard up front so the layout never depends on worker timing
+    jobs = []
+    for split, members in splits.items():
+        shard, size = [], 0
+        for entry in members:
+            sample = _dataset_sample(entry, split, include_media)
+            sample_size = _sample_bytes(sample)
+            if shard and size + sample_size > shard_bytes:
+                jobs.append((split, shard))
+                shard, size = [], 0
+            shard.append(sample)
+            size += sample_size
+        if shard:
+            jobs.append((split, shard))
+    numbers = {}
+    paths = []
+    for split, _ in jobs:
+        numbers[split] = numbers.get(split, -1) + 1
+        paths.append(os.path.join(out_dir, f"{split}-{numbers[split]:06d}.tar"))
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        shards = list(pool.map(_write_dataset_shard, paths, [shard for _, shard in jobs]))
+
+    strata = {}
+    for split, members in splits.items():
+        for entry in members:
+            stratum = f"{entry.get('language')}/{entry.get('category')}"
+            strata.setdefault(stratum, {name: 0 for name in splits})[split] += 1
+    manifest = {
+        "name": "farming-wisdom-archive",
+        "format": "webdataset",
+        "seed": seed,
+        "ratios": ratios,
+        "change_seq": get_change_seq(),
+        "samples": {split: len(members) for split, members in splits.items()},
+        "strata": dict(sorted(strata.items())),
+        "shards": [{key: value for key, value in shard.items() if key != "members"} | {"split": split}
+                   for (split, _), shard in zip(jobs, shards)]
+    }
+    with open(os.path.join(out_dir, "dataset.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    with open(os.path.join(out_dir, "SHA256SUMS"), "w", encoding="utf-8") as f:
+        f.writelines(f"{shard['sha256']}  {shard['file']}\n" for shard in shards)
+    return {"out_dir": out_dir, "shards": len(shards), "samples": manifest["samples"],
+            "bytes": sum(shard["bytes"] for shard in shards), "seconds": time.perf_counter() - started}
 
 # Utility functions
 def validate_coordinates(lat: float, lon: float) -> bool:
@@ -311,28 +2787,201 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     return text[:max_length] + "..."
 
 # File management
-def cleanup_media_files():
-    """Clean up orphaned media files."""
-    try:
-        entries = load_entries()
-        used_files = set()
-        
-        for entry in entries:
-            if entry.get('image_path'):
-                used_files.add(entry['image_path'])
-            if entry.get('audio_path'):
-                used_files.add(entry['audio_path'])
-        
-        # Check media directory for unused files
-        media_dir = "data_entries/media"
-        if os.path.exists(media_dir):
-            for filename in os.listdir(media_dir):
-                filepath = os.path.join(media_dir, filename)
-                if filepath not in used_files:
-                    os.remove(filepath)
-                    
-    except Exception as e:
-        st.error(f"Error cleaning up media files: {str(e)}")
+# Media garbage collection works from a persistent reference index instead of
+# listing the media directory: every file written through save_media_file()
+# (or released by an entry update) becomes a GC candidate, so each run only
+# examines files that changed since the last one.
+MEDIA_DIR = "data_entries/media"
+MEDIA_INDEX_FILE = "data_entries/media_index.json"
+MEDIA_FIELDS = ('image_path', 'audio_path', 'tts_path', 'audio_stream_path')
+MEDIA_GC_MIN_AGE = 3600           # never delete files younger than this (in-flight uploads)
+MEDIA_GC_BATCH_SIZE = 100
+MEDIA_GC_INTERVAL = 6 * 3600      # how often the background worker runs a GC pass
+
+_media_lock = ProcessLock("media")
+
+def _entry_media_paths(entry: Optional[Dict]) -> set:
+    if not entry:
+        return set()
+    return {entry[field] for field in MEDIA_FIELDS if entry.get(field)}
+
+def _build_media_index() -> Dict:
+    """One-time index build: count references and queue every unreferenced file already on disk."""
+    referenced = {}
+    for entry in load_entries():
+        for path in _entry_media_paths(entry):
+            referenced[path] = referenced.get(path, 0) + 1
+
+    candidates = {}
+    if os.path.exists(MEDIA_DIR):
+        with os.scandir(MEDIA_DIR) as it:
+            for item in it:
+                path = os.path.join(MEDIA_DIR, item.name)
+                if item.is_file() and path not in referenced:
+                    candidates[path] = item.stat().st_mtime
+    return {"referenced": referenced, "candidates": candidates, "last_gc": None}
+
+def load_media_index() -> Dict:
+    """Load the media reference index, building it on first use."""
+    with _media_lock:
+        if os.path.exists(MEDIA_INDEX_FILE):
+            with open(MEDIA_INDEX_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        index = _build_media_index()
+        _write_json_atomic(MEDIA_INDEX_FILE, index)
+        return index
+
+def _save_media_index(index: Dict) -> None:
+    _write_json_atomic(MEDIA_INDEX_FILE, index)
+
+def _register_media_candidate(path: str) -> None:
+    with _media_lock:
+        index = load_media_index()
+        index["candidates"][path] = time.time()
+        _save_media_index(index)
+
+def save_media_file(filename: str, data: bytes) -> str:
+    """Write a media file and register it as a GC candidate until an entry references it."""
+    path = os.path.join(MEDIA_DIR, filename)
+    _write_bytes_atomic(path, bytes(data))
+    _register_media_candidate(path)
+    return path
+
+def track_media_references(old_entry: Optional[Dict], new_entry: Optional[Dict]) -> None:
+    """Update reference counts after an entry was created, changed or removed."""
+    old_paths, new_paths = _entry_media_paths(old_entry), _entry_media_paths(new_entry)
+    if old_paths == new_paths:
+        return
+    with _media_lock:
+        index = load_media_index()
+        for path in new_paths - old_paths:
+            index["referenced"][path] = index["referenced"].get(path, 0) + 1
+        for path in old_paths - new_paths:
+            count = index["referenced"].get(path, 0) - 1
+            if count > 0:
+                index["referenced"][path] = count
+            else:
+                index["referenced"].pop(path, None)
+                # Released files get a fresh grace period before deletion
+                index["candidates"][path] = time.time()
+        _save_media_index(index)
+
+def collect_media_garbage(dry_run: bool = True, min_age: float = MEDIA_GC_MIN_AGE,
+                          batch_size: int = MEDIA_GC_BATCH_SIZE,
+                          max_files: Optional[int] = None) -> Dict:
+    """Delete unreferenced media files among the GC candidates.
+
+    Work is done in batches and the index is saved after each one, so an
+    interrupted run resumes where it stopped. With dry_run=True nothing is
+    deleted or modified; the report lists what would be removed.
+    """
+    report = {"examined": 0, "deleted": [], "referenced": 0, "too_young": 0, "missing": 0, "dry_run": dry_run}
+    now = time.time()
+
+    with _media_lock:
+        pending = list(load_media_index()["candidates"].items())
+    if max_files is not None:
+        pending = pending[:max_files]
+
+    for batch_start in range(0, len(pending), batch_size):
+        batch = pending[batch_start:batch_start + batch_size]
+        with _media_lock:
+            index = load_media_index()
+            for path, queued_at in batch:
+                report["examined"] += 1
+                if path in index["referenced"]:
+                    report["referenced"] += 1
+                    outcome = "drop"
+                elif now - queued_at < min_age:
+                    report["too_young"] += 1
+                    outcome = "keep"
+                elif not os.path.exists(path):
+                    report["missing"] += 1
+                    outcome = "drop"
+                else:
+                    report["deleted"].append(path)
+                    outcome = "delete"
+
+                if dry_run or outcome == "keep":
+                    continue
+                if outcome == "delete":
+                    os.remove(path)
+                # Only forget the candidate if it was not re-queued meanwhile
+                if index["candidates"].get(path) == queued_at:
+                    del index["candidates"][path]
+            if not dry_run:
+                index["last_gc"] = now
+                _save_media_index(index)
+
+    return report
+
+def cleanup_media_files(dry_run: bool = False) -> str:
+    """Clean up orphaned media files in the background. Returns the task key to poll."""
+    return submit_task("media_gc", collect_media_garbage, dry_run)
+
+# Audio streaming copies
+# Uploads are kept byte-for-byte for the archive; playback uses a small,
+# loudness-normalized copy written to static/audio/. Streamlit serves that
+# folder (server.enableStaticServing) through Tornado's StaticFileHandler,
+# which answers HTTP Range requests, so players start before the file is in.
+# Static files are public (no login check), so copies get random names.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+AUDIO_STREAM_DIR = os.path.join(STATIC_DIR, "audio")
+AUDIO_STREAM_URL = "app/static/audio"
+AUDIO_STREAM_LOUDNESS = "loudnorm=I=-16:TP=-1.5:LRA=11"    # EBU R128 speech target
+AUDIO_STREAM_TIMEOUT = 300
+# Tried in order; AAC is the fallback for ffmpeg builds without libopus
+AUDIO_STREAM_FORMATS = [
+    {"codec": "libopus", "extension": "ogg", "mime": "audio/ogg",
+     "args": ["-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg"]},
+    {"codec": "aac", "extension": "m4a", "mime": "audio/mp4",
+     "args": ["-c:a", "aac", "-b:a", "48k", "-movflags", "+faststart", "-f", "mp4"]}
+]
+
+def _ffmpeg_path() -> Optional[str]:
+    return shutil.which("ffmpeg")
+
+def transcode_audio(source_path: str) -> str:
+    """Write a mono, loudness-normalized streaming copy of an audio file. Returns its path.
+
+    Raises ValueError when ffmpeg is missing or cannot decode the file.
+    """
+    ffmpeg = _ffmpeg_path()
+    if ffmpeg is None:
+        raise ValueError("Audio transcoding needs 'ffmpeg' on the PATH.")
+    os.makedirs(AUDIO_STREAM_DIR, exist_ok=True)
+    stem = os.urandom(16).hex()
+    errors = []
+    for audio_format in AUDIO_STREAM_FORMATS:
+        path = os.path.join(AUDIO_STREAM_DIR, f"{stem}.{audio_format['extension']}")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        command = [ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-i", source_path,
+                   "-vn", "-ac", "1", "-af", AUDIO_STREAM_LOUDNESS] + audio_format["args"] + [tmp_path]
+        try:
+            result = subprocess.run(command, capture_output=True, timeout=AUDIO_STREAM_TIMEOUT)
+            if result.returncode == 0:
+                os.replace(tmp_path, path)
+                _register_media_candidate(path)
+                return path
+            errors.append(f"{audio_format['codec']}: {result.stderr.decode('utf-8', 'replace').strip()[-300:]}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    raise ValueError("Could not transcode audio: " + "; ".join(errors))
+
+def audio_stream_url(entry: Dict) -> Optional[str]:
+    """Relative URL of an entry's streaming copy, or None if it has none yet."""
+    path = entry.get('audio_stream_path')
+    if not path or not os.path.exists(path):
+        return None
+    return f"{AUDIO_STREAM_URL}/{os.path.basename(path)}"
+
+def audio_stream_mime(path: str) -> str:
+    extension = os.path.splitext(path)[1].lstrip(".")
+    for audio_format in AUDIO_STREAM_FORMATS:
+        if audio_format["extension"] == extension:
+            return audio_format["mime"]
+    return "audio/mpeg"
 
 def get_file_size(filepath: str) -> str:
     """Get human-readable file size."""
@@ -346,13 +2995,323 @@ def get_file_size(filepath: str) -> str:
     except:
         return "Unknown"
 
+# Backups
+# Snapshots are content-addressed: every file under data_entries/ is stored
+# once in backups/objects/ by SHA-256 and a snapshot is a manifest of paths.
+# Writers replace state files atomically, so a snapshot only holds each
+# store's lock long enough to open its files; reading and hashing happen
+# afterwards from the open handles. Files whose size, mtime and inode match
+# the previous snapshot are not read again, and append-only logs store just
+# the bytes added since, so a backup costs about as much as the churn.
+DATA_DIR = "data_entries"
+BACKUP_DIR = "backups"
+BACKUP_OBJECTS_DIR = os.path.join(BACKUP_DIR, "objects")
+BACKUP_SNAPSHOTS_DIR = os.path.join(BACKUP_DIR, "snapshots")
+BACKUP_SKIP_DIRS = ("locks", "embeddings")       # embeddings are rebuilt from entries
+BACKUP_CHUNK_SIZE = 1 << 20
+
+_backup_lock = ProcessLock("backup")
+
+def _append_only_files() -> tuple:
+    return (CHANGES_FILE, CHANGES_CHECKPOINT_FILE)
+
+def _entry_state_files() -> List[str]:
+    # Listed with _storage_lock held, so every segment index.json names is included
+    segment_files = []
+    if os.path.isdir(ENTRY_SEGMENTS_DIR):
+        segment_files = [os.path.join(ENTRY_SEGMENTS_DIR, name) for name in sorted(os.listdir(ENTRY_SEGMENTS_DIR))
+                         if not name.endswith(".tmp")]
+    return [ENTRIES_FILE, CHANGES_FILE, CHANGES_CHECKPOINT_FILE] + segment_files
+
+def _locked_state_files() -> List[tuple]:
+    """(lock, list_paths) groups; call list_paths() and capture the files under their writer's lock."""
+    return [
+        (_storage_lock, _entry_state_files),
+        (_users_lock, lambda: [USERS_FILE]),
+        (_outbox_lock, lambda: [OUTBOX_FILE]),
+        (_media_lock, lambda: [MEDIA_INDEX_FILE])
+    ]
+
+def _object_path(digest: str) -> str:
+    return os.path.join(BACKUP_OBJECTS_DIR, digest[:2], digest)
+
+def _store_object(f, length: int) -> tuple:
+    """Copy the next length bytes of f into the object store. Returns (digest, newly_stored)."""
+    os.makedirs(BACKUP_OBJECTS_DIR, exist_ok=True)
+    tmp_path = os.path.join(BACKUP_OBJECTS_DIR, f"incoming.{os.getpid()}.{threading.get_ident()}.tmp")
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as out:
+            remaining = length
+            while remaining > 0:
+                block = f.read(min(BACKUP_CHUNK_SIZE, remaining))
+                if not block:
+                    raise ValueError(f"{f.name} shrank while it was being backed up")
+                digest.update(block)
+                out.write(block)
+                remaining -= len(block)
+        path = _object_path(digest.hexdigest())
+        if os.path.exists(path):
+            return digest.hexdigest(), False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return digest.hexdigest(), True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _backup_file(f, stat, previous: Optional[Dict], append_only: bool, stats: Dict) -> Dict:
+    """Manifest record for an open file, reusing the previous snapshot's objects where possible."""
+    record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "ino": stat.st_ino, "parts": []}
+    if previous and previous["ino"] == stat.st_ino:
+        if previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            record["parts"] = previous["parts"]
+            return record
+        if append_only and previous["size"] <= stat.st_size:
+            # Only the tail is new; the earlier parts are still the file's prefix
+            record["parts"] = list(previous["parts"])
+            f.seek(previous["size"])
+    start = f.tell()
+    if stat.st_size > start:
+        digest, new = _store_object(f, stat.st_size - start)
+        record["parts"].append({"sha256": digest, "size": stat.st_size - start})
+        stats["new_objects"] += new
+        stats["new_bytes"] += (stat.st_size - start) if new else 0
+    return record
+
+def list_backups() -> List[Dict]:
+    """Snapshot manifests, oldest first."""
+    if not os.path.isdir(BACKUP_SNAPSHOTS_DIR):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(BACKUP_SNAPSHOTS_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(BACKUP_SNAPSHOTS_DIR, name), "r", encoding="utf-8") as f:
+                manifests.append(json.load(f))
+    return manifests
+
+def create_backup() -> Dict:
+    """Take an incremental snapshot of data_entries/. Returns the snapshot summary."""
+    with _backup_lock:
+        started = time.perf_counter()
+        previous = list_backups()
+        previous_files = previous[-1]["files"] if previous else {}
+        now = datetime.datetime.now()
+        manifest = {"id": now.strftime("%Y%m%dT%H%M%S%f"), "created": now.isoformat(), "files": {}}
+        stats = {"files": 0, "bytes": 0, "new_objects": 0, "new_bytes": 0, "locked_seconds": 0.0}
+        captured = set()
+
+        # Open each store's files under its lock; atomic replaces can't change them after that
+        opened = []
+        try:
+            for lock, list_paths in _locked_state_files():
+                locked_at = time.perf_counter()
+                with lock:
+                    if lock is _storage_lock:
+                        manifest["change_seq"] = get_change_seq()
+                    for path in list_paths():
+                        try:
+                            f = open(path, "rb")
+                        except (FileNotFoundError, IsADirectoryError):
+                            continue
+                        opened.append((path, f, os.fstat(f.fileno())))
+                stats["locked_seconds"] += time.perf_counter() - locked_at
+
+            for path, f, stat in opened:
+                relpath = os.path.relpath(path, DATA_DIR)
+                manifest["files"][relpath] = _backup_file(f, stat, previous_files.get(relpath),
+                                                          path in _append_only_files(), stats)
+                captured.add(relpath)
+        finally:
+            for _, f, _ in opened:
+                f.close()
+
+        # Media and transcripts are written once under unique names; no lock needed.
+        # Segments are rewritten in place, so only the locked capture may take them.
+        locked_dirs = BACKUP_SKIP_DIRS + (os.path.relpath(ENTRY_SEGMENTS_DIR, DATA_DIR),)
+        for root, dirs, files in os.walk(DATA_DIR):
+            dirs[:] = sorted(d for d in dirs if os.path.relpath(os.path.join(root, d), DATA_DIR)
+                             not in locked_dirs)
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, DATA_DIR)
+                if relpath in captured or name.endswith(".tmp"):
+                    continue
+                try:
+                    with open(path, "rb") as f:
+                        manifest["files"][relpath] = _backup_file(f, os.fstat(f.fileno()),
+                                                                  previous_files.get(relpath), False, stats)
+                except FileNotFoundError:
+                    continue
+
+        stats["files"] = len(manifest["files"])
+        stats["bytes"] = sum(record["size"] for record in manifest["files"].values())
+        stats["seconds"] = time.perf_counter() - started
+        manifest["stats"] = stats
+        _write_json_atomic(os.path.join(BACKUP_SNAPSHOTS_DIR, f"{manifest['id']}.json"), manifest)
+        return {"id": manifest["id"], "created": manifest["created"],
+                "change_seq": manifest.get("change_seq", 0), **stats}
+
+def _restore_file(record: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out:
+        for part in record["parts"]:
+            with open(_object_path(part["sha256"]), "rb") as f:
+                shutil.copyfileobj(f, out, BACKUP_CHUNK_SIZE)
+
+def _read_backup_lines(record: Dict):
+    """Complete lines of a backed-up append-only file, without restoring it."""
+    pending = b""
+    for part in record["parts"]:
+        with open(_object_path(part["sha256"]), "rb") as f:
+            for line in f:
+                line = pending + line
+                pending = b""
+                if line.endswith(b"\n"):
+                    yield line
+                else:
+                    pending = line
+
+def _rebuild_change_checkpoints(directory: str) -> None:
+    changes_path = os.path.join(directory, os.path.relpath(CHANGES_FILE, DATA_DIR))
+    checkpoints = []
+    if os.path.exists(changes_path):
+        offset = 0
+        with open(changes_path, "rb") as f:
+            for line in f:
+                seq = json.loads(line)["seq"]
+                if seq % FEED_CHECKPOINT_EVERY == 1:
+                    checkpoints.append(f"{seq} {offset}\n")
+                offset += len(line)
+    with open(os.path.join(directory, os.path.relpath(CHANGES_CHECKPOINT_FILE, DATA_DIR)), "w",
+              encoding="utf-8") as f:
+        f.writelines(checkpoints)
+
+def restore_backup(at: Optional[str] = None, target: Optional[str] = None) -> Dict:
+    """Rebuild data_entries/ as of an ISO timestamp (default: the latest snapshot) into target.
+
+    The newest snapshot taken at or before `at` is restored, then entry
+    changes made after it and up to `at` are replayed from the change feed of
+    the latest snapshot. Users, outbox and transcripts are as of the base
+    snapshot. The live data directory is never touched; stop the app and
+    swap the restored directory in.
+    """
+    snapshots = list_backups()
+    moment = datetime.datetime.fromisoformat(at) if at else None
+    eligible = [s for s in snapshots if moment is None or datetime.datetime.fromisoformat(s["created"]) <= moment]
+    if not eligible:
+        raise ValueError(f"No backup taken at or before {at}" if at else "No backups found")
+    base = eligible[-1]
+    target = target or f"{DATA_DIR}.restored-{base['id']}"
+    if os.path.exists(target) and os.listdir(target):
+        raise ValueError(f"Restore target {target} already exists and is not empty")
+
+    staging = f"{target}.{os.getpid()}.partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    for relpath, record in base["files"].items():
+        _restore_file(record, os.path.join(staging, relpath))
+
+    # Roll forward from the newest feed up to the requested moment
+    replayed = []
+    feed_record = snapshots[-1]["files"].get(os.path.relpath(CHANGES_FILE, DATA_DIR))
+    if moment is not None and snapshots[-1] is not base and feed_record:
+        for line in _read_backup_lines(feed_record):
+            change = json.loads(line)
+            if change["seq"] <= base.get("change_seq", 0):
+                continue
+            if datetime.datetime.fromisoformat(change["timestamp"]) > moment:
+                break
+            replayed.append((line, change))
+
+    if replayed:
+        segments_dir = os.path.join(staging, os.path.relpath(ENTRY_SEGMENTS_DIR, DATA_DIR))
+        if os.path.exists(os.path.join(segments_dir, "index.json")):
+            store = SegmentEntryStore(segments_dir)
+        else:
+            store = JsonEntryStore(os.path.join(staging, os.path.relpath(ENTRIES_FILE, DATA_DIR)))
+        entries = {entry.get('id'): entry for entry in store.load_all()}
+        for _, change in replayed:
+            if change["op"] == "delete":
+                entries.pop(change["id"], None)
+            else:
+                entries[change["id"]] = change["entry"]
+                # Media uploaded after the base snapshot comes from the newest one
+                for path in _entry_media_paths(change["entry"]):
+                    relpath = os.path.relpath(path, DATA_DIR)
+                    media_record = snapshots[-1]["files"].get(relpath)
+                    if media_record and not os.path.exists(os.path.join(staging, relpath)):
+                        _restore_file(media_record, os.path.join(staging, relpath))
+        store.write_all(sorted(entries.values(), key=lambda entry: entry.get('id')))
+        with open(os.path.join(staging, os.path.relpath(CHANGES_FILE, DATA_DIR)), "ab") as f:
+            f.writelines(line for line, _ in replayed)
+        _rebuild_change_checkpoints(staging)
+        # Reference counts changed with the replayed entries; rebuilt on first use
+        media_index = os.path.join(staging, os.path.relpath(MEDIA_INDEX_FILE, DATA_DIR))
+        if os.path.exists(media_index):
+            os.remove(media_index)
+
+    if os.path.exists(target):
+        os.rmdir(target)
+    os.replace(staging, target)
+    return {"snapshot": base["id"], "created": base["created"], "target": target,
+            "files": len(base["files"]), "replayed_changes": len(replayed),
+            "change_seq": replayed[-1][1]["seq"] if replayed else base.get("change_seq", 0)}
+
+def verify_backups(full: bool = True) -> Dict:
+    """Check that every object referenced by a snapshot exists and, with full=True, re-hash it."""
+    report = {"snapshots": 0, "objects": 0, "missing": [], "corrupt": []}
+    checked = set()
+    for manifest in list_backups():
+        report["snapshots"] += 1
+        for relpath, record in manifest["files"].items():
+            for part in record["parts"]:
+                digest = part["sha256"]
+                if digest in checked:
+                    continue
+                checked.add(digest)
+                path = _object_path(digest)
+                if not os.path.exists(path):
+                    report["missing"].append({"snapshot": manifest["id"], "file": relpath, "sha256": digest})
+                elif os.path.getsize(path) != part["size"] or (full and _file_sha256(path) != digest):
+                    report["corrupt"].append({"snapshot": manifest["id"], "file": relpath, "sha256": digest})
+    report["objects"] = len(checked)
+    report["ok"] = not report["missing"] and not report["corrupt"]
+    return report
+
+def prune_backups(keep: int) -> Dict:
+    """Delete all but the newest `keep` snapshots and the objects only they used."""
+    with _backup_lock:
+        snapshots = list_backups()
+        removed = snapshots[:-keep] if keep > 0 else snapshots
+        kept = snapshots[len(removed):]
+        for manifest in removed:
+            os.remove(os.path.join(BACKUP_SNAPSHOTS_DIR, f"{manifest['id']}.json"))
+        live = {part["sha256"] for manifest in kept for record in manifest["files"].values()
+                for part in record["parts"]}
+        deleted = 0
+        if os.path.isdir(BACKUP_OBJECTS_DIR):
+            for root, _, files in os.walk(BACKUP_OBJECTS_DIR):
+                for name in files:
+                    if name not in live and not name.endswith(".tmp"):
+                        os.remove(os.path.join(root, name))
+                        deleted += 1
+        return {"snapshots_removed": len(removed), "snapshots_kept": len(kept), "objects_removed": deleted}
+
+def backup_now() -> str:
+    """Take a snapshot in the background. Returns the task key to poll."""
+    return submit_task("backup", create_backup)
+
 # Authentication functions
+# Serializes users.json read-modify-write cycles across sessions and processes
+_users_lock = ProcessLock("users")
+USERS_FILE = "data_entries/users.json"
+
 def load_user_data() -> Dict:
     """Load user authentication data."""
     try:
         os.makedirs("data_entries", exist_ok=True)
-        if os.path.exists("data_entries/users.json"):
-            with open("data_entries/users.json", "r", encoding="utf-8") as f:
+        if os.path.exists(USERS_FILE):
+            with open(USERS_FILE, "r", encoding="utf-8") as f:
                 return json.load(f)
         return {"users": {}}
     except Exception as e:
@@ -362,9 +3321,7 @@ def load_user_data() -> Dict:
 def save_user_data(user_data: Dict) -> bool:
     """Save user authentication data."""
     try:
-        os.makedirs("data_entries", exist_ok=True)
-        with open("data_entries/users.json", "w", encoding="utf-8") as f:
-            json.dump(user_data, f, indent=2, ensure_ascii=False)
+        _write_json_atomic(USERS_FILE, user_data)
         return True
     except Exception as e:
         st.error(f"Error saving user data: {str(e)}")
@@ -380,29 +3337,31 @@ def verify_password(password: str, hashed: str) -> bool:
 
 def register_user(username: str, email: str, password: str, full_name: str) -> bool:
     """Register a new user."""
-    user_data = load_user_data()
-    
-    # Check if user already exists
-    if username in user_data["users"]:
-        st.error("Username already exists!")
-        return False
-    
-    # Check if email already exists
-    for user_info in user_data["users"].values():
-        if user_info.get("email") == email:
-            st.error("Email already registered!")
+    password_hash = hash_password(password)
+    with _users_lock:
+        user_data = load_user_data()
+        
+        # Check if user already exists
+        if username in user_data["users"]:
+            st.error("Username already exists!")
             return False
-    
-    # Add new user
-    user_data["users"][username] = {
-        "email": email,
-        "password": hash_password(password),
-        "full_name": full_name,
-        "registration_date": datetime.datetime.now().isoformat(),
-        "entries_submitted": 0
-    }
-    
-    return save_user_data(user_data)
+        
+        # Check if email already exists
+        for user_info in user_data["users"].values():
+            if user_info.get("email") == email:
+                st.error("Email already registered!")
+                return False
+        
+        # Add new user
+        user_data["users"][username] = {
+            "email": email,
+            "password": password_hash,
+            "full_name": full_name,
+            "registration_date": datetime.datetime.now().isoformat(),
+            "entries_submitted": 0
+        }
+        
+        return save_user_data(user_data)
 
 def authenticate_user(username: str, password: str) -> bool:
     """Authenticate a user."""
@@ -415,74 +3374,527 @@ def authenticate_user(username: str, password: str) -> bool:
     return verify_password(password, user_info["password"])
 
 def get_user_info(username: str) -> Dict:
-    """Get user information."""
+    """Get user information. entries_submitted is derived from the stored entries."""
     user_data = load_user_data()
-    return user_data["users"].get(username, {})
+    user_info = dict(user_data["users"].get(username, {}))
+    if user_info:
+        user_info["entries_submitted"] = get_user_entry_count(username)
+    return user_info
 
 def update_user_entry_count(username: str):
-    """Update user's entry submission count."""
-    user_data = load_user_data()
-    if username in user_data["users"]:
-        user_data["users"][username]["entries_submitted"] += 1
-        save_user_data(user_data)
+    """Sync the entries_submitted value kept in users.json with the stored entries."""
+    entry_count = get_user_entry_count(username)
+    with _users_lock:
+        user_data = load_user_data()
+        if username in user_data["users"]:
+            user_data["users"][username]["entries_submitted"] = entry_count
+            save_user_data(user_data)
 
 # Translation functions (using deep_translator)
+# Language code mapping (deep_translator uses standard ISO codes)
+TRANSLATION_LANG_CODES = {
+    "Hindi": "hi",
+    "English": "en",
+    "Bengali": "bn",
+    "Telugu": "te",
+    "Marathi": "mr",
+    "Tamil": "ta",
+    "Gujarati": "gu",
+    "Urdu": "ur",
+    "Kannada": "kn",
+    "Malayalam": "ml",
+    "Punjabi": "pa",
+    "Oriya": "or",
+    "Assamese": "as",
+    "Nepali": "ne",
+    "Sanskrit": "sa"
+}
+
+def translate_text_raw(text: str, target_lang: str, source_lang: str = "auto") -> str:
+    """Translate text with GoogleTranslator. Raises on network errors."""
+    target_code = TRANSLATION_LANG_CODES.get(target_lang, "en")
+    source_code = TRANSLATION_LANG_CODES.get(source_lang, "auto") if source_lang != "auto" else "auto"
+
+    return GoogleTranslator(source=source_code, target=target_code).translate(text)
+
 def translate_text(text: str, target_lang: str, source_lang: str = "auto") -> str:
     """Translate text using deep_translator's GoogleTranslator."""
     try:
-        # Language code mapping (deep_translator uses standard ISO codes)
-        lang_mapping = {
-            "Hindi": "hi",
-            "English": "en",
-            "Bengali": "bn",
-            "Telugu": "te",
-            "Marathi": "mr",
-            "Tamil": "ta",
-            "Gujarati": "gu",
-            "Urdu": "ur",
-            "Kannada": "kn",
-            "Malayalam": "ml",
-            "Punjabi": "pa",
-            "Oriya": "or",
-            "Assamese": "as",
-            "Nepali": "ne",
-            "Sanskrit": "sa"
-        }
-        
-        target_code = lang_mapping.get(target_lang, "en")
-        source_code = lang_mapping.get(source_lang, "auto") if source_lang != "auto" else "auto"
-        
-        translated = GoogleTranslator(source=source_code, target=target_code).translate(text)
-        return translated
+        return translate_text_raw(text, target_lang, source_lang)
     except Exception as e:
         st.error(f"Translation error: {str(e)}. Please check internet connection or try again.")
         return text
 
+# Local language detection
+# Most Indian-language text can be identified offline from its Unicode block.
+# Scripts shared by several languages (Devanagari: Hindi/Marathi) are split
+# with character trigram profiles; only ambiguous text goes to the network.
+SCRIPT_RANGES = [
+    (0x0900, 0x097F, "Devanagari"),
+    (0x0980, 0x09FF, "Bengali"),
+    (0x0A00, 0x0A7F, "Gurmukhi"),
+    (0x0A80, 0x0AFF, "Gujarati"),
+    (0x0B00, 0x0B7F, "Oriya"),
+    (0x0B80, 0x0BFF, "Tamil"),
+    (0x0C00, 0x0C7F, "Telugu"),
+    (0x0C80, 0x0CFF, "Kannada"),
+    (0x0D00, 0x0D7F, "Malayalam"),
+    (0x0600, 0x06FF, "Arabic")
+]
+
+# Scripts that identify a single supported language on their own
+SCRIPT_LANGUAGES = {
+    "Gurmukhi": "Punjabi",
+    "Gujarati": "Gujarati",
+    "Oriya": "Oriya",
+    "Tamil": "Tamil",
+    "Telugu": "Telugu",
+    "Kannada": "Kannada",
+    "Malayalam": "Malayalam"
+}
+
+# Seed text for the Devanagari trigram profiles
+DEVANAGARI_SEED_TEXT = {
+    "Hindi": (
+        "किसान अपने खेत में जैविक खाद का प्रयोग करते हैं और फसल की अच्छी पैदावार होती है। "
+        "बारिश के मौसम में बीज बोने से पहले मिट्टी को तैयार किया जाता है। "
+        "नीम की पत्तियों से कीटों को दूर रखा जाता है। "
+        "यह तरीका हमारे पूर्वजों से चला आ रहा है और आज भी गाँवों में इसका उपयोग होता है। "
+        "पानी की बचत के लिए खेतों में मेड़ बनाई जाती है। "
+        "गोबर और गोमूत्र से बनी खाद मिट्टी की उर्वरता बढ़ाती है। "
+        "फसल कटाई के बाद अनाज को सुखाकर भंडार में रखा जाता है। "
+        "हम लोग नहीं चाहते कि रासायनिक दवाओं का इस्तेमाल हो।"
+    ),
+    "Marathi": (
+        "शेतकरी आपल्या शेतात सेंद्रिय खताचा वापर करतात आणि पिकाचे चांगले उत्पादन होते. "
+        "पावसाळ्यात बियाणे पेरण्यापूर्वी जमीन तयार केली जाते. "
+        "कडुलिंबाच्या पानांनी किडींना दूर ठेवले जाते. "
+        "ही पद्धत आमच्या पूर्वजांपासून चालत आली आहे आणि आजही गावांमध्ये तिचा वापर होतो. "
+        "पाण्याची बचत करण्यासाठी शेतात बांध घातले जातात. "
+        "शेण आणि गोमूत्रापासून बनवलेले खत जमिनीची सुपीकता वाढवते. "
+        "पीक काढणीनंतर धान्य वाळवून कोठारात ठेवले जाते. "
+        "आम्हाला रासायनिक औषधांचा वापर नको आहे."
+    )
+}
+
+ENGLISH_STOPWORDS = {
+    "the", "and", "of", "to", "in", "is", "for", "with", "on", "this", "that",
+    "are", "it", "as", "by", "from", "be", "we", "our", "was", "before", "after"
+}
+
+DETECTION_SAMPLE_CHARS = 2000     # enough text to classify; keeps long entries cheap
+SCRIPT_DOMINANCE = 0.6            # share of letters one script must hold
+NGRAM_MARGIN = 0.15               # mean log-prob gap per trigram to trust the profile
+
+def _script_of(char: str) -> Optional[str]:
+    code = ord(char)
+    for low, high, script in SCRIPT_RANGES:
+        if low <= code <= high:
+            return script
+    if char.isascii() and char.isalpha():
+        return "Latin"
+    return None
+
+def script_histogram(text: str) -> Dict[str, int]:
+    """Count letters per Unicode script."""
+    counts = {}
+    for char in text:
+        script = _script_of(char)
+        if script:
+            counts[script] = counts.get(script, 0) + 1
+    return counts
+
+def _trigrams(text: str) -> List[str]:
+    padded = f" {' '.join(text.split())} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def _build_trigram_profile(text: str) -> tuple:
+    counts = {}
+    for gram in _trigrams(text):
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts, sum(counts.values()), len(counts) + 1
+
+_DEVANAGARI_PROFILES = {lang: _build_trigram_profile(seed) for lang, seed in DEVANAGARI_SEED_TEXT.items()}
+
+def _classify_devanagari(text: str) -> Optional[str]:
+    """Pick the Devanagari language whose trigram profile fits best, or None if too close."""
+    grams = [g for g in _trigrams(text) if any(_script_of(c) == "Devanagari" for c in g)]
+    if not grams:
+        return None
+
+    scores = {}
+    for lang, (counts, total, vocab) in _DEVANAGARI_PROFILES.items():
+        scores[lang] = sum(math.log((counts.get(g, 0) + 1) / (total + vocab)) for g in grams) / len(grams)
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if ranked[0][1] - ranked[1][1] < NGRAM_MARGIN:
+        return None
+    return ranked[0][0]
+
+def _supported_language(language: Optional[str]) -> Optional[str]:
+    """Fold a detected language the archive does not list (e.g. Assamese, Punjabi) into "Other"."""
+    if language is None or language in get_languages():
+        return language
+    return "Other"
+
+@lru_cache(maxsize=4096)
+def detect_language_local(text: str) -> Optional[str]:
+    """Detect language offline from script and trigram statistics. Returns None when ambiguous.
+
+    The result is always one of get_languages().
+    """
+    return _supported_language(_detect_script_language(text))
+
+def _detect_script_language(text: str) -> Optional[str]:
+    sample = text[:DETECTION_SAMPLE_CHARS]
+    histogram = script_histogram(sample)
+    letters = sum(histogram.values())
+    if not letters:
+        return None
+
+    script, count = max(histogram.items(), key=lambda item: item[1])
+    if count / letters < SCRIPT_DOMINANCE:
+        return None
+
+    if script in SCRIPT_LANGUAGES:
+        return SCRIPT_LANGUAGES[script]
+    if script == "Devanagari":
+        return _classify_devanagari(sample)
+    if script == "Bengali":
+        # ৰ and ৱ only occur in Assamese
+        return "Assamese" if any(c in sample for c in "\u09f0\u09f1") else "Bengali"
+    if script == "Arabic":
+        # ٹ ڈ ڑ ں ہ ے are Urdu-specific letters
+        return "Urdu" if any(c in sample for c in "\u0679\u0688\u0691\u06ba\u06c1\u06d2") else None
+    if script == "Latin":
+        words = re.findall(r"[a-z]+", sample.lower())
+        if words and sum(w in ENGLISH_STOPWORDS for w in words) / len(words) >= 0.15:
+            return "English"
+    return None
+
+@lru_cache(maxsize=1024)
+def _detect_language_remote(text: str) -> str:
+    detected_code = GoogleTranslator(source="auto", target="en").detect(text) # target 'en' is default, can be any valid language code
+
+    # Reverse mapping for display (codes to names)
+    lang_mapping_reverse = {code: name for name, code in TRANSLATION_LANG_CODES.items()}
+    return _supported_language(lang_mapping_reverse.get(detected_code)) or "Unknown"
+
+def detect_language_raw(text: str) -> str:
+    """Detect language locally, falling back to GoogleTranslator for ambiguous text. Raises on network errors."""
+    return detect_language_local(text) or _detect_language_remote(text)
+
 def detect_language(text: str) -> str:
-    """Detect the language of given text using deep_translator's GoogleTranslator."""
+    """Detect the language of given text, using the network only for ambiguous text."""
     try:
-        detected_code = GoogleTranslator(source="auto", target="en").detect(text) # target 'en' is default, can be any valid language code
-
-        # Reverse mapping for display (ensure this maps codes to names)
-        lang_mapping_reverse = {
-            "hi": "Hindi",
-            "en": "English",
-            "bn": "Bengali",
-            "te": "Telugu",
-            "mr": "Marathi",
-            "ta": "Tamil",
-            "gu": "Gujarati",
-            "ur": "Urdu",
-            "kn": "Kannada",
-            "ml": "Malayalam",
-            "pa": "Punjabi",
-            "or": "Oriya",
-            "as": "Assamese",
-            "ne": "Nepali",
-            "sa": "Sanskrit"
-        }
-        
-        return lang_mapping_reverse.get(detected_code, "Unknown")
+        return detect_language_raw(text)
     except Exception as e:
         st.error(f"Language detection error: {str(e)}")
         return "Unknown"
+
+# Offline outbox and background enrichment
+# Submissions are saved locally first; anything that needs the network
+# (geocoding, translation, TTS pre-render) is queued here and retried later.
+OUTBOX_FILE = "data_entries/outbox.json"
+ENRICHMENT_BASE_DELAY = 30        # seconds before the first retry
+ENRICHMENT_MAX_DELAY = 3600       # backoff ceiling
+ENRICHMENT_MAX_ATTEMPTS = 8
+ENRICHMENT_POLL_INTERVAL = 5
+
+_outbox_lock = ProcessLock("outbox")
+# Only the process holding this lock runs outbox jobs and media GC
+_worker_lock = ProcessLock("enrichment-worker")
+_enrichment_worker = None
+_enrichment_wakeup = threading.Event()
+
+def load_outbox() -> Dict:
+    """Load queued enrichment jobs."""
+    with _outbox_lock:
+        if os.path.exists(OUTBOX_FILE):
+            with open(OUTBOX_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"jobs": []}
+
+def save_outbox(outbox: Dict) -> None:
+    """Persist queued enrichment jobs."""
+    with _outbox_lock:
+        _write_json_atomic(OUTBOX_FILE, outbox)
+
+def enqueue_enrichment(entry: Dict, transcribe: bool = True) -> List[str]:
+    """Queue the network-dependent enrichment jobs an entry needs. Returns the queued task names."""
+    tasks = []
+    if entry.get('audio_path') and not entry.get('audio_stream_path'):
+        tasks.append("transcode")
+    if transcribe and entry.get('audio_path'):
+        tasks.append("transcribe")
+    if entry.get('location_name') and not (entry.get('latitude') and entry.get('longitude')):
+        tasks.append("geocode")
+    if entry.get('language') != "English":
+        tasks.append("translate")
+    if entry.get('description'):
+        tasks.append("tts")
+
+    if not tasks:
+        return tasks
+
+    with _outbox_lock:
+        outbox = load_outbox()
+        for task in tasks:
+            outbox["jobs"].append({
+                "entry_id": entry.get('id'),
+                "task": task,
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt": 0,
+                "last_error": None
+            })
+        save_outbox(outbox)
+    _enrichment_wakeup.set()
+    return tasks
+
+def get_enrichment_statuses() -> Dict[int, Dict[str, str]]:
+    """Map entry id -> {task: status} for every job in the outbox."""
+    statuses = {}
+    try:
+        for job in load_outbox()["jobs"]:
+            statuses.setdefault(job["entry_id"], {})[job["task"]] = job["status"]
+    except Exception:
+        pass
+    return statuses
+
+def _enrichment_backoff(attempts: int) -> float:
+    """Exponential backoff delay after the given number of failed attempts."""
+    return min(ENRICHMENT_BASE_DELAY * (2 ** (attempts - 1)), ENRICHMENT_MAX_DELAY)
+
+def _run_enrichment_job(job: Dict) -> str:
+    """Perform one job against the network. Returns the final status; raises to request a retry."""
+    entry = get_entry(job["entry_id"])
+    if entry is None:
+        return "skipped"
+
+    if job["task"] == "geocode":
+        if entry.get('latitude') and entry.get('longitude'):
+            return "done"
+        coords = geocode_location_raw(entry['location_name'])
+        if not coords:
+            return "not_found"
+        update_entry(entry['id'], {'latitude': coords[0], 'longitude': coords[1]})
+        return "done"
+
+    if job["task"] == "translate":
+        source = entry.get('language') if entry.get('language') in TRANSLATION_LANG_CODES else "auto"
+        translations = dict(entry.get('translations') or {})
+        translations["English"] = {
+            'title': translate_text_raw(entry.get('title', ''), "English", source),
+            'description': translate_text_raw(entry.get('description', ''), "English", source)
+        }
+        update_entry(entry['id'], {'translations': translations})
+        return "done"
+
+    if job["task"] == "transcribe":
+        if entry.get('transcript') is not None:
+            return "done"
+        if not entry.get('audio_path') or not os.path.exists(entry['audio_path']):
+            return "skipped"
+        try:
+            transcript = transcribe_audio_file(entry['audio_path'], entry.get('language', 'English'))
+        except ValueError:
+            return "unsupported"
+        update_entry(entry['id'], stitch_transcript(entry, transcript))
+        return "done"
+
+    if job["task"] == "transcode":
+        if entry.get('audio_stream_path') and os.path.exists(entry['audio_stream_path']):
+            return "done"
+        if not entry.get('audio_path') or not os.path.exists(entry['audio_path']):
+            return "skipped"
+        try:
+            stream_path = transcode_audio(entry['audio_path'])
+        except ValueError:
+            return "unsupported"
+        update_entry(entry['id'], {'audio_stream_path': stream_path})
+        return "done"
+
+    if job["task"] == "tts":
+        audio_bytes = synthesize_speech(entry.get('description', ''), entry.get('language', 'en'))
+        tts_path = save_media_file(f"tts_{entry['id']}.mp3", audio_bytes)
+        update_entry(entry['id'], {'tts_path': tts_path})
+        return "done"
+
+    return "skipped"
+
+def process_outbox_once(now: Optional[float] = None) -> int:
+    """Run every job that is due. Returns how many jobs were attempted."""
+    now = time.time() if now is None else now
+    due = [job for job in load_outbox()["jobs"]
+           if job["status"] in ("pending", "retrying") and job["next_attempt"] <= now]
+
+    for job in due:
+        try:
+            status, error = _run_enrichment_job(job), None
+        except Exception as e:
+            job["attempts"] += 1
+            error = str(e)
+            if job["attempts"] >= ENRICHMENT_MAX_ATTEMPTS:
+                status = "failed"
+            else:
+                status = "retrying"
+                job["next_attempt"] = now + _enrichment_backoff(job["attempts"])
+
+        # Re-read under the lock so jobs queued meanwhile are not lost.
+        with _outbox_lock:
+            outbox = load_outbox()
+            for stored in outbox["jobs"]:
+                if stored["entry_id"] == job["entry_id"] and stored["task"] == job["task"] \
+                        and stored["status"] in ("pending", "retrying"):
+                    stored.update(job, status=status, last_error=error)
+                    break
+            save_outbox(outbox)
+
+    return len(due)
+
+def _enrichment_loop():
+    last_gc = 0.0
+    leader = False
+    while True:
+        # Replicas share one outbox; the first to take the lock keeps it until it exits
+        leader = leader or _worker_lock.acquire(blocking=False)
+        if not leader:
+            _enrichment_wakeup.wait(ENRICHMENT_POLL_INTERVAL)
+            _enrichment_wakeup.clear()
+            continue
+        try:
+            process_outbox_once()
+        except Exception:
+            pass
+        if time.time() - last_gc > MEDIA_GC_INTERVAL:
+            last_gc = time.time()
+            try:
+                collect_media_garbage(dry_run=False)
+            except Exception:
+                pass
+        _enrichment_wakeup.wait(ENRICHMENT_POLL_INTERVAL)
+        _enrichment_wakeup.clear()
+
+def start_enrichment_worker() -> None:
+    """Start the background enrichment thread once per process."""
+    global _enrichment_worker
+    with _outbox_lock:
+        if _enrichment_worker is None or not _enrichment_worker.is_alive():
+            _enrichment_worker = threading.Thread(target=_enrichment_loop, name="enrichment-worker", daemon=True)
+            _enrichment_worker.start()
+
+# Background task runner
+# Slow external calls (translation, detection, geocoding, TTS, STT) run on a
+# shared thread pool so Streamlit reruns never wait on them. Identical calls
+# that are still in flight share one future; pages poll by task key.
+TASK_WORKERS = 8
+TASK_RESULT_TTL = 600     # seconds a finished result stays available for polling
+TASK_TIMEOUTS = {
+    "translate": 30,
+    "detect_language": 15,
+    "geocode": 15,
+    "tts": 60,
+    "stt": 30,
+    "media_gc": 600,
+    "backup": 3600
+}
+
+_task_executor = None
+_tasks: Dict[str, Dict] = {}
+_tasks_lock = threading.Lock()
+
+def get_task_executor() -> ThreadPoolExecutor:
+    """Shared process-wide thread pool for background calls."""
+    global _task_executor
+    with _tasks_lock:
+        if _task_executor is None:
+            _task_executor = ThreadPoolExecutor(max_workers=TASK_WORKERS, thread_name_prefix="fwa-task")
+        return _task_executor
+
+def task_key(name: str, *args) -> str:
+    """Stable key identifying a call by name and arguments."""
+    payload = json.dumps([name, list(args)], ensure_ascii=False, sort_keys=True, default=str)
+    return f"{name}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+def _prune_tasks(now: float) -> None:
+    for key in [k for k, t in _tasks.items()
+                if t["finished"] and now - t["finished"] > TASK_RESULT_TTL and t["future"].done()]:
+        del _tasks[key]
+
+def _finish_task(task: Dict, status: str) -> None:
+    if task["status"] == "running":
+        task["status"] = status
+        task["finished"] = time.time()
+
+def submit_task(name: str, fn, *args, timeout: Optional[float] = None) -> str:
+    """Run fn(*args) in the background and return its task key.
+
+    If an identical call is already running, its key is returned instead of
+    starting a second call. That includes calls that timed out or were
+    cancelled while their worker thread is still busy: polling them keeps
+    reporting "timeout" or "cancelled" until the thread finishes.
+    """
+    key = task_key(name, *args)
+    executor = get_task_executor()
+    now = time.time()
+    with _tasks_lock:
+        _prune_tasks(now)
+        task = _tasks.get(key)
+        if task and (task["status"] == "running" or not task["future"].done()):
+            return key
+
+        task = {
+            "status": "running",
+            "deadline": now + (timeout or TASK_TIMEOUTS.get(name, 30)),
+            "finished": None,
+            "future": None
+        }
+        _tasks[key] = task
+        future = executor.submit(fn, *args)
+        task["future"] = future
+
+    def _on_done(f: Future):
+        with _tasks_lock:
+            if f.cancelled():
+                _finish_task(task, "cancelled")
+            elif f.exception() is not None:
+                _finish_task(task, "error")
+            else:
+                _finish_task(task, "done")
+
+    future.add_done_callback(_on_done)
+    return key
+
+def get_task_result(key: str) -> tuple:
+    """Poll a task. Returns (status, value) without blocking.
+
+    status is one of "running", "done", "error", "timeout", "cancelled" or
+    "unknown"; value is the result for "done" and the exception for "error".
+    """
+    with _tasks_lock:
+        task = _tasks.get(key)
+        if task is None:
+            return "unknown", None
+        if task["status"] == "running" and time.time() > task["deadline"]:
+            # The worker thread cannot be interrupted; its late result is discarded.
+            task["future"].cancel()
+            _finish_task(task, "timeout")
+        status = task["status"]
+        future = task["future"]
+
+    if status == "done":
+        return status, future.result()
+    if status == "error":
+        return status, future.exception()
+    return status, None
+
+def cancel_task(key: str) -> bool:
+    """Stop waiting for a task. Returns True if it was still running."""
+    with _tasks_lock:
+        task = _tasks.get(key)
+        if task is None or task["status"] != "running":
+            return False
+        task["future"].cancel()
+        _finish_task(task, "cancelled")
+        return True
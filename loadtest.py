@@ -0,0 +1,495 @@
+"""Headless load test for the Farming Wisdom Archive.
+
+Simulated users drive app.py through Streamlit's AppTest against a seeded
+synthetic archive. Translation, language detection, geocoding, TTS and speech
+recognition are stubbed, so nothing leaves the machine:
+
+    python loadtest.py --entries 5000 --users 8 --actions 25
+    python loadtest.py --mix browse=1,search=1 --storage segments
+
+Every rerun is timed; the report gives p50/p95/p99 latency per action and
+overall, reruns per second, and resident memory added per session.
+
+AppTest swaps a process-wide runtime around every run, so sessions cannot
+share a process: each simulated user gets its own, all working on one seeded
+data_entries/ directory exactly like several app replicas would.
+
+AppTest always reruns the whole script and starts every run with empty
+caches, so it cannot show what fragments and st.cache_data save. The
+--interactions mode starts a real `streamlit run` server instead and talks
+to it over the browser websocket protocol, timing single interactions the
+way a browser triggers them (fragment-scoped where the widget is in one):
+
+    python loadtest.py --interactions --entries 10000
+    python loadtest.py --interactions --app /tmp/app_before.py
+"""
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import numpy as np
+from PIL import Image
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.element_tree import parse_tree_from_messages
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+import helpers
+import manage
+
+APP_FILE = os.path.join(ROOT, "app.py")
+DEFAULT_MIX = {"browse": 40, "search": 25, "submit": 10, "map": 15, "export": 10}
+RERUN_TIMEOUT = 120
+STARTUP_TIMEOUT = 300             # seconds for every user process to import the app and log in
+PAGES = {
+    "browse": "📖 Browse Farming Knowledge",
+    "search": "🔍 Search Knowledge",
+    "submit": "✍️ Submit Farming Wisdom",
+    "map": "🗺️ Farming Wisdom Map",
+    "export": "📊 Export Data"
+}
+SEARCH_QUERIES = ["neem", "irrigation", "seed", "monsoon", "termite", "बीज", "शेतकरी", "விதை", "compost", "rain"]
+
+def stub_network_services() -> None:
+    """Replace every call that would reach the network with a fast local stand-in."""
+    helpers.translate_text_raw = lambda text, target_lang, source_lang="auto": f"[{target_lang}] {text}"
+    helpers._detect_language_remote = lambda text: "English"
+    helpers.detect_language_raw = lambda text: helpers.detect_language_local(text) or "English"
+    helpers.geocode_location_raw = lambda location_name: (17.385, 78.4867)
+    helpers.synthesize_speech = lambda text, language="en": b"ID3" + b"\0" * 1024
+    helpers.recognize_microphone = lambda language="en": "stubbed speech"
+    helpers.TRANSCRIBE_RECOGNIZER = "stub"
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        if resource is None:
+            return 0
+        # Peak RSS is the best portable approximation (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def _sample_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (90, 140, 60)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _sample_wav(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\0\0" * int(seconds * rate))
+    return buffer.getvalue()
+
+def _by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    return None
+
+class SimulatedUser:
+    """One logged-in browser session driven by a random action mix."""
+
+    def __init__(self, username: str, mix: dict, rng: random.Random, media: dict):
+        self.username = username
+        self.mix = mix
+        self.rng = rng
+        self.media = media
+        self.samples = []             # (action, seconds) per rerun
+        self.errors = []
+        self.at = None
+
+    def _run(self, action: str) -> None:
+        started = time.perf_counter()
+        self.at.run(timeout=RERUN_TIMEOUT)
+        self.samples.append((action, time.perf_counter() - started))
+        if self.at.exception:
+            self.errors.append((action, self.at.exception[0].message))
+
+    def start(self) -> None:
+        self.at = AppTest.from_file(APP_FILE, default_timeout=RERUN_TIMEOUT)
+        self.at.session_state["authenticated"] = True
+        self.at.session_state["username"] = self.username
+        self._run("login")
+
+    def _goto(self, action: str) -> None:
+        self.at.sidebar.radio[0].set_value(PAGES[action])
+        self._run(action)
+
+    def browse(self) -> None:
+        self._goto("browse")
+        if self.rng.random() < 0.3:
+            _by_label(self.at.selectbox, "Filter by Language").set_value(self.rng.choice(helpers.get_languages()))
+            self._run("browse")
+        for _ in range(self.rng.randint(0, 3)):
+            next_button = _by_label(self.at.button, "Next ➡️")
+            if next_button is None or next_button.disabled:
+                break
+            next_button.click()
+            self._run("browse")
+
+    def search(self) -> None:
+        self._goto("search")
+        _by_label(self.at.text_input, "Search for farming practices, techniques, or knowledge...") \
+            .set_value(self.rng.choice(SEARCH_QUERIES))
+        self._run("search")
+
+    def submit(self) -> None:
+        self._goto("submit")
+        _by_label(self.at.text_input, "Title*").set_value(f"Load test entry by {self.username}")
+        _by_label(self.at.text_area, "Description*").set_value(
+            manage.SYNTHETIC_TEXT[self.rng.choice(list(manage.SYNTHETIC_TEXT))])
+        _by_label(self.at.text_input, "Location").set_value(f"Village {self.rng.randint(1, 500)}")
+        if self.rng.random() < 0.5:
+            _by_label(self.at.file_uploader, "Upload Image").set_value(("field.png", self.media["image"], "image/png"))
+        if self.rng.random() < 0.3:
+            _by_label(self.at.file_uploader, "Upload Audio").set_value(("story.wav", self.media["audio"], "audio/wav"))
+        _by_label(self.at.button, "Submit Entry").click()
+        self._run("submit")
+
+    def map(self) -> None:
+        self._goto("map")
+
+    def export(self) -> None:
+        self._goto("export")
+        _by_label(self.at.selectbox, "Format").set_value(self.rng.choice(["JSONL", "CSV"]))
+        self._run("export")
+        _by_label(self.at.button, "Generate Export").click()
+        self._run("export")
+
+    def act(self, count: int) -> None:
+        actions, weights = zip(*self.mix.items())
+        for action in self.rng.choices(actions, weights, k=count):
+            try:
+                getattr(self, action)()
+            except Exception as e:
+                self.errors.append((action, repr(e)))
+
+def _percentiles(seconds: list) -> str:
+    if not seconds:
+        return f"{'-':>8} {'-':>8} {'-':>8}"
+    p50, p95, p99 = np.percentile(np.array(seconds) * 1000, [50, 95, 99])
+    return f"{p50:8.1f} {p95:8.1f} {p99:8.1f}"
+
+def _user_process(workdir: str, username: str, mix: dict, seed: int, actions: int, media: dict,
+                  barrier, results) -> None:
+    """Run one simulated user in its own process and report its samples."""
+    os.chdir(workdir)
+    stub_network_services()
+    helpers.ensure_entry_indexes()
+    sim = SimulatedUser(username, mix, random.Random(seed), media)
+    rss_start = _rss_bytes()
+    try:
+        sim.start()
+    except Exception as e:
+        sim.errors.append(("login", repr(e)))
+    rss_login = _rss_bytes()
+    try:
+        barrier.wait(STARTUP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+    sim.act(actions)
+    results.put({
+        "username": username,
+        "samples": sim.samples,
+        "errors": sim.errors,
+        "memory_login": rss_login - rss_start,
+        "memory_after": _rss_bytes() - rss_start
+    })
+
+def run_load_test(entries: int, users: int, actions: int, mix: dict, storage: str, seed: int) -> dict:
+    """Seed an archive in a scratch directory, run the simulated users and print a report."""
+    workdir = tempfile.mkdtemp(prefix="fwa-load-")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        helpers.JsonEntryStore().write_all(manage.generate_synthetic_entries(entries, seed))
+        if storage == "segments":
+            helpers.migrate_entries_to_segments()
+        media = {"image": _sample_png(), "audio": _sample_wav()}
+        usernames = [f"loaduser{n}" for n in range(users)]
+        for username in usernames:
+            helpers.register_user(username, f"{username}@example.org", "load-test", username)
+
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(users + 1)
+        results = context.Queue()
+        processes = [context.Process(target=_user_process, name=username,
+                                     args=(workdir, username, mix, seed + n, actions, media, barrier, results))
+                     for n, username in enumerate(usernames)]
+        for process in processes:
+            process.start()
+
+        # The clock starts once every user has logged in
+        try:
+            barrier.wait(STARTUP_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+        started = time.perf_counter()
+        reports = []
+        for _ in processes:
+            try:
+                reports.append(results.get(timeout=RERUN_TIMEOUT * actions * 4))
+            except queue.Empty:
+                break
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+
+        samples = [sample for r in reports for sample in r["samples"] if sample[0] != "login"]
+        errors = [error for r in reports for error in r["errors"]]
+        errors += [("process", f"{username} reported nothing") for username in
+                   sorted(set(usernames) - {r["username"] for r in reports})]
+        report = {
+            "reruns": len(samples),
+            "elapsed": elapsed,
+            "throughput": len(samples) / elapsed if elapsed else 0.0,
+            "memory_per_session": float(np.mean([r["memory_after"] for r in reports])) if reports else 0.0,
+            "errors": errors
+        }
+
+        print(f"{entries} entries ({storage}), {users} concurrent users x {actions} actions")
+        print(f"{'action':10} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for action in mix:
+            seconds = [s for name, s in samples if name == action]
+            print(f"{action:10} {len(seconds):7d} {_percentiles(seconds)}")
+        print(f"{'all':10} {len(samples):7d} {_percentiles([s for _, s in samples])}")
+        print(f"throughput: {report['throughput']:.1f} reruns/s over {elapsed:.1f} s")
+        if reports:
+            print(f"memory: {np.mean([r['memory_login'] for r in reports]) / 2**20:.1f} MB per session after login, "
+                  f"{report['memory_per_session'] / 2**20:.1f} MB per session after the run")
+        if errors:
+            print(f"{len(errors)} errors, first: {errors[0]}")
+        return report
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+INTERACTION_REPEAT = 10
+SERVER_STARTUP_TIMEOUT = 60
+INTERACTION_USER = ("uiuser", "load-test")
+
+# Streamlit runs this wrapper as the main script: the stubs stay installed in
+# the imported helpers module, and the app itself runs unchanged.
+_SERVER_WRAPPER = """import sys
+sys.path.insert(0, {root!r})
+import loadtest
+loadtest.stub_network_services()
+loadtest.run_app_script({app!r})
+"""
+_compiled_apps = {}
+
+def run_app_script(path: str) -> None:
+    """Execute an app script as __main__, compiling it once like `streamlit run` does."""
+    if path not in _compiled_apps:
+        with open(path, encoding="utf-8") as f:
+            _compiled_apps[path] = compile(f.read(), path, "exec")
+    exec(_compiled_apps[path], {"__name__": "__main__", "__file__": path})
+
+class BrowserSession:
+    """Minimal websocket client speaking Streamlit's browser protocol."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.ws = None
+        self.deltas = {}          # delta path -> ForwardMsg of the current page
+        self.fragments = {}       # widget id -> id of the fragment it was rendered in
+        self.states = {}          # widget id -> last value sent, like the browser keeps
+        self.tree = None
+
+    async def connect(self) -> None:
+        self.ws = await websocket_connect(f"ws://127.0.0.1:{self.port}/_stcore/stream",
+                                          subprotocols=["streamlit"], max_message_size=2**30)
+
+    async def rerun(self, widget_states=(), fragment_id: str = "") -> tuple:
+        """Request a rerun and wait for it to finish. Returns (seconds, bytes received)."""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+        if fragment_id:
+            msg.rerun_script.fragment_id = fragment_id
+        else:
+            self.deltas = {}
+        started = time.perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        received = 0
+        while True:
+            raw = await asyncio.wait_for(self.ws.read_message(), RERUN_TIMEOUT)
+            if raw is None:
+                raise ConnectionError("server closed the websocket")
+            received += len(raw)
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                self.deltas[tuple(forward.metadata.delta_path)] = forward
+                if forward.delta.WhichOneof("type") == "new_element":
+                    element = forward.delta.new_element
+                    widget = getattr(element, element.WhichOneof("type"))
+                    if hasattr(widget, "id") and widget.id:
+                        self.fragments[widget.id] = forward.delta.fragment_id
+            elif kind == "script_finished" and \
+                    forward.script_finished != ForwardMsg.ScriptFinishedStatus.FINISHED_EARLY_FOR_RERUN:
+                break
+        elapsed = time.perf_counter() - started
+        self.tree = parse_tree_from_messages(list(self.deltas.values()))
+        return elapsed, received
+
+    async def interact(self, widget, *fields) -> tuple:
+        """Send the widget's new value (plus any edited form fields) the way the
+        browser would, scoped to the fragment the widget was rendered in."""
+        triggers = []
+        for element in (*fields, widget):
+            # Built here rather than via element._widget_state, which needs an
+            # AppTest runner. Every widget the interactions use sends a string.
+            state = WidgetState(id=element.id)
+            if element.type == "button":
+                state.trigger_value = True
+                triggers.append(state)              # buttons fire once
+            else:
+                state.string_value = str(element._value)
+                self.states[state.id] = state
+        return await self.rerun([*self.states.values(), *triggers], self.fragments.get(widget.proto.id, ""))
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _run_interactions(port: int, repeat: int) -> dict:
+    session = BrowserSession(port)
+    await session.connect()
+    samples = {}
+
+    async def timed(name, widget, *fields):
+        seconds, received = await session.interact(widget, *fields)
+        samples.setdefault(name, []).append((seconds, received))
+
+    await session.rerun()
+    await timed("login", _by_label(session.tree.button, "Login").click(),
+                _by_label(session.tree.text_input, "Username").set_value(INTERACTION_USER[0]),
+                _by_label(session.tree.text_input, "Password").set_value(INTERACTION_USER[1]))
+
+    for n in range(repeat):
+        await timed("open browse", session.tree.sidebar.radio[0].set_value(PAGES["browse"]))
+        await timed("listen", next(b for b in session.tree.button if b.label == "🔊 Listen").click())
+        await timed("next page", _by_label(session.tree.button, "Next ➡️").click())
+        language = helpers.get_languages()[n % 3]
+        await timed("browse filter", _by_label(session.tree.selectbox, "Filter by Language").set_value(language))
+        await timed("open search", session.tree.sidebar.radio[0].set_value(PAGES["search"]))
+        await timed("search", _by_label(session.tree.text_input,
+                                        "Search for farming practices, techniques, or knowledge...")
+                    .set_value(SEARCH_QUERIES[n % len(SEARCH_QUERIES)]))
+        await timed("open map", session.tree.sidebar.radio[0].set_value(PAGES["map"]))
+        map_category = helpers.get_categories()[n % 4]
+        await timed("map filter", _by_label(session.tree.selectbox, "Category").set_value(map_category))
+        await timed("open home", session.tree.sidebar.radio[0].set_value("🏠 Home"))
+    session.ws.close()
+    return samples
+
+def measure_interactions(entries: int, app_file: str, repeat: int, seed: int) -> dict:
+    """Seed an archive, serve app_file with `streamlit run` and time single interactions."""
+    app_file = os.path.abspath(app_file)
+    workdir = tempfile.mkdtemp(prefix="fwa-ui-")
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    server = None
+    try:
+        # Speech pre-rendered for every entry, as the enrichment worker leaves them
+        tts_path = helpers.save_media_file("tts_sample.mp3", b"ID3" + b"\0" * 1024)
+        helpers.JsonEntryStore().write_all(
+            [{**entry, 'tts_path': tts_path} for entry in manage.generate_synthetic_entries(entries, seed)])
+        helpers.register_user(INTERACTION_USER[0], "ui@example.org", INTERACTION_USER[1], "UI User")
+        wrapper = os.path.join(workdir, "serve_app.py")
+        with open(wrapper, "w", encoding="utf-8") as f:
+            f.write(_SERVER_WRAPPER.format(root=ROOT, app=app_file))
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", wrapper, "--server.headless", "true",
+             "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + SERVER_STARTUP_TIMEOUT
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    raise RuntimeError("streamlit server did not start")
+                time.sleep(0.2)
+
+        samples = asyncio.run(_run_interactions(port, repeat))
+        print(f"{entries} entries, {os.path.relpath(app_file, previous_cwd)}, {repeat} rounds")
+        print(f"{'interaction':14} {'p50 ms':>8} {'max ms':>8} {'KB recv':>8}")
+        for name, values in samples.items():
+            seconds = np.array([s for s, _ in values]) * 1000
+            print(f"{name:14} {np.median(seconds):8.1f} {seconds.max():8.1f} "
+                  f"{np.median([b for _, b in values]) / 1024:8.1f}")
+        return samples
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        action, _, weight = part.partition("=")
+        if action not in PAGES:
+            raise argparse.ArgumentTypeError(f"unknown action {action!r}; choose from {', '.join(PAGES)}")
+        mix[action] = float(weight or 1)
+    return mix
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000, help="size of the seeded synthetic archive")
+    parser.add_argument("--users", type=int, default=8, help="concurrent simulated sessions")
+    parser.add_argument("--actions", type=int, default=25, help="actions per simulated user")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                        help="action weights, e.g. browse=40,search=25,submit=10,map=15,export=10")
+    parser.add_argument("--storage", choices=["json", "segments"], default="json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--interactions", action="store_true",
+                        help="time single interactions against a real streamlit server")
+    parser.add_argument("--app", default=APP_FILE, help="app script to serve with --interactions")
+    parser.add_argument("--repeat", type=int, default=INTERACTION_REPEAT, help="rounds with --interactions")
+    args = parser.parse_args()
+    if args.interactions:
+        measure_interactions(args.entries, args.app, args.repeat, args.seed)
+        return
+    report = run_load_test(args.entries, args.users, args.actions, args.mix, args.storage, args.seed)
+    sys.exit(1 if report["errors"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Maintenance commands for the Farming Wisdom Archive.
+
+Run from the project root, next to data_entries/:
+
+    python manage.py migrate-storage
+    python manage.py benchmark-storage --entries 20000
+    python manage.py benchmark-memory --entries 100000
+    python manage.py transcode-audio
+    python manage.py backup
+    python manage.py restore --at 2025-07-18T09:30:00
+    python manage.py package-dataset --out dist/corpus
+    python manage.py export-bundle --out archive.zip
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import helpers
+
+# Synthetic corpus for benchmarks and load tests
+SYNTHETIC_TEXT = {
+    "Hindi": helpers.DEVANAGARI_SEED_TEXT["Hindi"],
+    "Marathi": helpers.DEVANAGARI_SEED_TEXT["Marathi"],
+    "English": (
+        "Farmers soak the seeds in cow urine overnight before sowing to protect them from fungus. "
+        "Neem leaves are dried and mixed with stored grain to keep weevils away. "
+        "After the first monsoon rain the field is ploughed and left to rest for a week. "
+        "Ash from the kitchen fire is sprinkled around young plants to stop ants and termites."
+    ),
+    "Tamil": "விவசாயிகள் விதைகளை விதைப்பதற்கு முன் வேப்ப இலை கரைசலில் ஊற வைக்கிறார்கள். மழைக்காலத்தில் நிலத்தை உழுது தயார் செய்கிறார்கள்.",
+    "Telugu": "రైతులు విత్తనాలు నాటే ముందు వేప ఆకుల కషాయంలో నానబెడతారు. వర్షాకాలంలో పొలాన్ని దున్ని సిద్ధం చేస్తారు.",
+    "Bengali": "কৃষকরা বীজ বপনের আগে নিমপাতার রসে ভিজিয়ে রাখেন। বর্ষার সময় জমি চাষ করে প্রস্তুত করা হয়।"
+}
+
+def generate_synthetic_entries(count: int, seed: int = 42) -> list:
+    """Deterministic multilingual entries shaped like real submissions."""
+    rng = random.Random(seed)
+    languages = list(SYNTHETIC_TEXT)
+    categories = helpers.get_categories()
+    start = datetime.datetime(2025, 1, 1)
+    entries = []
+    for entry_id in range(1, count + 1):
+        language = rng.choice(languages)
+        words = SYNTHETIC_TEXT[language].split()
+        offset = rng.randrange(len(words))
+        description = " ".join(rng.choice(words) for _ in range(rng.randint(20, 160)))
+        has_location = rng.random() < 0.7
+        entries.append({
+            'id': entry_id,
+            'title': " ".join(words[offset:offset + 5]) or words[0],
+            'description': description,
+            'language': language,
+            'category': rng.choice(categories),
+            'location_name': f"Village {rng.randint(1, 500)}",
+            'latitude': round(rng.uniform(8.0, 32.0), 6) if has_location else None,
+            'longitude': round(rng.uniform(69.0, 92.0), 6) if has_location else None,
+            'image_path': None,
+            'audio_path': None,
+            'timestamp': (start + datetime.timedelta(minutes=entry_id * 7)).isoformat(),
+            'contributor': f"farmer{rng.randint(1, max(1, count // 20))}",
+            'contributor_full_name': f"Farmer {entry_id % 97}"
+        })
+    return entries
+
+def _time_load(store, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        helpers._segment_cache.clear()
+        started = time.perf_counter()
+        store.load_all()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def _time_append(store, entries: list, repeat: int = 5) -> float:
+    started = time.perf_counter()
+    for n in range(repeat):
+        store.insert(dict(entries[n % len(entries)], id=None))
+    return (time.perf_counter() - started) / repeat
+
+def benchmark_storage(count: int) -> None:
+    """Compare size, full-load time and append time of entries.json against the segment formats."""
+    entries = generate_synthetic_entries(count)
+    workdir = tempfile.mkdtemp(prefix="fwa-bench-")
+    try:
+        json_store = helpers.JsonEntryStore(os.path.join(workdir, "entries.json"))
+        json_store.write_all(entries)
+        rows = [("entries.json (indent=2)", os.path.getsize(json_store.path), _time_load(json_store),
+                 _time_append(json_store, entries))]
+
+        variants = [("gzip", "json"), ("gzip", helpers._default_serializer())]
+        if helpers._default_codec() == "zstd":
+            variants.append(("zstd", helpers._default_serializer()))
+        for codec, serializer in dict.fromkeys(variants):
+            store = helpers.SegmentEntryStore(os.path.join(workdir, f"{codec}-{serializer}"),
+                                              codec=codec, serializer=serializer)
+            store.write_all(entries)
+            size = sum(meta["bytes"] for meta in store._load_index()["segments"])
+            rows.append((f"segments {codec}+{serializer}", size, _time_load(store), _time_append(store, entries)))
+
+        base_size, base_load = rows[0][1], rows[0][2]
+        print(f"{count} synthetic entries")
+        print(f"{'format':28} {'bytes':>11} {'size':>7} {'load ms':>8} {'vs json':>8} {'save_entry ms':>14}")
+        for name, size, load_seconds, append_seconds in rows:
+            print(f"{name:28} {size:11d} {size / base_size:6.1%} {load_seconds * 1000:8.1f} "
+                  f"{base_load / load_seconds:7.2f}x {append_seconds * 1000:14.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _retained_bytes(build) -> int:
+    """Bytes still allocated once build() returns, as seen by tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+def benchmark_memory(count: int) -> None:
+    """Compare resident size of plain entry dicts against EntryRecord, scaled to 100k entries."""
+    # Round-trip through JSON so every value is its own object, as after load_entries()
+    text = json.dumps(generate_synthetic_entries(count), ensure_ascii=False)
+    rows = [
+        ("dicts (load_entries)", _retained_bytes(lambda: json.loads(text))),
+        ("EntryRecord", _retained_bytes(lambda: [helpers.EntryRecord(e) for e in json.loads(text)])),
+        ("EntryRecord, paged descriptions",
+         _retained_bytes(lambda: [helpers.EntryRecord(e, page_description=True) for e in json.loads(text)]))
+    ]
+    base = rows[0][1]
+    print(f"{count} synthetic entries")
+    print(f"{'representation':32} {'bytes/entry':>12} {'MB per 100k':>12} {'vs dicts':>9}")
+    for name, size in rows:
+        print(f"{name:32} {size / count:12.0f} {size / count * 100000 / 2**20:12.1f} {base / size:8.2f}x")
+
+def transcode_audio(limit: int = None) -> None:
+    """Make streaming copies for entries uploaded before audio transcoding existed."""
+    pending = [entry for entry in helpers.load_entries()
+               if entry.get('audio_path') and not entry.get('audio_stream_path')]
+    done = failed = 0
+    for entry in pending[:limit]:
+        if not os.path.exists(entry['audio_path']):
+            failed += 1
+            continue
+        try:
+            stream_path = helpers.transcode_audio(entry['audio_path'])
+        except ValueError as e:
+            print(f"entry {entry['id']}: {e}")
+            failed += 1
+            continue
+        helpers.update_entry(entry['id'], {'audio_stream_path': stream_path})
+        done += 1
+    print(json.dumps({"pending": len(pending), "transcoded": done, "failed": failed}))
+
+def _parse_splits(text: str) -> dict:
+    splits = {}
+    for part in text.split(","):
+        name, _, ratio = part.partition("=")
+        try:
+            splits[name] = float(ratio)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected name=ratio, got {part!r}")
+    return splits
+
+def export_bundle(out: str, fmt: str, include_coordinates: bool, language: str, category: str,
+                  workers: int) -> None:
+    """Stream a ZIP bundle to a file, or to stdout with --out - (e.g. piped to ssh or aws s3 cp)."""
+    entries = [entry for entry in helpers.load_entries()
+               if language in (None, entry.get('language')) and category in (None, entry.get('category'))]
+    if out == "-":
+        summary = helpers.write_export_bundle(sys.stdout.buffer, entries, fmt, include_coordinates, workers)
+        print(json.dumps(summary), file=sys.stderr)
+        return
+    try:
+        with open(out + ".tmp", "wb") as f:
+            summary = helpers.write_export_bundle(f, entries, fmt, include_coordinates, workers)
+        os.replace(out + ".tmp", out)
+    finally:
+        if os.path.exists(out + ".tmp"):
+            os.remove(out + ".tmp")
+    print(json.dumps({**summary, "out": out, "size": os.path.getsize(out)}))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate-storage", help="convert entries.json to compressed segments")
+    migrate.add_argument("--codec", choices=["zstd", "gzip"])
+    migrate.add_argument("--serializer", choices=["orjson", "msgpack", "json"])
+    migrate.add_argument("--segment-size", type=int, default=helpers.ENTRY_SEGMENT_SIZE)
+
+    bench = commands.add_parser("benchmark-storage", help="compare storage formats on a synthetic corpus")
+    bench.add_argument("--entries", type=int, default=20000)
+
+    memory = commands.add_parser("benchmark-memory", help="compare in-memory entry representations")
+    memory.add_argument("--entries", type=int, default=100000)
+
+    transcode = commands.add_parser("transcode-audio", help="make streaming copies of uploaded audio")
+    transcode.add_argument("--limit", type=int)
+
+    commands.add_parser("backup", help="take an incremental snapshot of data_entries/")
+    commands.add_parser("list-backups", help="list snapshots")
+
+    restore = commands.add_parser("restore", help="rebuild data_entries/ as of a point in time")
+    restore.add_argument("--at", help="ISO timestamp (default: latest snapshot)")
+    restore.add_argument("--target", help="directory to restore into (default: data_entries.restored-<id>)")
+
+    verify = commands.add_parser("verify-backups", help="check every snapshot's objects")
+    verify.add_argument("--quick", action="store_true", help="check presence and size only, do not re-hash")
+
+    prune = commands.add_parser("prune-backups", help="delete old snapshots and their unused objects")
+    prune.add_argument("--keep", type=int, required=True)
+
+    package = commands.add_parser("package-dataset", help="write WebDataset tar shards of the corpus")
+    package.add_argument("--out", required=True, help="empty or new output directory")
+    package.add_argument("--splits", type=_parse_splits, default=helpers.DATASET_SPLITS,
+                         help="split ratios, e.g. train=0.8,validation=0.1,test=0.1")
+    package.add_argument("--seed", type=int, default=0)
+    package.add_argument("--shard-mb", type=int, default=helpers.DATASET_SHARD_BYTES // 2**20)
+    package.add_argument("--no-media", action="store_true", help="text and metadata only")
+    package.add_argument("--workers", type=int, help="packaging processes (default: one per core)")
+
+    bundle = commands.add_parser("export-bundle", help="write a ZIP of the entries and their media")
+    bundle.add_argument("--out", required=True, help="ZIP file to write, or - for stdout")
+    bundle.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    bundle.add_argument("--no-coordinates", action="store_true")
+    bundle.add_argument("--language")
+    bundle.add_argument("--category")
+    bundle.add_argument("--workers", type=int, default=helpers.EXPORT_BUNDLE_WORKERS,
+                        help="threads reading media ahead of the writer")
+
+    args = parser.parse_args()
+    if args.command == "migrate-storage":
+        result = helpers.migrate_entries_to_segments(args.codec, args.serializer, args.segment_size)
+        print(json.dumps(result))
+    elif args.command == "benchmark-storage":
+        benchmark_storage(args.entries)
+    elif args.command == "benchmark-memory":
+        benchmark_memory(args.entries)
+    elif args.command == "transcode-audio":
+        transcode_audio(args.limit)
+    elif args.command == "backup":
+        print(json.dumps(helpers.create_backup()))
+    elif args.command == "list-backups":
+        for manifest in helpers.list_backups():
+            stats = manifest["stats"]
+            print(f"{manifest['id']}  {manifest['created']}  seq {manifest.get('change_seq', 0):>7}  "
+                  f"{stats['files']:>6} files  {stats['new_bytes']:>12} new bytes")
+    elif args.command == "restore":
+        try:
+            print(json.dumps(helpers.restore_backup(args.at, args.target)))
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.command == "verify-backups":
+        report = helpers.verify_backups(full=not args.quick)
+        print(json.dumps(report))
+        raise SystemExit(0 if report["ok"] else 1)
+    elif args.command == "package-dataset":
+        try:
+            result = helpers.package_dataset(args.out, args.splits, args.seed, args.shard_mb * 2**20,
+                                             not args.no_media, args.workers)
+        except ValueError as e:
+            parser.error(str(e))
+        print(json.dumps(result))
+    elif args.command == "export-bundle":
+        export_bundle(args.out, args.format, not args.no_coordinates, args.language, args.category, args.workers)
+    elif args.command == "prune-backups":
+        print(json.dumps(helpers.prune_backups(args.keep)))
+
+if __name__ == "__main__":
+    main()
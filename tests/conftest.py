@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import helpers  # noqa: E402
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """Run against an empty archive in a temporary working directory."""
+    monkeypatch.chdir(tmp_path)
+    _reset_module_state()
+    yield tmp_path
+    _reset_module_state()
+
+
+def _reset_module_state():
+    helpers._segment_cache.clear()
+    helpers._segment_index_cache.clear()
+    helpers._feed_state.update(seq=None, size=None, pending=None)
+    helpers._index_sync["offset"] = 0
+    helpers.invalidate_entry_indexes()
+
+
+def make_entry(**fields):
+    entry = {
+        'id': None,
+        'title': "Neem leaf spray",
+        'description': "Soak neem leaves overnight and spray at dusk.",
+        'language': "English",
+        'category': "Pest Control",
+        'location_name': "Village 1",
+        'latitude': None,
+        'longitude': None,
+        'image_path': None,
+        'audio_path': None,
+        'timestamp': "2025-01-01T00:00:00",
+        'contributor': "farmer1",
+        'contributor_full_name': "Farmer 1"
+    }
+    entry.update(fields)
+    return entry
@@ -0,0 +1,90 @@
+import datetime
+import os
+import time
+
+import pytest
+
+import helpers
+from conftest import make_entry
+
+
+def _restored_titles(target):
+    entries = helpers.JsonEntryStore(os.path.join(target, "entries.json")).load_all()
+    return sorted(entry['title'] for entry in entries)
+
+
+def test_restore_latest_snapshot(archive):
+    for title in ("A", "B"):
+        helpers.save_entry(make_entry(title=title))
+    helpers.create_backup()
+    helpers.save_entry(make_entry(title="C"))
+    second = helpers.create_backup()
+
+    assert second["change_seq"] == 3
+    # Only the appended tail of the change feed is stored again
+    first_feed, second_feed = (manifest["files"]["changes.jsonl"]["parts"] for manifest in helpers.list_backups())
+    assert second_feed[0] == first_feed[0] and len(second_feed) == 2
+    result = helpers.restore_backup(target=str(archive / "restored"))
+    assert result["snapshot"] == second["id"]
+    assert _restored_titles(result["target"]) == ["A", "B", "C"]
+    assert helpers.verify_backups()["ok"]
+
+
+def test_point_in_time_restore_replays_the_feed(archive):
+    helpers.save_entry(make_entry(title="A"))
+    helpers.create_backup()
+    helpers.save_entry(make_entry(title="B"))
+    helpers.update_entry(1, {'title': "A2"})
+    time.sleep(0.01)
+    moment = datetime.datetime.now().isoformat()
+    time.sleep(0.01)
+    helpers.delete_entry(2)
+    helpers.save_entry(make_entry(title="C"))
+    helpers.create_backup()
+
+    result = helpers.restore_backup(at=moment, target=str(archive / "restored"))
+    assert result["replayed_changes"] == 2
+    assert _restored_titles(result["target"]) == ["A2", "B"]
+    changes_path = os.path.join(result["target"], "changes.jsonl")
+    with open(changes_path, "rb") as f:
+        assert sum(1 for _ in f) == 3
+
+
+def test_restore_refuses_non_empty_target(archive):
+    helpers.save_entry(make_entry())
+    helpers.create_backup()
+    target = archive / "restored"
+    target.mkdir()
+    (target / "keep.txt").write_text("x")
+    with pytest.raises(ValueError):
+        helpers.restore_backup(target=str(target))
+
+
+def test_verify_detects_corrupt_objects(archive):
+    helpers.save_entry(make_entry())
+    helpers.create_backup()
+    record = helpers.list_backups()[-1]["files"]["entries.json"]
+    with open(helpers._object_path(record["parts"][0]["sha256"]), "ab") as f:
+        f.write(b"junk")
+    report = helpers.verify_backups()
+    assert not report["ok"]
+    assert [item["file"] for item in report["corrupt"]] == ["entries.json"]
+
+
+def test_segments_written_before_the_capture_are_backed_up(archive, monkeypatch):
+    for title in ("A", "B"):
+        helpers.save_entry(make_entry(title=title))
+    helpers.migrate_entries_to_segments(segment_size=1)
+    acquire = helpers._storage_lock.acquire
+
+    def acquire_after_a_write(*args, **kwargs):
+        # Another writer slips in just before the backup takes the lock
+        monkeypatch.setattr(helpers._storage_lock, "acquire", acquire)
+        helpers.save_entry(make_entry(title="C"))
+        return acquire(*args, **kwargs)
+
+    monkeypatch.setattr(helpers._storage_lock, "acquire", acquire_after_a_write)
+    helpers.create_backup()
+    target = helpers.restore_backup(target=str(archive / "restored"))["target"]
+    store = helpers.SegmentEntryStore(os.path.join(target, "entries_store"))
+    assert sorted(entry['title'] for entry in store.load_all()) == ["A", "B", "C"]
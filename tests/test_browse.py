@@ -0,0 +1,47 @@
+import helpers
+from conftest import make_entry
+
+
+def _add_entries(count, **fields):
+    for n in range(count):
+        helpers.save_entry(make_entry(title=f"Entry {n:02d}", timestamp=f"2025-01-{n + 1:02d}T08:00:00",
+                                      **fields))
+
+
+def _walk(limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = helpers.browse_entries(cursor=cursor, limit=limit, **filters)
+        pages.append([entry['id'] for entry in page])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_cover_every_entry_once(archive):
+    _add_entries(25)
+    assert _walk(10) == [list(range(25, 15, -1)), list(range(15, 5, -1)), list(range(5, 0, -1))]
+    oldest = _walk(10, sort_by="Oldest First")
+    assert [entry_id for page in oldest for entry_id in page] == list(range(1, 26))
+
+
+def test_last_full_page_has_no_cursor(archive):
+    _add_entries(20)
+    assert [len(page) for page in _walk(10)] == [10, 10]
+
+
+def test_pages_stay_stable_when_new_entries_arrive(archive):
+    _add_entries(12)
+    first, cursor = helpers.browse_entries(limit=5)
+    helpers.save_entry(make_entry(title="Late arrival", timestamp="2025-02-01T08:00:00"))
+    second, _ = helpers.browse_entries(cursor=cursor, limit=5)
+    assert [e['id'] for e in first] == [12, 11, 10, 9, 8]
+    assert [e['id'] for e in second] == [7, 6, 5, 4, 3]
+
+
+def test_filters_use_their_own_listing(archive):
+    _add_entries(6)
+    _add_entries(4, language="Hindi")
+    page, cursor = helpers.browse_entries(language="Hindi", limit=10)
+    assert [e['id'] for e in page] == [10, 9, 8, 7]
+    assert cursor is None
+    assert helpers.browse_entries(language="Tamil") == ([], None)
@@ -0,0 +1,55 @@
+import json
+
+import helpers
+from conftest import make_entry
+
+
+def test_changes_since_returns_later_changes_in_order(archive):
+    for n in range(3):
+        helpers.save_entry(make_entry(title=f"Entry {n}"))
+    helpers.update_entry(2, {'title': "Edited"})
+    helpers.delete_entry(1)
+
+    changes, latest = helpers.get_changes_since(0)
+    assert [(c["seq"], c["op"], c["id"]) for c in changes] == [
+        (1, "create", 1), (2, "create", 2), (3, "create", 3), (4, "update", 2), (5, "delete", 1)]
+    assert latest == 5
+    assert changes[3]["entry"]["title"] == "Edited"
+    assert changes[4]["entry"] is None
+    assert helpers.get_changes_since(5) == ([], 5)
+
+
+def test_limit_resumes_where_the_page_ended(archive):
+    for n in range(5):
+        helpers.save_entry(make_entry(title=f"Entry {n}"))
+    changes, resume = helpers.get_changes_since(1, limit=2)
+    assert [c["seq"] for c in changes] == [2, 3]
+    assert resume == 3
+    changes, resume = helpers.get_changes_since(resume, limit=10)
+    assert [c["seq"] for c in changes] == [4, 5]
+    assert resume == 5
+
+
+def test_checkpoints_point_at_their_records(archive, monkeypatch):
+    monkeypatch.setattr(helpers, "FEED_CHECKPOINT_EVERY", 4)
+    for n in range(10):
+        helpers.save_entry(make_entry(title=f"Entry {n}"))
+
+    with open(helpers.CHANGES_CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+        checkpoints = [tuple(map(int, line.split())) for line in f]
+    assert [seq for seq, _ in checkpoints] == [1, 5, 9]
+    with open(helpers.CHANGES_FILE, "rb") as f:
+        for seq, offset in checkpoints:
+            f.seek(offset)
+            assert json.loads(f.readline())["seq"] == seq
+
+    changes, latest = helpers.get_changes_since(6)
+    assert [c["seq"] for c in changes] == [7, 8, 9, 10]
+    assert latest == 10
+
+
+def test_existing_entries_seed_the_feed(archive):
+    helpers.JsonEntryStore().write_all([make_entry(id=1), make_entry(id=2, title="Second")])
+    changes, latest = helpers.get_changes_since(0)
+    assert [(c["op"], c["id"]) for c in changes] == [("create", 1), ("create", 2)]
+    assert [e['version'] for e in helpers.load_entries()] == [1, 2]
@@ -0,0 +1,37 @@
+import helpers
+from conftest import make_entry
+
+
+def _ids(username, last=None):
+    return [entry['id'] for entry in helpers.get_user_entries(username, last)]
+
+
+def test_counts_follow_edits_and_deletes(archive):
+    for contributor in ("asha", "ravi", "asha", "asha"):
+        helpers.save_entry(make_entry(contributor=contributor))
+    assert helpers.get_user_entry_count("asha") == 3
+    assert _ids("asha") == [1, 3, 4]
+
+    helpers.update_entry(3, {'contributor': "ravi"})
+    helpers.update_entry(4, {'title': "Edited"})
+    helpers.delete_entry(1)
+    assert (helpers.get_user_entry_count("asha"), helpers.get_user_entry_count("ravi")) == (1, 2)
+    assert _ids("asha") == [4] and _ids("ravi") == [2, 3]
+    assert helpers.get_entry(4)['title'] == "Edited"
+
+
+def test_last_n_and_unknown_users(archive):
+    for _ in range(5):
+        helpers.save_entry(make_entry(contributor="asha"))
+    assert _ids("asha", last=2) == [4, 5]
+    assert _ids("asha", last=0) == []
+    assert helpers.get_user_entry_count("nobody") == 0 and _ids("nobody") == []
+
+
+def test_user_info_derives_the_count(archive):
+    helpers.register_user("asha", "asha@example.com", "secret-password", "Asha")
+    helpers.save_entry(make_entry(contributor="asha"))
+    helpers.save_entry(make_entry(contributor="asha"))
+    helpers.delete_entry(2)
+    assert helpers.get_user_info("asha")["entries_submitted"] == 1
+    assert helpers.get_user_info("nobody") == {}
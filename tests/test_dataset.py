@@ -0,0 +1,31 @@
+import collections
+
+import helpers
+import manage
+
+
+def _stratum(entry):
+    return (entry['language'] or "", entry['category'] or "")
+
+
+def test_split_sizes_follow_ratios_globally_and_per_stratum():
+    entries = manage.generate_synthetic_entries(600, seed=3)
+    splits = helpers.assign_dataset_splits(entries, seed=11)
+    weight = sum(helpers.DATASET_SPLITS.values())
+    for name, ratio in helpers.DATASET_SPLITS.items():
+        assert abs(len(splits[name]) - len(entries) * ratio / weight) < 1
+
+    sizes = collections.Counter(_stratum(e) for e in entries)
+    for name, ratio in helpers.DATASET_SPLITS.items():
+        per_stratum = collections.Counter(_stratum(e) for e in splits[name])
+        for key, size in sizes.items():
+            assert abs(per_stratum[key] - size * ratio / weight) < 1
+
+
+def test_splits_are_disjoint_and_seeded():
+    entries = manage.generate_synthetic_entries(300, seed=5)
+    splits = helpers.assign_dataset_splits(entries, seed=2)
+    ids = [e['id'] for members in splits.values() for e in members]
+    assert sorted(ids) == [e['id'] for e in entries]
+    assert helpers.assign_dataset_splits(entries, seed=2) == splits
+    assert helpers.assign_dataset_splits(entries, seed=3) != splits
@@ -0,0 +1,30 @@
+import pytest
+
+import helpers
+from conftest import make_entry
+
+
+@pytest.mark.parametrize("size", helpers.DENSITY_CELL_DEGREES)
+def test_grid_edges_fall_into_the_last_cells(size):
+    rows, cols = round(180 / size), round(360 / size)
+    assert helpers._density_cell(size, 90, 180) == rows * cols - 1
+    assert helpers._density_cell(size, -90, -180) == 0
+    assert helpers._density_cell(size, 90, -180) == (rows - 1) * cols
+    assert helpers._density_cell(size, -90, 180) == cols - 1
+    lat, lon = helpers._density_cell_center(size, [rows * cols - 1])
+    assert (lat[0], lon[0]) == (90 - size / 2, 180 - size / 2)
+
+
+def test_edge_points_stay_in_their_bucket():
+    index = helpers.DensityIndex()
+    index.rebuild([make_entry(id=1, latitude=90.0, longitude=180.0),
+                   make_entry(id=2, language="Hindi", latitude=10.0, longitude=75.0)])
+    for level in range(len(helpers.DENSITY_CELL_DEGREES)):
+        english = index.layer(level, language="English")
+        assert english["total"] == 1
+        lat, lon, _ = english["points"][0]
+        assert 90 - helpers.DENSITY_CELL_DEGREES[level] < lat < 90
+        assert 180 - helpers.DENSITY_CELL_DEGREES[level] < lon < 180
+        assert index.layer(level, language="Hindi")["total"] == 1
+    index.remove(make_entry(id=1, latitude=90.0, longitude=180.0))
+    assert index.layer(0, language="English")["total"] == 0
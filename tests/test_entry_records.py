@@ -0,0 +1,58 @@
+import json
+
+import helpers
+from conftest import make_entry
+
+LONG = "Soak neem leaves overnight, strain and spray at dusk. " * 10
+
+
+def _paged_archive(count, segment_size=10):
+    for n in range(count):
+        helpers.save_entry(make_entry(title=f"Entry {n}", description=f"{n} {LONG}"))
+    helpers.migrate_entries_to_segments(segment_size=segment_size)
+    helpers.invalidate_entry_indexes()
+    return helpers.get_all_entries()
+
+
+def test_records_page_long_descriptions_out(archive):
+    records = _paged_archive(3)
+    assert all(record.description is helpers._PAGED for record in records)
+    assert records[1]['description'] == f"1 {LONG}"
+    assert records[1].to_dict()['description'] == f"1 {LONG}"
+    short = helpers.EntryRecord(make_entry(id=9, description="short"), page_description=True)
+    assert short['description'] == "short"
+
+
+def test_paged_record_keeps_the_version_it_was_built_from(archive):
+    record = _paged_archive(3)[0]
+    helpers.update_entry(1, {'description': "Rewritten " + LONG})
+    assert record['description'] == f"0 {LONG}"
+    assert helpers.get_entry(1)['description'] == "Rewritten " + LONG
+
+
+def test_deleted_entry_record_still_reads_its_description(archive):
+    record = _paged_archive(3)[2]
+    helpers.delete_entry(3)
+    assert record['description'] == f"2 {LONG}"
+
+
+def test_search_reads_each_segment_once(archive, monkeypatch):
+    records = _paged_archive(45)
+    helpers._segment_cache.clear()
+    index_reads, segment_reads = [], []
+    load_index, deserialize = helpers.SegmentEntryStore._load_index, helpers._deserialize
+    monkeypatch.setattr(helpers.SegmentEntryStore, "_load_index",
+                        lambda self: index_reads.append(1) or load_index(self))
+    monkeypatch.setattr(helpers, "_deserialize", lambda *args: segment_reads.append(1) or deserialize(*args))
+
+    results = helpers.search_entries(records, "41 soak", expand_terms=False)
+    assert [entry['id'] for entry in results] == [42]
+    assert len(index_reads) <= 1
+    assert len(segment_reads) == 5
+
+
+def test_exports_load_descriptions_in_batches(archive):
+    records = _paged_archive(25)
+    rows = [json.loads(line) for line in helpers.export_to_jsonl(records).splitlines()]
+    assert [row['description'] for row in rows] == [f"{n} {LONG}" for n in range(25)]
+    assert all(record.description is helpers._PAGED for record in records)
@@ -0,0 +1,86 @@
+import hashlib
+import io
+import json
+import threading
+import zipfile
+
+import pandas as pd
+
+import helpers
+from conftest import make_entry
+
+
+def _media(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _bundle(entries, **kwargs):
+    out = io.BytesIO()
+    summary = helpers.write_export_bundle(out, entries, workers=2, **kwargs)
+    return summary, zipfile.ZipFile(io.BytesIO(out.getvalue()))
+
+
+def test_bundle_holds_rows_media_and_matching_checksums(archive, monkeypatch):
+    monkeypatch.setattr(helpers, "EXPORT_CHUNK_BYTES", 1000)
+    image = _media(archive, "leaf.JPG", bytes(range(256)) * 40)
+    audio = _media(archive, "note.wav", b"RIFF" + b"\0" * 5000)
+    helpers.save_entry(make_entry(image_path=image, audio_path=audio, latitude=12.5, longitude=77.1))
+    helpers.save_entry(make_entry(title="Lost photo", image_path=str(archive / "gone.jpg")))
+    entries = helpers.load_entries()
+
+    summary, bundle = _bundle(entries)
+    assert summary["entries"] == 2 and summary["media"] == 2
+    assert sorted(bundle.namelist()) == ["entries.jsonl", "manifest.json",
+                                         "media/00000001-audio.wav", "media/00000001-image.jpg"]
+    rows = [json.loads(line) for line in bundle.read("entries.jsonl").decode().splitlines()]
+    assert rows[0]['image_path'] == "media/00000001-image.jpg" and rows[0]['latitude'] == 12.5
+    assert rows[1]['image_path'] is None
+
+    manifest = json.loads(bundle.read("manifest.json"))
+    assert manifest["entries"] == 2 and manifest["missing_media"] == [2]
+    for item in manifest["media"]:
+        data = bundle.read(item["name"])
+        assert item["size"] == len(data)
+        assert item["sha256"] == hashlib.sha256(data).hexdigest()
+    assert bundle.read("media/00000001-image.jpg") == open(image, "rb").read()
+
+
+def test_csv_bundle_without_coordinates(archive):
+    helpers.save_entry(make_entry(latitude=12.5, longitude=77.1))
+    _, bundle = _bundle(helpers.load_entries(), fmt="csv", include_coordinates=False)
+    frame = pd.read_csv(io.BytesIO(bundle.read("entries.csv")))
+    assert list(frame['title']) == ["Neem leaf spray"]
+    assert 'latitude' not in frame.columns
+
+
+def test_empty_bundle_has_only_rows_and_manifest(archive):
+    summary, bundle = _bundle([])
+    assert summary == {"entries": 0, "media": 0, "bytes": 0}
+    assert sorted(bundle.namelist()) == ["entries.jsonl", "manifest.json"]
+    assert json.loads(bundle.read("manifest.json"))["media"] == []
+
+
+def test_reader_failure_is_raised_instead_of_hanging(archive, monkeypatch):
+    image = _media(archive, "leaf.jpg", b"x" * 100)
+    helpers.save_entry(make_entry(image_path=image))
+
+    class BrokenDigest:
+        def update(self, data):
+            raise RuntimeError("digest failed")
+
+    monkeypatch.setattr(helpers.hashlib, "sha256", BrokenDigest)
+    errors = []
+
+    def export():
+        try:
+            _bundle(helpers.load_entries())
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=export, daemon=True)
+    writer.start()
+    writer.join(timeout=10)
+    assert not writer.is_alive()
+    assert [str(e) for e in errors] == ["digest failed"]
@@ -0,0 +1,53 @@
+import helpers
+from conftest import make_entry
+
+
+def _ids(results):
+    return [entry['id'] for entry, _ in results]
+
+
+def test_sound_keys_are_shared_across_scripts_and_spellings():
+    assert helpers.transliteration_keys("जैविक खाद") == helpers.transliteration_keys("jaivik khaad")
+    assert helpers.transliteration_keys("Jaiwik Khad") == helpers.transliteration_keys("jaivik khad")
+    assert helpers.transliteration_keys("") == []
+
+
+def test_edit_distance_stops_at_the_limit():
+    assert helpers._edit_distance("irrigation", "irigation", 2) == 1
+    assert helpers._edit_distance("kitten", "sitting", 3) == 3
+    assert helpers._edit_distance("kitten", "sitting", 1) == 2
+    assert helpers._edit_distance("", "abc", 5) == 3
+
+
+def test_romanized_and_misspelled_queries(archive):
+    helpers.save_entry(make_entry(title="जैविक खाद", description="गोबर और पत्तियों से जैविक खाद बनाएं", language="Hindi"))
+    helpers.save_entry(make_entry(title="Drip irrigation", description="Water the roots slowly"))
+    helpers.save_entry(make_entry(title="Neem spray", description="Spray neem oil on leaves"))
+
+    assert _ids(helpers.fuzzy_search("jaivik khad")) == [1]
+    assert _ids(helpers.fuzzy_search("irrigaton")) == [2]
+    assert _ids(helpers.fuzzy_search("neem irrigation")) == []
+    results = helpers.fuzzy_search("neem")
+    assert _ids(results) == [3] and results[0][1] == 1.0
+    assert _ids(helpers.fuzzy_search("jaivik", language="English")) == []
+
+
+def test_index_follows_edits_and_deletes(archive):
+    helpers.save_entry(make_entry(title="Neem spray"))
+    helpers.save_entry(make_entry(title="Compost pit"))
+    assert _ids(helpers.fuzzy_search("compost")) == [2]
+    helpers.update_entry(2, {'title': "Vermicompost bed", 'description': "Earthworms"})
+    helpers.delete_entry(1)
+    assert _ids(helpers.fuzzy_search("neem")) == []
+    assert _ids(helpers.fuzzy_search("vermicompost")) == [2]
+    helpers.save_entry(make_entry(title="Neem cake"))
+    assert _ids(helpers.fuzzy_search("neem")) == [3]
+
+
+def test_empty_archive_and_short_words(archive):
+    assert helpers.fuzzy_search("anything") == []
+    helpers.save_entry(make_entry(title="Use ox plough", description="ox"))
+    assert helpers.fuzzy_search("") == []
+    # Keys shorter than FUZZY_MIN_WORD_CHARS only match exactly
+    assert _ids(helpers.fuzzy_search("ox")) == [1]
+    assert helpers.fuzzy_search("ax") == []
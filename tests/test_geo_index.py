@@ -0,0 +1,84 @@
+import math
+import random
+
+import helpers
+from conftest import make_entry
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * helpers.EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _entries(count, seed=1):
+    rng = random.Random(seed)
+    entries = [make_entry(id=n, latitude=rng.uniform(-89.9, 89.9), longitude=rng.uniform(-179.9, 179.9))
+               for n in range(1, count + 1)]
+    # Poles and both sides of the antimeridian
+    entries += [make_entry(id=count + 1, latitude=90.0, longitude=45.0),
+                make_entry(id=count + 2, latitude=-90.0, longitude=-45.0),
+                make_entry(id=count + 3, latitude=10.0, longitude=179.99),
+                make_entry(id=count + 4, latitude=10.0, longitude=-179.99)]
+    return entries
+
+
+def _brute(entries, lat, lon):
+    return sorted((_haversine_km(lat, lon, e['latitude'], e['longitude']), e['id']) for e in entries)
+
+
+def _check(index, entries, lat, lon):
+    expected = _brute(entries, lat, lon)
+    within = index.within(lat, lon, 1500)
+    assert [entry_id for _, entry_id in within] == [entry_id for km, entry_id in expected if km <= 1500]
+    nearest = index.nearest(lat, lon, 10)
+    assert [entry_id for _, entry_id in nearest] == [entry_id for _, entry_id in expected[:10]]
+    for (km, _), (expected_km, _) in zip(nearest, expected):
+        assert abs(km - expected_km) < 1e-6
+
+
+def test_queries_match_brute_force_after_adds_and_removes():
+    entries = _entries(300)
+    index = helpers.GeoIndex()
+    index.rebuild(entries[:150])
+    for entry in entries[150:]:
+        index.add(entry)
+    rng = random.Random(7)
+    for entry in rng.sample(entries, 60):
+        index.remove(entry)
+        entries.remove(entry)
+    moved = dict(entries[0], latitude=-33.9, longitude=151.2)
+    index.remove(entries[0])
+    index.add(moved)
+    entries[0] = moved
+
+    for lat, lon in [(20.0, 78.0), (89.5, 0.0), (-89.5, 120.0), (10.0, 180.0), (10.0, -179.5), (-33.0, 151.0)]:
+        _check(index, entries, lat, lon)
+
+
+def test_antimeridian_neighbours_are_close():
+    index = helpers.GeoIndex()
+    index.rebuild(_entries(0))
+    [(km, entry_id)] = index.nearest(10.0, 179.999, 1, 5)
+    assert entry_id == 3 and km < 2
+    assert [entry_id for _, entry_id in index.within(10.0, -179.999, 5)] == [4, 3]
+
+
+def test_empty_index_and_entries_without_coordinates():
+    index = helpers.GeoIndex()
+    assert index.within(0.5, 0.5, 100) == [] and index.nearest(0.5, 0.5, 3) == []
+    index.rebuild([make_entry(id=1), make_entry(id=2, latitude=95.0, longitude=10.0)])
+    assert index.nearest(0.5, 0.5, 3) == []
+    index.add(make_entry(id=3, latitude=1.0, longitude=1.0))
+    index.remove(make_entry(id=3))
+    assert index.nearest(0.5, 0.5, 3) == []
+
+
+def test_search_nearby_applies_filters(archive):
+    helpers.save_entry(make_entry(latitude=17.4, longitude=78.5, category="Pest Control"))
+    helpers.save_entry(make_entry(latitude=17.5, longitude=78.4, category="Soil Management"))
+    helpers.save_entry(make_entry(latitude=28.6, longitude=77.2, category="Pest Control"))
+    hits = helpers.search_nearby(17.385, 78.4867, radius_km=50, category="Pest Control")
+    assert [entry['id'] for entry, _ in hits] == [1]
+    helpers.delete_entry(1)
+    assert helpers.search_nearby(17.385, 78.4867, k=1, category="Pest Control")[0][0]['id'] == 3
@@ -0,0 +1,69 @@
+import random
+
+import helpers
+
+
+def _brute_force(terms, text):
+    candidates = [(start, start + len(term), payload)
+                  for term, payload in terms
+                  for start in range(len(text) - len(term) + 1)
+                  if text[start:start + len(term)].lower() == term.lower()]
+    candidates.sort(key=lambda match: (match[0], match[0] - match[1]))
+    matches, covered = [], 0
+    for start, end, payload in candidates:
+        if start >= covered:
+            matches.append((start, end, payload))
+            covered = end
+    return matches
+
+
+def test_overlapping_terms_prefer_leftmost_then_longest():
+    automaton = helpers.TermAutomaton([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+    assert automaton.find("ushers") == [(1, 4, 2)]
+    assert automaton.find("hershe") == [(0, 4, 4), (4, 6, 1)]
+    assert automaton.find("") == [] and automaton.find("xyz") == []
+
+
+def test_matches_agree_with_brute_force():
+    rng = random.Random(3)
+    for _ in range(200):
+        terms = [("".join(rng.choice("abAB") for _ in range(rng.randint(1, 4))), n) for n in range(6)]
+        text = "".join(rng.choice("abAB ") for _ in range(40))
+        automaton = helpers.TermAutomaton(terms)
+        found = automaton.find(text)
+        expected = _brute_force(terms, text)
+        # Duplicate terms may carry either payload; the spans must agree
+        assert [match[:2] for match in found] == [match[:2] for match in expected]
+
+
+def test_empty_automaton():
+    assert helpers.TermAutomaton([]).find("anything") == []
+
+
+def test_glossary_matches_every_script_at_word_boundaries():
+    glossary = helpers.Glossary({
+        "seed": {"English": ["seed", "seeds"], "Hindi": ["बीज"], "Tamil": ["விதை"], "Urdu": ["بیج"]},
+        "soil": {"English": ["soil"], "Hindi": ["मिट्टी"]}
+    })
+    text = "SEEDS, बीज और मिट्टी; விதைகள் بیج"
+    found = [(text[start:end], concept) for start, end, concept in glossary.find(text)]
+    assert found == [("SEEDS", "seed"), ("बीज", "seed"), ("मिट्टी", "soil"), ("விதை", "seed"), ("بیج", "seed")]
+    # Short terms must be whole words; a vowel sign never splits from its letter
+    assert glossary.find("बीजों") == []
+    assert glossary.find("reseed topsoil") == []
+    assert glossary.find("") == []
+
+
+def test_offsets_survive_case_folding_that_changes_length():
+    automaton = helpers.TermAutomaton([("neem", "neem")])
+    text = "İİ neem"
+    [(start, end, _)] = automaton.find(text)
+    assert text[start:end] == "neem"
+
+
+def test_highlight_and_expand_with_the_shipped_glossary():
+    marked, concepts = helpers.highlight_terms("Store seeds in dry soil")
+    assert concepts == ["seed", "soil"]
+    assert ":green-background[seeds]" in marked
+    assert "बीज" in helpers.expand_query("seed")
+    assert helpers.highlight_terms("") == ("", [])
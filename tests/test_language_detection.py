@@ -0,0 +1,37 @@
+import pytest
+
+import helpers
+
+
+@pytest.mark.parametrize("text, language", [
+    ("কৃষকরা মাঠে ধান চাষ করেন", "Bengali"),
+    ("விவசாயிகள் வயலில் நெல் பயிரிடுகிறார்கள்", "Tamil"),
+    ("Farmers soak the seeds in water before sowing them in the field", "English"),
+    # Assamese and Punjabi are recognised by script but not offered by the archive
+    ("অসমৰ খেতিয়কে বাৰিষাৰ আগতে বীজ সিঁচে", "Other"),
+    ("ਕਿਸਾਨ ਖੇਤ ਵਿੱਚ ਕਣਕ ਬੀਜਦੇ ਹਨ", "Other"),
+])
+def test_detections_are_archive_languages(text, language):
+    assert helpers.detect_language_local(text) == language
+    assert language in helpers.get_languages()
+
+
+@pytest.mark.parametrize("text", ["", "12345 !!", "abc xyz qqq"])
+def test_ambiguous_text_is_left_to_the_network(text):
+    assert helpers.detect_language_local(text) is None
+
+
+def test_remote_detections_are_folded_too(monkeypatch):
+    class Translator:
+        def __init__(self, source, target):
+            pass
+
+        def detect(self, text):
+            return {"as text": "as", "hi text": "hi"}.get(text, "xx")
+
+    monkeypatch.setattr(helpers, "GoogleTranslator", Translator)
+    helpers._detect_language_remote.cache_clear()
+    assert helpers._detect_language_remote("as text") == "Other"
+    assert helpers._detect_language_remote("hi text") == "Hindi"
+    assert helpers._detect_language_remote("zz text") == "Unknown"
+    helpers._detect_language_remote.cache_clear()
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import helpers
+from conftest import make_entry
+
+
+def _gc(**kwargs):
+    return helpers.collect_media_garbage(dry_run=False, min_age=0, **kwargs)
+
+
+def test_only_unreferenced_files_are_deleted(archive):
+    kept = helpers.save_media_file("kept.jpg", b"jpg")
+    orphan = helpers.save_media_file("orphan.jpg", b"jpg")
+    helpers.save_entry(make_entry(image_path=kept))
+
+    preview = helpers.collect_media_garbage(dry_run=True, min_age=0)
+    assert preview["deleted"] == [orphan] and os.path.exists(orphan)
+    report = _gc()
+    assert report["deleted"] == [orphan]
+    assert os.path.exists(kept) and not os.path.exists(orphan)
+    assert helpers.load_media_index()["candidates"] == {}
+
+
+def test_young_files_wait_for_the_grace_period(archive):
+    path = helpers.save_media_file("upload.wav", b"wav")
+    report = helpers.collect_media_garbage(dry_run=False, min_age=3600)
+    assert report["too_young"] == 1 and os.path.exists(path)
+    assert path in helpers.load_media_index()["candidates"]
+
+
+def test_media_released_by_edit_or_delete_is_collected(archive):
+    first = helpers.save_media_file("first.jpg", b"1")
+    second = helpers.save_media_file("second.jpg", b"2")
+    helpers.save_entry(make_entry(image_path=first, audio_path=None))
+    helpers.save_entry(make_entry(image_path=second))
+    helpers.update_entry(1, {'image_path': None})
+    helpers.delete_entry(2)
+    assert sorted(_gc()["deleted"]) == [first, second]
+
+
+def test_interrupted_run_resumes_with_the_remaining_files(archive, monkeypatch):
+    paths = [helpers.save_media_file(f"orphan{n}.jpg", b"x") for n in range(5)]
+    remove = os.remove
+
+    def fail_on_third(path):
+        if path == paths[2]:
+            raise OSError("disk went away")
+        remove(path)
+
+    monkeypatch.setattr(helpers.os, "remove", fail_on_third)
+    with pytest.raises(OSError):
+        _gc(batch_size=2)
+    monkeypatch.setattr(helpers.os, "remove", remove)
+    # The first batch was saved; only the rest is examined again
+    assert sorted(helpers.load_media_index()["candidates"]) == paths[2:]
+    report = _gc(batch_size=2)
+    assert report["examined"] == 3 and sorted(report["deleted"]) == paths[2:]
+
+
+def test_empty_archive_and_vanished_files(archive):
+    assert _gc()["examined"] == 0
+    path = helpers.save_media_file("gone.jpg", b"x")
+    os.remove(path)
+    report = _gc()
+    assert (report["missing"], report["deleted"]) == (1, [])
+    assert helpers.load_media_index()["candidates"] == {}
@@ -0,0 +1,78 @@
+import helpers
+from conftest import make_entry
+
+
+def _geocode_job():
+    helpers.save_entry(make_entry(location_name="Village 7", description=""))
+    entry = helpers.get_entry(1)
+    assert helpers.enqueue_enrichment(entry, transcribe=False) == ["geocode"]
+
+
+def _job():
+    [job] = helpers.load_outbox()["jobs"]
+    return job
+
+
+def test_failed_jobs_back_off_exponentially_then_give_up(archive, monkeypatch):
+    def offline(location_name):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(helpers, "geocode_location_raw", offline)
+    _geocode_job()
+    now = 1000.0
+    delays = []
+    for attempt in range(1, helpers.ENRICHMENT_MAX_ATTEMPTS):
+        assert helpers.process_outbox_once(now) == 1
+        job = _job()
+        assert (job["status"], job["attempts"], job["last_error"]) == ("retrying", attempt, "offline")
+        assert helpers.process_outbox_once(job["next_attempt"] - 1) == 0
+        delays.append(job["next_attempt"] - now)
+        now = job["next_attempt"]
+    assert delays[:3] == [helpers.ENRICHMENT_BASE_DELAY * 2 ** n for n in range(3)]
+    assert helpers._enrichment_backoff(30) == helpers.ENRICHMENT_MAX_DELAY
+
+    helpers.process_outbox_once(now)
+    assert _job()["status"] == "failed"
+    assert helpers.process_outbox_once(now + 10 ** 6) == 0
+
+
+def test_retry_succeeds_once_the_network_is_back(archive, monkeypatch):
+    answers = [ConnectionError("offline"), (12.5, 77.5)]
+
+    def flaky(location_name):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(helpers, "geocode_location_raw", flaky)
+    _geocode_job()
+    helpers.process_outbox_once(0)
+    helpers.process_outbox_once(_job()["next_attempt"])
+    assert _job()["status"] == "done"
+    assert (helpers.get_entry(1)['latitude'], helpers.get_entry(1)['longitude']) == (12.5, 77.5)
+
+
+def test_jobs_for_deleted_entries_are_skipped(archive, monkeypatch):
+    monkeypatch.setattr(helpers, "geocode_location_raw", lambda location_name: (1.0, 2.0))
+    _geocode_job()
+    helpers.delete_entry(1)
+    assert helpers.process_outbox_once(0) == 1
+    assert _job()["status"] == "skipped"
+
+
+def test_entries_needing_nothing_queue_no_jobs(archive):
+    entry = make_entry(id=1, language="English", description="", location_name="", latitude=1.0, longitude=2.0)
+    assert helpers.enqueue_enrichment(entry) == []
+    assert helpers.load_outbox() == {"jobs": []}
+
+
+def test_only_one_process_holds_the_worker_lock(archive):
+    other_replica = helpers.ProcessLock("enrichment-worker")
+    assert helpers._worker_lock.acquire(blocking=False)
+    try:
+        assert not other_replica.acquire(blocking=False)
+    finally:
+        helpers._worker_lock.release()
+    assert other_replica.acquire(blocking=False)
+    other_replica.release()
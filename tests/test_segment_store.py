@@ -0,0 +1,69 @@
+import sys
+
+import pytest
+
+import helpers
+from conftest import make_entry
+
+
+def _entries(count):
+    return [make_entry(id=n, title=f"शीर्षक {n}", latitude=10.5 + n, longitude=None) for n in range(1, count + 1)]
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd", "none"])
+@pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+def test_round_trip_and_single_segment_updates(archive, codec, serializer):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    if serializer != "json":
+        pytest.importorskip(serializer)
+    store = helpers.SegmentEntryStore(codec=codec, serializer=serializer, segment_size=4)
+    store.write_all(_entries(10))
+    assert store.load_all() == _entries(10)
+    assert [meta["count"] for meta in store._load_index()["segments"]] == [4, 4, 2]
+
+    store.insert(make_entry(id=None, title="new"))
+    assert store.get(11)['title'] == "new"
+    assert store.replace(dict(store.get(5), title="changed"))
+    assert store.remove(2)['id'] == 2
+    assert store.remove(2) is None and store.get(99) is None
+    assert not store.replace(make_entry(id=99))
+    assert [entry['id'] for entry in store.load_all()] == [1, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert store.get(5)['title'] == "changed"
+
+
+def test_missing_optional_libraries_fall_back_to_stdlib(archive, monkeypatch):
+    for module in ("zstandard", "orjson"):
+        monkeypatch.setitem(sys.modules, module, None)
+    assert (helpers._default_codec(), helpers._default_serializer()) == ("gzip", "json")
+    store = helpers.SegmentEntryStore()
+    store.write_all(_entries(3))
+    meta = store._load_index()["segments"][0]
+    assert (meta["codec"], meta["serializer"]) == ("gzip", "json")
+    assert meta["file"].endswith(".json.gz")
+    assert store.load_all() == _entries(3)
+
+
+def test_segments_keep_their_own_format(archive):
+    pytest.importorskip("zstandard")
+    helpers.SegmentEntryStore(codec="gzip", serializer="json", segment_size=2).write_all(_entries(2))
+    # A later writer with other defaults still reads the old segments
+    store = helpers.SegmentEntryStore(codec="zstd", serializer="json", segment_size=2)
+    index = store._load_index()
+    index["codec"] = "zstd"
+    store._save_index(index)
+    store.insert(make_entry(id=None))
+    codecs = [meta["codec"] for meta in store._load_index()["segments"]]
+    assert codecs == ["gzip", "zstd"]
+    assert [entry['id'] for entry in store.load_all()] == [1, 2, 3]
+
+
+def test_migration_and_empty_store(archive):
+    assert helpers.SegmentEntryStore().load_all() == []
+    helpers.JsonEntryStore().write_all(_entries(5))
+    result = helpers.migrate_entries_to_segments(segment_size=2)
+    assert result["entries"] == 5
+    assert isinstance(helpers.get_entry_store(), helpers.SegmentEntryStore)
+    assert helpers.load_entries() == _entries(5)
+    helpers.SegmentEntryStore().write_all([])
+    assert helpers.load_entries() == []
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+
+import helpers
+from conftest import make_entry
+
+
+@pytest.fixture
+def encoded(monkeypatch):
+    """Texts passed to the hashing encoder, per call."""
+    calls = []
+    encoder = helpers._encoders["hashing"]
+
+    def encode(texts):
+        calls.append(list(texts))
+        return encoder["encode"](texts)
+
+    monkeypatch.setitem(helpers._encoders, "hashing", dict(encoder, encode=encode))
+    return calls
+
+
+def _ids(results):
+    return [entry['id'] for entry, _ in results]
+
+
+def _seed():
+    helpers.save_entry(make_entry(title="दीमक से बचाव", description="नीम की खली खेत में डालें", language="Hindi"))
+    helpers.save_entry(make_entry(title="Drip irrigation", description="Water the roots slowly"))
+    helpers.save_entry(make_entry(title="Seed storage", description="Dry the seeds in the sun"))
+
+
+def test_cross_lingual_matches_through_glossary_concepts(archive):
+    _seed()
+    assert _ids(helpers.semantic_search("termite control", limit=1)) == [1]
+    assert _ids(helpers.semantic_search("storing seeds", limit=1)) == [3]
+    assert set(_ids(helpers.semantic_search("termite control", language="English", min_score=-1))) == {2, 3}
+
+
+def test_saves_encode_only_their_entry_and_deletes_drop_rows(archive, encoded):
+    _seed()
+    helpers.semantic_search("irrigation")
+    assert sum(len(texts) for texts in encoded) == 4          # three entries and the query
+    encoded.clear()
+
+    helpers.save_entry(make_entry(title="Mulching", description="Cover the soil with straw"))
+    helpers.update_entry(2, {'title': "Sprinkler irrigation"})
+    helpers.delete_entry(3)
+    assert [texts for texts in encoded] == [["Mulching\nCover the soil with straw"],
+                                           ["Sprinkler irrigation\nWater the roots slowly"]]
+    assert helpers._semantic_index.versions[3] == 0
+    assert 3 not in _ids(helpers.semantic_search("seeds", min_score=-1))
+    assert _ids(helpers.semantic_search("mulching straw", limit=1)) == [4]
+
+
+def test_rows_survive_a_restart_and_stale_rows_are_re_encoded(archive, encoded):
+    _seed()
+    helpers.semantic_search("irrigation")
+    # Another process changed entry 2 while this one was not running
+    store = helpers.get_entry_store()
+    store.replace(dict(store.get(2), title="Flood irrigation", version=99))
+    helpers.invalidate_entry_indexes()
+    encoded.clear()
+
+    fresh = helpers.SemanticIndex()
+    helpers.ensure_entry_indexes()
+    fresh.ensure_built()
+    assert encoded == [["Flood irrigation\nWater the roots slowly"]]
+    assert np.count_nonzero(fresh.versions) == 3
+
+
+def test_removed_matrix_files_are_rebuilt_from_entries(archive, encoded):
+    _seed()
+    helpers.semantic_search("irrigation")
+    for path in helpers._semantic_index._paths():
+        os.remove(path)
+    helpers.invalidate_entry_indexes()
+    encoded.clear()
+
+    assert _ids(helpers.semantic_search("termite control", limit=1)) == [1]
+    assert sum(len(texts) for texts in encoded) == 4
+
+
+def test_empty_archive(archive):
+    assert helpers.semantic_search("anything") == []
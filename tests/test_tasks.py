@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+import helpers
+
+
+@pytest.fixture(autouse=True)
+def clean_tasks():
+    helpers._tasks.clear()
+    yield
+    helpers._tasks.clear()
+
+
+def _wait(key, timeout=5):
+    deadline = time.time() + timeout
+    while helpers.get_task_result(key)[0] == "running":
+        assert time.time() < deadline
+        time.sleep(0.01)
+    return helpers.get_task_result(key)
+
+
+def test_result_and_error():
+    assert _wait(helpers.submit_task("add", lambda a, b: a + b, 2, 3)) == ("done", 5)
+    status, error = _wait(helpers.submit_task("fail", lambda: 1 / 0))
+    assert status == "error" and isinstance(error, ZeroDivisionError)
+    assert helpers.get_task_result("missing") == ("unknown", None)
+
+
+def test_identical_running_calls_share_one_future():
+    release, calls = threading.Event(), []
+
+    def slow(value):
+        calls.append(value)
+        release.wait(5)
+        return value
+
+    first = helpers.submit_task("slow", slow, 1)
+    assert helpers.submit_task("slow", slow, 1) == first
+    release.set()
+    assert _wait(first) == ("done", 1)
+    assert calls == [1]
+
+
+def test_timed_out_call_is_not_started_again_while_its_thread_runs():
+    release, calls = threading.Event(), []
+
+    def stuck():
+        calls.append(1)
+        release.wait(5)
+        return "late"
+
+    key = helpers.submit_task("stuck", stuck, timeout=0.05)
+    time.sleep(0.1)
+    assert helpers.get_task_result(key) == ("timeout", None)
+    assert helpers.submit_task("stuck", stuck) == key
+    assert helpers.get_task_result(key) == ("timeout", None)
+    assert len(calls) == 1
+
+    release.set()
+    helpers._tasks[key]["future"].result(timeout=5)
+    assert _wait(helpers.submit_task("stuck", stuck)) == ("done", "late")
+    assert len(calls) == 2
@@ -0,0 +1,51 @@
+import os
+import wave
+
+import numpy as np
+
+import helpers
+
+RATE = 16000
+
+
+def _write_wav(path, *segments):
+    """segments: (seconds, amplitude) pairs of a 440 Hz tone (0 = silence)."""
+    parts = []
+    for seconds, amplitude in segments:
+        t = np.arange(int(seconds * RATE)) / RATE
+        parts.append((amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16))
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(np.concatenate(parts).tobytes())
+    return path
+
+
+def test_split_on_silence_cuts_inside_pauses():
+    samples = np.concatenate([np.full(RATE, 8000, np.int16), np.zeros(RATE, np.int16),
+                              np.full(RATE, 8000, np.int16)])
+    ranges = helpers.split_on_silence(samples, RATE)
+    assert len(ranges) == 2
+    assert ranges[0][0] == 0 and ranges[1][1] == len(samples)
+    assert RATE < ranges[0][1] == ranges[1][0] < 2 * RATE
+    assert helpers.split_on_silence(np.zeros(RATE, np.int16), RATE) == []
+
+
+def test_transcribe_with_stub_recognizer(archive, monkeypatch):
+    monkeypatch.setattr(helpers, "TRANSCRIBE_RECOGNIZER", "stub")
+    path = _write_wav(str(archive / "talk.wav"), (1.0, 8000), (1.0, 0), (2.0, 8000))
+    assert helpers.transcribe_audio_file(path, "Hindi") == "[Hindi speech 1.5s] [Hindi speech 2.5s]"
+    assert os.listdir(helpers.TRANSCRIPTS_DIR)
+
+
+def test_transcripts_are_cached_per_recognizer_and_language(archive, monkeypatch):
+    calls = []
+    monkeypatch.setitem(helpers._transcribers, "counting",
+                        lambda pcm, rate, language: calls.append(language) or "words")
+    path = _write_wav(str(archive / "talk.wav"), (1.0, 8000))
+
+    assert helpers.transcribe_audio_file(path, "English", recognizer="counting") == "words"
+    assert helpers.transcribe_audio_file(path, "English", recognizer="counting") == "words"
+    assert calls == ["English"]
+    assert helpers.transcribe_audio_file(path, "Tamil", recognizer="stub") == "[Tamil speech 1.0s]"